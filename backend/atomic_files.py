@@ -0,0 +1,189 @@
+"""Crash-safe file replacement with generation numbers, and readers that never see half a write.
+
+``AtomicWriter`` writes to a temp file in the target's directory, fsyncs
+it, renames it over the target and fsyncs the directory. A reader
+therefore opens either the old file or the new one, never a truncated
+one, even if the writer crashes. After the rename it bumps the file's
+generation, a counter kept in a ``.<name>.gen`` file next to it.
+
+``read_consistent`` reads the generation, parses the file from one open
+descriptor, and reads the generation again. If a write landed in
+between, it retries, so the returned data always belongs to the
+returned stat and generation, and caches keyed on them stay correct.
+It also retries parse errors, e.g. from a file written in place by a
+process that doesn't use the writer.
+
+    with AtomicWriter(csv_path, "w", newline="", encoding="utf-8") as writer:
+        df.to_csv(writer.file, index=False)
+
+    read = read_consistent(csv_path, lambda f: pd.read_csv(f))
+    read.value, read.stat, read.generation
+"""
+import os
+import stat as stat_module
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+DEFAULT_MODE = 0o644
+READ_RETRIES = 5
+RETRY_DELAY = 0.05
+
+# Serializes writers of one path within this process, so generations don't repeat
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_lock = threading.Lock()
+
+def _path_lock(path: str) -> threading.Lock:
+    with _path_locks_lock:
+        return _path_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+def generation_path(path: str) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{name}.gen")
+
+def read_generation(path: str) -> int:
+    """Number of atomic writes ``path`` has seen (0 before the first)"""
+    try:
+        with open(generation_path(path), encoding="ascii") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def file_signature(path: str) -> List[int]:
+    """[mtime_ns, size, generation] of a file; raises OSError if it is missing"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size, read_generation(path)]
+
+def _fsync_directory(directory: str):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Directories can't be opened on Windows; the rename is still atomic there
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _replace(temp_path: str, path: str, mode: Optional[int]):
+    if mode is None:
+        # mkstemp creates 0600; keep the target's permissions, or make it readable by workers running as another user
+        try:
+            mode = stat_module.S_IMODE(os.stat(path).st_mode)
+        except OSError:
+            mode = DEFAULT_MODE
+    os.chmod(temp_path, mode)
+    os.replace(temp_path, path)
+
+class AtomicWriter:
+    """Context manager replacing ``path`` on a clean exit; the temp file is dropped on errors or ``discard()``"""
+
+    def __init__(self, path: str, mode: str = "wb", generation: bool = True, file_mode: Optional[int] = None,
+                 **open_kwargs):
+        self.path = path
+        self.mode = mode
+        self.track_generation = generation
+        self.file_mode = file_mode
+        self.open_kwargs = open_kwargs
+        self.file = None
+        self.generation: Optional[int] = None
+        self._discarded = False
+
+    def __enter__(self) -> "AtomicWriter":
+        directory, name = os.path.split(os.path.abspath(self.path))
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+        try:
+            self.file = os.fdopen(fd, self.mode, **self.open_kwargs)
+        except BaseException:
+            os.close(fd)
+            os.unlink(self.temp_path)
+            raise
+        return self
+
+    def discard(self):
+        """Leave the target untouched, e.g. when nothing changed"""
+        self._discarded = True
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None and not self._discarded:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            self.file.close()
+            if exc_type is not None or self._discarded:
+                os.unlink(self.temp_path)
+                return False
+            with _path_lock(self.path):
+                _replace(self.temp_path, self.path, self.file_mode)
+                directory = os.path.dirname(os.path.abspath(self.path))
+                if self.track_generation:
+                    self.generation = read_generation(self.path) + 1
+                    # The generation moves only after the data is in place (see read_consistent)
+                    self._write_generation(self.generation)
+                _fsync_directory(directory)
+        except BaseException:
+            if os.path.exists(self.temp_path):
+                os.unlink(self.temp_path)
+            raise
+        return False
+
+    def _write_generation(self, generation: int):
+        gen_path = generation_path(self.path)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(gen_path), prefix=f"{os.path.basename(gen_path)}.",
+                                         suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="ascii") as f:
+                f.write(str(generation))
+                f.flush()
+                os.fsync(f.fileno())
+            _replace(temp_path, gen_path, DEFAULT_MODE)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+def write_atomic(path: str, data: bytes, generation: bool = True) -> Optional[int]:
+    """Replace ``path`` with ``data``; returns the new generation"""
+    with AtomicWriter(path, "wb", generation=generation) as writer:
+        writer.file.write(data)
+    return writer.generation
+
+class ConsistentRead(NamedTuple):
+    value: Any
+    stat: os.stat_result
+    generation: int
+
+    @property
+    def signature(self) -> List[int]:
+        """Same shape as ``file_signature``, for the data actually read"""
+        return [self.stat.st_mtime_ns, self.stat.st_size, self.generation]
+
+def read_consistent(path: str, read: Callable[[Any], Any], mode: str = "r", retries: int = READ_RETRIES,
+                    retry_on: Tuple[Type[BaseException], ...] = (ValueError,), **open_kwargs) -> ConsistentRead:
+    """``read(file)`` on one open descriptor of ``path``, retried while a write lands during the read.
+
+    ``retry_on`` are parse errors worth another attempt (pandas raises
+    ValueError subclasses on truncated CSVs); a missing file raises
+    FileNotFoundError straight away. The last attempt's error is re-raised.
+    """
+    if "b" not in mode:
+        open_kwargs.setdefault("encoding", "utf-8")
+    for attempt in range(retries + 1):
+        before = read_generation(path)
+        try:
+            with open(path, mode, **open_kwargs) as f:
+                stat = os.fstat(f.fileno())
+                value = read(f)
+        except retry_on:
+            if attempt == retries:
+                raise
+        else:
+            if read_generation(path) == before:
+                return ConsistentRead(value, stat, before)
+            if attempt == retries:
+                # Writes keep landing; what was read is still one complete file
+                return ConsistentRead(value, stat, before)
+        time.sleep(RETRY_DELAY * (attempt + 1))
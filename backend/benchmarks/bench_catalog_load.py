@@ -0,0 +1,66 @@
+"""Store load time: parsing the CSV vs mapping the binary cache file.
+
+Writes the store CSVs repeated to each size (see bench_catalog_memory) as a
+CSV and as a catalog file, then times what load_store_products does on
+each path: read_csv + CompactCatalog.from_frame, or opening the mapped
+file. Also times a lookup by id and reading a page of rows from the map.
+
+    python benchmarks/bench_catalog_load.py [--sizes 100000 1000000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+
+from bench_catalog_memory import synthetic_frame
+from catalog_file import CatalogFile, write_catalog
+from compact_catalog import CATEGORICAL_DTYPES, CompactCatalog
+from catalog_models import Product
+
+def best_ms(func, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+def run(sizes: List[int]) -> List[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            csv_path = os.path.join(directory, f"{size}.csv")
+            bin_path = os.path.join(directory, f"{size}.bin")
+            synthetic_frame(size).to_csv(csv_path, index=False)
+
+            parse = lambda: CompactCatalog.from_frame(pd.read_csv(csv_path, dtype=CATEGORICAL_DTYPES), Product)
+            build_ms = best_ms(lambda: write_catalog(bin_path, parse()), repeat=1)
+            catalog_file = CatalogFile(bin_path, Product)
+            ids = random.Random(0).sample(range(1, size + 1), min(size, 1000))
+
+            results.append({
+                "products": size,
+                "csv_parse_ms": round(best_ms(parse), 1),
+                "cache_build_ms": round(build_ms, 1),
+                "mmap_open_ms": round(best_ms(lambda: CatalogFile(bin_path, Product)), 3),
+                "find_by_id_us": round(best_ms(lambda: [catalog_file.find(i) for i in ids]) * 1000 / len(ids), 2),
+                "page_of_100_ms": round(best_ms(lambda: catalog_file.row_range(size // 2, size // 2 + 100).to_dicts()), 3),
+                "csv_mb": round(os.path.getsize(csv_path) / 1e6, 1),
+                "bin_mb": round(os.path.getsize(bin_path) / 1e6, 1),
+            })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.sizes), indent=2))
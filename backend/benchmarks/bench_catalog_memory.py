@@ -0,0 +1,103 @@
+"""Memory per product: list of Pydantic Products vs CompactCatalog.
+
+Repeats the store CSVs up to each size (with unique ids and names), then
+measures what holding the catalog costs with tracemalloc, once as the list
+of Product models load_store_products used to return and once as a
+CompactCatalog. Also times building each and encoding it for /api/products,
+and compares the DataFrame with brand/category/store/availability as str
+columns and as categoricals (memory and a per-brand group-by).
+
+    python benchmarks/bench_catalog_memory.py [--sizes 100000 1000000]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+
+from compact_catalog import CATEGORICAL_DTYPES, CompactCatalog
+from fast_json import dumps
+from catalog_models import DATA_DIR, STORES, Product
+
+def synthetic_frame(count: int) -> pd.DataFrame:
+    """The store CSVs repeated to ``count`` rows"""
+    frames = [pd.read_csv(os.path.join(DATA_DIR, store["csv_file"])) for store in STORES.values()]
+    base = pd.concat(frames, ignore_index=True).fillna("")
+    frame = base.iloc[[i % len(base) for i in range(count)]].reset_index(drop=True)
+    frame["id"] = range(1, count + 1)
+    frame["name"] = frame["name"] + " #" + frame["id"].astype(str)
+    frame["timestamp"] = frame["timestamp"].astype(str)
+    return frame
+
+def measure(build):
+    """``(result, bytes still allocated, seconds)`` for ``build()``"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated, elapsed
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+def frame_stats(frame: pd.DataFrame) -> dict:
+    group_by = lambda: frame.groupby("brand", observed=True)["price"].agg(["count", "mean"])
+    return {
+        "bytes_per_product": round(frame.memory_usage(deep=True).sum() / len(frame)),
+        "group_by_brand_ms": round(min(timed(group_by) for _ in range(3)), 2),
+    }
+
+def run(sizes: List[int]) -> List[dict]:
+    results = []
+    for size in sizes:
+        frame = synthetic_frame(size)
+        records = frame.to_dict("records")
+
+        products, list_bytes, list_seconds = measure(lambda: [Product(**row) for row in records])
+        encode_list_ms = timed(lambda: dumps(products))
+        del products
+
+        catalog, compact_bytes, compact_seconds = measure(lambda: CompactCatalog.from_frame(frame, Product))
+        encode_compact_ms = timed(lambda: dumps(catalog.to_dicts()))
+
+        results.append({
+            "products": size,
+            "pydantic_list": {
+                "bytes_per_product": round(list_bytes / size),
+                "total_mb": round(list_bytes / 1e6, 1),
+                "build_ms": round(list_seconds * 1000, 1),
+                "encode_ms": round(encode_list_ms, 1),
+            },
+            "compact_catalog": {
+                "bytes_per_product": round(compact_bytes / size),
+                "column_bytes_per_product": round(catalog.nbytes() / size),
+                "total_mb": round(compact_bytes / 1e6, 1),
+                "build_ms": round(compact_seconds * 1000, 1),
+                "encode_ms": round(encode_compact_ms, 1),
+            },
+            "reduction": round(list_bytes / compact_bytes, 1),
+            "dataframe_str": frame_stats(frame),
+            "dataframe_categorical": frame_stats(frame.astype(CATEGORICAL_DTYPES)),
+        })
+        del catalog, records, frame
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.sizes), indent=2))
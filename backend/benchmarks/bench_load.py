@@ -0,0 +1,211 @@
+"""Load test for the read endpoints of each API.
+
+Generates a synthetic catalog of ``--products`` products from the store
+templates in generate_1000.py, points each API module at it, serves the
+app under uvicorn in a thread of this process and drives every endpoint
+with ``--concurrency`` clients for ``--duration`` seconds. Reports
+throughput, p50/p95/p99 latency, errors and process memory per endpoint,
+and writes everything (plus the commit and settings) to ``--output`` so
+runs can be compared between commits:
+
+    python benchmarks/bench_load.py --products 100000 --output before.json
+    python benchmarks/bench_load.py --products 100000 --output after.json --baseline before.json
+
+Clients and server share this process (and its GIL), so absolute numbers
+are pessimistic; compare runs made on the same machine with the same
+settings.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+import pandas as pd
+import uvicorn
+
+from generate_1000 import STORE_TEMPLATES, generate_catalog
+
+APIS = ["multi_store_api", "main_fastapi", "csv_api"]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size, where /proc is available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+    except (OSError, ValueError):
+        return None
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_catalog_csvs(data_dir: str, products: int, seed: int) -> Dict[str, str]:
+    """One CSV per store template, ``products`` rows in total"""
+    counts = generate_catalog(data_dir, max(1, products // len(STORE_TEMPLATES)), seed)
+    return {store_key: os.path.join(data_dir, f"{store_key}_products.csv") for store_key in counts}
+
+def prepare_api(name: str, data_dir: str, csv_paths: Dict[str, str]):
+    """Import an API module, load the synthetic catalog into it and list the paths to hit"""
+    if name == "multi_store_api":
+        import multi_store_api as api
+        api.DATA_DIR = data_dir
+        api.catalog_version.bump()
+        store_key = next(iter(csv_paths))
+        return api.app, ["/api/products", "/api/stats", f"/api/products/{store_key}"]
+    if name == "main_fastapi":
+        import main_fastapi as api
+        frame = pd.concat([pd.read_csv(path) for path in csv_paths.values()], ignore_index=True)
+        frame["id"] = range(1, len(frame) + 1)
+        products = [api.Product(**row) for row in frame[list(api.Product.model_fields)].to_dict("records")]
+        api.set_products(products)
+        return api.app, ["/api/products", "/api/stats"]
+    if name == "csv_api":
+        import csv_api as api
+        path = os.path.join(data_dir, "products.csv")
+        pd.concat([pd.read_csv(path) for path in csv_paths.values()], ignore_index=True)[api.CSV_FIELDS].to_csv(path, index=False)
+        api.CSV_FILE = path
+        return api.app, ["/api/products", "/api/stats"]
+    raise ValueError(f"Unknown API module: {name}")
+
+def start_server(app, port: int):
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def drive(base_url: str, path: str, concurrency: int, duration: float) -> Dict:
+    """``concurrency`` clients requesting ``path`` back to back for ``duration`` seconds"""
+    latencies, errors, received = [], 0, 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await client.get(path)  # warm caches
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors, received
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+                    received += len(response.content)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies) or [0.0]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50), 2),
+        "p95_ms": round(percentile(ordered, 0.95), 2),
+        "p99_ms": round(percentile(ordered, 0.99), 2),
+        "max_ms": round(ordered[-1], 2),
+        "mb_per_second": round(received / elapsed / 1e6, 1),
+        "rss_mb": rss_mb(),
+    }
+
+def run(apis: List[str], products: int, concurrency: int, duration: float, seed: int) -> Dict:
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        csv_paths = write_catalog_csvs(data_dir, products, seed)
+        for name in apis:
+            rss_before = rss_mb()
+            app, paths = prepare_api(name, data_dir, csv_paths)
+            port = free_port()
+            server, thread = start_server(app, port)
+            try:
+                for path in paths:
+                    stats = asyncio.run(drive(f"http://127.0.0.1:{port}", path, concurrency, duration))
+                    results.append({"api": name, "path": path, "rss_before_mb": rss_before, **stats})
+                    print(f"{name:16} {path:28} {stats['throughput_rps']:>9} req/s  "
+                          f"p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms", file=sys.stderr)
+            finally:
+                server.should_exit = True
+                thread.join()
+
+    return {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {"products": products, "concurrency": concurrency, "duration": duration, "seed": seed},
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+
+def compare(report: Dict, baseline: Dict) -> List[Dict]:
+    """Throughput and p99 of this run relative to a saved one, per endpoint"""
+    previous = {(row["api"], row["path"]): row for row in baseline["results"]}
+    rows = []
+    for row in report["results"]:
+        before = previous.get((row["api"], row["path"]))
+        if not before:
+            continue
+        rows.append({
+            "api": row["api"],
+            "path": row["path"],
+            "throughput_change": round(row["throughput_rps"] / before["throughput_rps"], 2) if before["throughput_rps"] else None,
+            "p99_change": round(row["p99_ms"] / before["p99_ms"], 2) if before["p99_ms"] else None,
+        })
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apis", nargs="+", default=APIS, choices=APIS)
+    parser.add_argument("--products", type=int, default=20000, help="catalog size across all stores")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="a previous --output to compare against")
+    args = parser.parse_args()
+
+    report = run(args.apis, args.products, args.concurrency, args.duration, args.seed)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline"] = {"commit": baseline.get("commit"), "changes": compare(report, baseline)}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,98 @@
+"""Read-endpoint latency while a scrape is running.
+
+Starts multi_store_api under uvicorn in this process, replaces the network
+part of MultiStoreScraper.scrape_store with a blocking sleep, and samples
+/api/stats and /api/products/{store} latency before and during the scrape.
+Before scrapes moved to the worker pool, every read waited out the scrape.
+
+    python benchmarks/bench_scrape_latency.py [--scrape-seconds 5]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+import uvicorn
+
+import multi_store_api
+import real_scraper
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(port: int) -> uvicorn.Server:
+    config = uvicorn.Config(multi_store_api.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def fake_scrape(seconds: float):
+    """A scrape that blocks its thread like requests + BeautifulSoup do"""
+    def scrape_store(self, store_key, progress=None):
+        time.sleep(seconds)
+        return {'store': store_key, 'products_count': 0, 'price_changes': 0, 'new_products': 0, 'saved': False}
+    return scrape_store
+
+def sample(client: httpx.Client, duration: float, paths) -> list:
+    """Request ``paths`` round-robin for ``duration`` seconds, returning latencies in ms"""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        client.get(paths[i % len(paths)])
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+    return latencies
+
+def summarize(latencies: list) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+def run(scrape_seconds: float) -> dict:
+    real_scraper.MultiStoreScraper.scrape_store = fake_scrape(scrape_seconds)
+    port = free_port()
+    server = start_server(port)
+    paths = ["/api/stats", "/api/products/ram"]
+
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=scrape_seconds * 4) as client:
+        for path in paths:
+            client.get(path)  # warm the encoded-response cache
+        idle = sample(client, 2.0, paths)
+
+        response = client.post("/api/scrape/microohm")
+        job_id = response.json()["job_ids"][0]
+        during = sample(client, scrape_seconds * 0.8, paths)
+        status = client.get(f"/api/jobs/{job_id}").json()["status"]
+
+    server.should_exit = True
+    return {
+        "scrape_seconds": scrape_seconds,
+        "scrape_post_ms": round(response.elapsed.total_seconds() * 1000, 2),
+        "job_status_while_sampling": status,
+        "idle": summarize(idle),
+        "during_scrape": summarize(during),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scrape-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.scrape_seconds), indent=2))
@@ -0,0 +1,90 @@
+"""Serialization time and bytes-on-wire for /api/products payloads.
+
+Compares FastAPI's default path (response_model validation + jsonable_encoder
++ stdlib json) with the fast path in fast_json.py, at 4k and 100k products.
+
+    python benchmarks/bench_serialization.py [--sizes 4000 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import fast_json
+from fast_json import EncodedResponseCache, compress, dumps
+from catalog_models import DATA_DIR, STORES, Product
+
+def synthetic_products(count: int) -> List[Product]:
+    """Repeat the store CSVs until ``count`` products exist"""
+    frames = [pd.read_csv(os.path.join(DATA_DIR, store["csv_file"])) for store in STORES.values()]
+    rows = pd.concat(frames, ignore_index=True).fillna("").to_dict("records")
+    products = []
+    for i in range(count):
+        row = dict(rows[i % len(rows)])
+        row["id"] = i + 1
+        row["timestamp"] = str(row["timestamp"])
+        products.append(Product(**row))
+    return products
+
+def best_of(func, repeat: int = 3) -> float:
+    """Best wall time of ``repeat`` runs in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+def default_fastapi_path(products: List[Product]) -> bytes:
+    """What a plain ``response_model=List[Product]`` endpoint does"""
+    validated = TypeAdapter(List[Product]).validate_python([p.model_dump() for p in products])
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+def run(sizes: List[int]):
+    results = []
+    for size in sizes:
+        products = synthetic_products(size)
+        cache = EncodedResponseCache()
+        body = dumps(products)
+        cache.get_body("products", 1, lambda: products, "gzip")
+
+        row = {
+            "products": size,
+            "encoder": "orjson" if fast_json.orjson is not None else "json",
+            "default_ms": round(best_of(lambda: default_fastapi_path(products)), 2),
+            "fast_ms": round(best_of(lambda: dumps(products)), 2),
+            "cached_ms": round(best_of(lambda: cache.get_body("products", 1, lambda: products, "gzip")), 4),
+            "gzip_ms": round(best_of(lambda: compress(body, "gzip")), 2),
+            "identity_bytes": len(body),
+            "gzip_bytes": len(compress(body, "gzip")),
+        }
+        if fast_json.brotli is not None:
+            row["br_ms"] = round(best_of(lambda: compress(body, "br")), 2)
+            row["br_bytes"] = len(compress(body, "br"))
+        results.append(row)
+
+    print(f"{'products':>9} {'default ms':>11} {'fast ms':>8} {'cached ms':>10} "
+          f"{'identity B':>11} {'gzip B':>9} {'br B':>9}")
+    for row in results:
+        print(f"{row['products']:>9} {row['default_ms']:>11} {row['fast_ms']:>8} {row['cached_ms']:>10} "
+              f"{row['identity_bytes']:>11} {row['gzip_bytes']:>9} {row.get('br_bytes', '-'):>9}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4000, 100000])
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,107 @@
+"""Cold start: import time and time to the first response of each API.
+
+For every API module, runs ``python -X importtime -c "import <module>"`` in
+a fresh interpreter and reports the module's cumulative import time, the
+slowest top-level imports and whether pandas or scraper code (requests,
+bs4, real_scraper) got loaded, which the serving path should not do. It
+then starts the module under uvicorn in a subprocess and times process
+start to the first 200 from ``/api/products``, against ``--target-ms``.
+
+    python benchmarks/bench_startup.py [--target-ms 2000] [--repeat 3]
+
+Exits non-zero if an API misses the target or imports what it shouldn't.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MODULES = ["main_fastapi", "multi_store_api", "csv_api"]
+# Only needed to scrape, to rebuild a store's cache file from its CSV, or to make thumbnails
+LAZY_MODULES = {"pandas", "requests", "bs4", "real_scraper", "real_image_scraper", "PIL"}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def import_profile(module: str) -> Dict:
+    """Parse ``-X importtime`` output for a fresh ``import module``"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    total_us, top_level, loaded = 0, [], set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        loaded.add(name)
+        if name == module:
+            total_us = cumulative
+        elif depth == 3:
+            # Direct imports of the module (importtime indents two spaces per level)
+            top_level.append((cumulative, name))
+    top_level.sort(reverse=True)
+    return {
+        "import_ms": round(total_us / 1000, 1),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for us, name in top_level[:5]},
+        "unexpected_imports": sorted(loaded & LAZY_MODULES),
+    }
+
+def first_response_ms(module: str, path: str = "/api/products", timeout: float = 30.0) -> float:
+    """Process start to the first successful response"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}{path}", timeout=timeout).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            time.sleep(0.005)
+        raise TimeoutError(f"{module} did not answer {path} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+def run(modules: List[str], repeat: int, target_ms: float) -> List[Dict]:
+    results = []
+    for module in modules:
+        profile = min((import_profile(module) for _ in range(repeat)), key=lambda p: p["import_ms"])
+        first_ms = min(first_response_ms(module) for _ in range(repeat))
+        results.append({
+            "module": module,
+            **profile,
+            "first_response_ms": round(first_ms, 1),
+            "meets_target": first_ms <= target_ms and not profile["unexpected_imports"],
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--target-ms", type=float, default=2000,
+                        help="budget from process start to the first /api/products response")
+    args = parser.parse_args()
+
+    results = run(args.modules, args.repeat, args.target_ms)
+    print(json.dumps({"target_ms": args.target_ms, "results": results}, indent=2))
+    sys.exit(0 if all(result["meets_target"] for result in results) else 1)
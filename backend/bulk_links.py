@@ -0,0 +1,233 @@
+"""Bulk link rewrite and export for the store CSVs (replaces fix_links.py and extract_links.py).
+
+``rewrite`` applies declarative per-store rules: a column and a template
+over the row's columns, e.g. ``"link": "https://ram-egypt.com/product/{id}"``.
+It streams each CSV in chunks and builds the new column with vectorized
+string operations. The result is written with atomic_files.AtomicWriter
+(temp file, fsync, rename, generation bump), so readers see the old file
+or the new one and never a partial one. Stores run in parallel processes,
+and a file whose rules change nothing is left untouched.
+
+``export`` writes the link list of each store. Links come from the
+store's mapped .bin cache when it matches the CSV (gathered straight
+from its string buffer), otherwise from the CSV's link column.
+``--format report`` writes the layout extract_links.py produced instead:
+a header, a section per store and numbered ``name | price | link`` lines,
+to data/all_4000_links.txt by default.
+
+    python bulk_links.py rewrite                      # LINK_RULES on every store
+    python bulk_links.py rewrite --store ram --rules rules.json --jobs 4
+    python bulk_links.py export --output data/all_links.txt
+    python bulk_links.py export --format csv --output links.csv
+    python bulk_links.py export --format report       # data/all_4000_links.txt
+"""
+import argparse
+import json
+import os
+import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from atomic_files import AtomicWriter, file_signature
+from catalog_file import CatalogFile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+STORES = ['microohm', 'electrohub', 'ekostra', 'ram']
+CHUNK_ROWS = 200_000
+EXPORT_COLUMNS = ['store', 'id', 'name', 'price', 'category', 'link']
+REPORT_COLUMNS = ['name', 'price', 'link']
+DEFAULT_OUTPUTS = {
+    'txt': os.path.join(DATA_DIR, 'all_links.txt'),
+    'csv': os.path.join(DATA_DIR, 'all_links.csv'),
+    'report': os.path.join(DATA_DIR, 'all_4000_links.txt'),
+}
+
+# store -> {column: template over the row's columns}
+LINK_RULES: Dict[str, Dict[str, str]] = {
+    'microohm': {'link': 'https://microohm-eg.com/product/{id}'},
+    'electrohub': {'link': 'https://electrohub-eg.com/product/{id}'},
+    'ekostra': {'link': 'https://ekostra-eg.com/product/{id}'},
+    'ram': {'link': 'https://ram-egypt.com/product/{id}'},
+}
+
+class LinkColumns(BaseModel):
+    """The only column a link export maps from a catalog file"""
+    link: str
+
+def store_csv_path(store: str, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, f'{store}_products.csv')
+
+def parse_template(template: str) -> List[Tuple[str, Optional[str]]]:
+    """(literal, column) pieces of a template; column is None after the last field"""
+    pieces = []
+    for literal, field, format_spec, conversion in string.Formatter().parse(template):
+        if format_spec or conversion:
+            raise ValueError(f"Templates only take plain {{column}} fields: {template!r}")
+        pieces.append((literal, field))
+    return pieces
+
+def apply_rules(chunk, rules: Dict[str, str]) -> int:
+    """Rewrite the ruled columns of a chunk of string columns in place; returns the cells changed"""
+    changed = 0
+    for column, template in rules.items():
+        value = ""
+        for literal, field in parse_template(template):
+            value = value + literal
+            if field is not None:
+                value = value + chunk[field]
+        if column in chunk:
+            changed += int((chunk[column] != value).sum())
+        else:
+            changed += len(chunk)
+        chunk[column] = value
+    return changed
+
+def rewrite_store(csv_path: str, rules: Dict[str, str], chunk_rows: int = CHUNK_ROWS) -> Dict:
+    """Stream one CSV through ``rules`` and atomically replace it if anything changed"""
+    import pandas as pd
+
+    started = time.perf_counter()
+    rows = changed = 0
+    with AtomicWriter(csv_path, "w", newline="", encoding="utf-8") as writer:
+        # Every cell as text, so columns the rules don't touch are written back as they were
+        chunks = pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+        for number, chunk in enumerate(chunks):
+            changed += apply_rules(chunk, rules)
+            chunk.to_csv(writer.file, header=number == 0, index=False)
+            rows += len(chunk)
+        if not changed:
+            writer.discard()
+    return {"path": csv_path, "rows": rows, "changed": changed, "seconds": round(time.perf_counter() - started, 3)}
+
+def rewrite_stores(stores: Sequence[str], rules: Dict[str, Dict[str, str]], jobs: int = 1,
+                   data_dir: str = DATA_DIR, chunk_rows: int = CHUNK_ROWS) -> Dict[str, Dict]:
+    """Rewrite every store that has rules and a CSV, ``jobs`` stores at a time"""
+    todo = [store for store in stores if rules.get(store) and os.path.exists(store_csv_path(store, data_dir))]
+    args = [(store_csv_path(store, data_dir), rules[store], chunk_rows) for store in todo]
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(rewrite_store, *zip(*args)))
+    else:
+        results = [rewrite_store(*arg) for arg in args]
+    return dict(zip(todo, results))
+
+def _fresh_cache(csv_path: str) -> Optional[CatalogFile]:
+    """The store's .bin cache if it was built from the CSV as it is now"""
+    try:
+        source = file_signature(csv_path)
+        store_file = CatalogFile(os.path.splitext(csv_path)[0] + '.bin', LinkColumns)
+    except (OSError, ValueError, KeyError):
+        return None
+    return store_file if store_file.meta.get("source") == source else None
+
+def store_links(store: str, data_dir: str = DATA_DIR, chunk_rows: int = CHUNK_ROWS):
+    """Chunks of a store's links as UTF-8, one link per line"""
+    csv_path = store_csv_path(store, data_dir)
+    store_file = _fresh_cache(csv_path)
+    if store_file is not None:
+        column = store_file.catalog.columns["link"]
+        for start in range(0, len(store_file.catalog), chunk_rows):
+            yield column.take(slice(start, start + chunk_rows)).join()
+        return
+
+    import pandas as pd
+
+    for chunk in pd.read_csv(csv_path, usecols=["link"], dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        yield ("\n".join(chunk["link"]) + "\n").encode("utf-8")
+
+def _report_chunks(csv_path: str, chunk_rows: int):
+    import pandas as pd
+
+    return pd.read_csv(csv_path, usecols=REPORT_COLUMNS, dtype={'name': str, 'link': str},
+                       keep_default_na=False, converters={'price': lambda value: float(value or 0)},
+                       chunksize=chunk_rows)
+
+def write_report(file, stores: Sequence[str], data_dir: str = DATA_DIR,
+                 chunk_rows: int = CHUNK_ROWS) -> Dict[str, Dict]:
+    """The extract_links.py layout: a section per store of numbered ``name | price | link`` lines"""
+    paths = {store: store_csv_path(store, data_dir) for store in stores}
+    paths = {store: path for store, path in paths.items() if os.path.exists(path)}
+    # Section headers carry the row counts, so count before writing
+    sizes = {store: sum(len(chunk) for chunk in _report_chunks(path, chunk_rows)) for store, path in paths.items()}
+    file.write(f"ALL {sum(sizes.values())} PRODUCT LINKS\n".encode("utf-8"))
+    file.write(("=" * 60 + "\n\n").encode("utf-8"))
+    counts = {}
+    for store, path in paths.items():
+        file.write(f"\n{store.upper()} STORE ({sizes[store]} products):\n{'-' * 40}\n".encode("utf-8"))
+        links = set()
+        number = 0
+        for chunk in _report_chunks(path, chunk_rows):
+            lines = []
+            for name, price, link in zip(chunk["name"], chunk["price"], chunk["link"]):
+                number += 1
+                lines.append(f"{number:4d}. {name[:60]:60s} | {price:8.2f} EGP | {link}\n")
+            file.write("".join(lines).encode("utf-8"))
+            links.update(chunk["link"])
+        counts[store] = {"links": number, "unique": len(links)}
+    return counts
+
+def export_links(stores: Sequence[str], output: str, fmt: str = "txt", data_dir: str = DATA_DIR,
+                 chunk_rows: int = CHUNK_ROWS) -> Dict[str, Dict]:
+    """Write the links of ``stores`` to ``output``; returns link and unique-link counts per store"""
+    import pandas as pd
+
+    counts = {}
+    with AtomicWriter(output, "wb", generation=False) as writer:
+        if fmt == "report":
+            return write_report(writer.file, stores, data_dir, chunk_rows)
+        for store in stores:
+            csv_path = store_csv_path(store, data_dir)
+            if not os.path.exists(csv_path):
+                continue
+            links = set()
+            total = 0
+            if fmt == "txt":
+                for block in store_links(store, data_dir, chunk_rows):
+                    writer.file.write(block)
+                    lines = block.splitlines()
+                    total += len(lines)
+                    links.update(lines)
+            else:
+                chunks = pd.read_csv(csv_path, usecols=lambda column: column in EXPORT_COLUMNS,
+                                     dtype=str, keep_default_na=False, chunksize=chunk_rows)
+                for chunk in chunks:
+                    chunk = chunk.reindex(columns=EXPORT_COLUMNS, fill_value="")
+                    chunk["store"] = store
+                    writer.file.write(chunk.to_csv(header=writer.file.tell() == 0, index=False).encode("utf-8"))
+                    total += len(chunk)
+                    links.update(chunk["link"].unique())
+            counts[store] = {"links": total, "unique": len(links)}
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    rewrite = commands.add_parser("rewrite", help="apply link rules to the store CSVs")
+    rewrite.add_argument("--rules", help="JSON file of {store: {column: template}} (default: LINK_RULES)")
+    rewrite.add_argument("--jobs", type=int, default=min(len(STORES), os.cpu_count() or 1))
+    export = commands.add_parser("export", help="write every store's links to one file")
+    export.add_argument("--format", choices=list(DEFAULT_OUTPUTS), default="txt")
+    export.add_argument("--output", help="default: data/all_links.txt, .csv, or all_4000_links.txt for report")
+    for command in (rewrite, export):
+        command.add_argument("--store", action="append", choices=STORES, help="store key (default: all)")
+        command.add_argument("--data-dir", default=DATA_DIR)
+        command.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+    stores = args.store or STORES
+
+    if args.command == "rewrite":
+        rules = LINK_RULES
+        if args.rules:
+            with open(args.rules, encoding="utf-8") as f:
+                rules = json.load(f)
+        for store, result in rewrite_stores(stores, rules, args.jobs, args.data_dir, args.chunk_rows).items():
+            print(f"{store}: {result['changed']} of {result['rows']} cells changed in {result['seconds']}s")
+    else:
+        output = args.output or DEFAULT_OUTPUTS[args.format]
+        counts = export_links(stores, output, args.format, args.data_dir, args.chunk_rows)
+        for store, count in counts.items():
+            print(f"{store}: {count['links']} links ({count['unique']} unique)")
+        print(f"{sum(count['links'] for count in counts.values())} links written to {output}")
@@ -0,0 +1,119 @@
+import collections
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Fields whose change makes a product "changed" for delta consumers
+COMPARED_FIELDS = ("price", "availability", "image", "rating", "brand", "category", "link", "description")
+
+def product_key(product) -> str:
+    """Products are matched across scrapes by name, like track_price_changes does"""
+    return product.name
+
+def diff_products(old: Sequence, new: Sequence, key: Callable = product_key) -> Dict[str, List]:
+    """Split ``new`` against ``old`` into added, changed and removed products"""
+    old_by_key = {key(p): p for p in old}
+    new_keys = set()
+    added, changed = [], []
+
+    for product in new:
+        product_id = key(product)
+        new_keys.add(product_id)
+        previous = old_by_key.get(product_id)
+        if previous is None:
+            added.append(product)
+        elif any(getattr(previous, field, None) != getattr(product, field, None) for field in COMPARED_FIELDS):
+            changed.append(product)
+
+    removed = [p for k, p in old_by_key.items() if k not in new_keys]
+    return {"added": added, "changed": changed, "removed": removed}
+
+def delta_payload(store: str, diff: Dict[str, List], version: int) -> Dict:
+    """Per-store completion delta pushed to SSE clients"""
+    return {
+        "store": store,
+        "version": version,
+        "added_ids": [p.id for p in diff["added"]],
+        "changed_ids": [p.id for p in diff["changed"]],
+        "removed_ids": [p.id for p in diff["removed"]],
+        "added": diff["added"],
+        "changed": diff["changed"],
+    }
+
+def tombstone(product) -> Dict:
+    """What a client needs to drop a removed product"""
+    return {"id": product.id, "store": product.store, "name": product.name}
+
+class Changelog:
+    """Compacted product changelog behind /api/products/changes.
+
+    ``sync`` diffs each store's products against the last snapshot and
+    records one entry per changed product at the given catalog version.
+    Only the latest entry per product is kept, so a price that moved three
+    times since a client's version is sent once, and removals shrink to
+    tombstones. Past ``max_entries`` the oldest entries are dropped and the
+    horizon moves up; clients behind the horizon must resync in full.
+    """
+
+    def __init__(self, max_entries: int = 20000, key: Callable = product_key):
+        self.max_entries = max_entries
+        self.key = key
+        # (store, key) -> (version, product or tombstone); oldest first
+        self._entries = collections.OrderedDict()
+        self._snapshots: Dict[str, Sequence] = {}
+        self._lock = threading.Lock()
+        self.horizon: Optional[int] = None
+        self.version: Optional[int] = None
+
+    @property
+    def has_baseline(self) -> bool:
+        return self.version is not None
+
+    def reset(self, products_by_store: Dict[str, Sequence], version: int):
+        """Start over from a known catalog; earlier versions need a full resync"""
+        with self._lock:
+            self._snapshots = dict(products_by_store)
+            self._entries.clear()
+            self.horizon = self.version = version
+
+    def sync(self, products_by_store: Dict[str, Sequence], version: int) -> Dict[str, Dict[str, List]]:
+        """Record what changed in the given stores and return the diff per store"""
+        diffs = {}
+        with self._lock:
+            # Entries must stay in version order for changes_since to stop early
+            version = max(version, self.version or 0)
+            for store, products in products_by_store.items():
+                diff = diff_products(self._snapshots.get(store, []), products, self.key)
+                for product in diff["added"] + diff["changed"]:
+                    self._put((store, self.key(product)), version, product)
+                for product in diff["removed"]:
+                    self._put((store, self.key(product)), version, tombstone(product))
+                self._snapshots[store] = products
+                diffs[store] = diff
+            self.version = version
+            while len(self._entries) > self.max_entries:
+                _, (dropped_version, _) = self._entries.popitem(last=False)
+                self.horizon = max(self.horizon, dropped_version)
+        return diffs
+
+    def _put(self, key, version: int, item):
+        self._entries.pop(key, None)
+        self._entries[key] = (version, item)
+
+    def changes_since(self, since: Optional[int]) -> Dict:
+        """Products upserted and removed after version ``since``.
+
+        Answers with ``full_resync`` and the whole catalog when ``since`` is
+        missing, behind the horizon or from a newer (e.g. restarted) catalog.
+        """
+        with self._lock:
+            version = self.version or 0
+            if since is None or self.horizon is None or since < self.horizon or since > version:
+                products = [product for products in self._snapshots.values() for product in products]
+                return {"version": version, "full_resync": True, "products": products, "removed": []}
+
+            products, removed = [], []
+            for entry_version, item in reversed(self._entries.values()):
+                if entry_version <= since:
+                    break
+                (removed if isinstance(item, dict) else products).append(item)
+        return {"version": version, "full_resync": False, "products": products, "removed": removed}
@@ -0,0 +1,52 @@
+import io
+from typing import TYPE_CHECKING, Iterable, Iterator, List
+
+from atomic_files import file_signature
+from fast_json import dumps
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+EXPORT_FIELDS = ["id", "name", "price", "image", "brand", "category", "store",
+                 "availability", "rating", "description", "link", "timestamp"]
+
+# Rows read (and encoded) per chunk; bounds server memory during an export
+EXPORT_CHUNK_ROWS = 2000
+
+class CatalogChanged(RuntimeError):
+    """A store CSV was rewritten while it was being exported"""
+
+def iter_chunks(csv_paths: Iterable[str], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator["pd.DataFrame"]:
+    """Read store CSVs one chunk at a time, normalized to the export columns.
+
+    An export streams for as long as the client reads, so it can't use
+    read_consistent. Instead each file is read from one descriptor and its
+    signature is checked before every chunk goes out. If the file was
+    rewritten, CatalogChanged ends the stream, and the client sees a
+    truncated response, not a mix of two generations.
+    """
+    import pandas as pd
+
+    for csv_path in csv_paths:
+        signature = file_signature(csv_path)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for chunk in pd.read_csv(f, chunksize=chunk_rows):
+                if file_signature(csv_path) != signature:
+                    raise CatalogChanged(f"{csv_path} changed during the export")
+                chunk = chunk.reindex(columns=EXPORT_FIELDS)
+                chunk[["description", "link"]] = chunk[["description", "link"]].fillna("")
+                yield chunk
+
+def iter_ndjson(csv_paths: List[str], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield the catalog as newline-delimited JSON, one chunk of rows per yield"""
+    for chunk in iter_chunks(csv_paths, chunk_rows):
+        records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+        yield b"".join(dumps(record) + b"\n" for record in records)
+
+def iter_csv(csv_paths: List[str], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield the catalog as CSV with a single header row"""
+    yield (",".join(EXPORT_FIELDS) + "\n").encode("utf-8")
+    for chunk in iter_chunks(csv_paths, chunk_rows):
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, index=False, header=False)
+        yield buffer.getvalue().encode("utf-8")
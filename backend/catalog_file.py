@@ -0,0 +1,164 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Optional, Type
+
+import numpy as np
+
+from atomic_files import AtomicWriter
+from compact_catalog import (
+    CATEGORICAL_FIELDS, FLOAT_FIELDS, INT_FIELDS,
+    CategoricalColumn, CompactCatalog, NumericColumn, StringColumn, model_fields,
+)
+
+MAGIC = b"EGCAT\x00\x01\x00"
+FORMAT_VERSION = 1
+# Sections start on cache-line boundaries so numpy views are aligned
+ALIGNMENT = 64
+
+ID_INDEX_DTYPE = np.dtype([("id", "<i8"), ("row", "<i8")])
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def record_dtype(model: Type, categories: Dict[str, list]) -> np.dtype:
+    """Fixed-width record: numbers, category codes and (start, length) per text field"""
+    fields = []
+    for field in model_fields(model):
+        if field in INT_FIELDS:
+            fields.append((field, "<i8"))
+        elif field in FLOAT_FIELDS:
+            fields.append((field, "<f8"))
+        elif field in CATEGORICAL_FIELDS:
+            fields.append((field, "<u2" if len(categories[field]) <= 1 << 16 else "<u4"))
+        else:
+            fields.append((f"{field}_start", "<i8"))
+            fields.append((f"{field}_len", "<u4"))
+    return np.dtype(fields)
+
+def write_catalog(path: str, catalog: CompactCatalog, meta: Optional[Dict] = None,
+                  blobs: Optional[Dict[str, bytes]] = None):
+    """Write ``catalog`` to ``path`` atomically (see atomic_files.AtomicWriter).
+
+    ``meta`` is stored in the JSON header as is; ``blobs`` are extra named
+    byte strings (e.g. a pre-encoded response) readers can map zero-copy.
+    Readers that still have the old file mapped keep a consistent view.
+    """
+    model = catalog.model
+    categories = {field: list(catalog.columns[field].categories) for field in CATEGORICAL_FIELDS
+                  if field in catalog.columns}
+    dtype = record_dtype(model, categories)
+    records = np.zeros(len(catalog), dtype=dtype)
+
+    heap_parts, heap_size = [], 0
+    for field, column in catalog.columns.items():
+        if isinstance(column, StringColumn):
+            # Re-pack so the heap holds exactly this catalog's strings
+            packed = StringColumn.encode(column.values())
+            records[f"{field}_start"] = packed.starts + heap_size
+            records[f"{field}_len"] = packed.lengths
+            heap_parts.append(packed.buffer)
+            heap_size += len(packed.buffer)
+        elif isinstance(column, CategoricalColumn):
+            records[field] = column.codes
+        else:
+            records[field] = column.array
+
+    sections = [("records", records.tobytes()), ("strings", b"".join(heap_parts))]
+    if "id" in catalog.columns:
+        # (id, row) sorted by id, for lookups by id with a binary search
+        ids = catalog.array("id")
+        order = np.argsort(ids, kind="stable")
+        id_index = np.zeros(len(ids), dtype=ID_INDEX_DTYPE)
+        id_index["id"] = ids[order]
+        id_index["row"] = order
+        sections.append(("id_index", id_index.tobytes()))
+    sections += [(f"blob:{name}", data) for name, data in (blobs or {}).items()]
+
+    header = {
+        "format": FORMAT_VERSION,
+        "count": len(catalog),
+        "dtype": dtype.descr,
+        "categories": categories,
+        "meta": meta or {},
+        "sections": {},
+    }
+    # Section offsets depend on the header size, so lay out with a size estimate and settle it
+    header_size = 0
+    while True:
+        offset = _align(len(MAGIC) + 4 + header_size)
+        for name, data in sections:
+            header["sections"][name] = [offset, len(data)]
+            offset = _align(offset + len(data))
+        encoded = json.dumps(header).encode("utf-8")
+        if len(encoded) <= header_size:
+            break
+        header_size = len(encoded) + 256
+
+    # The cache is rebuilt from its CSV, so it needs no generation of its own
+    with AtomicWriter(path, "wb", generation=False, file_mode=0o644) as writer:
+        writer.file.write(MAGIC + struct.pack("<I", header_size) + encoded.ljust(header_size))
+        for name, data in sections:
+            writer.file.seek(header["sections"][name][0])
+            writer.file.write(data)
+
+class CatalogFile:
+    """A catalog file mapped read-only; columns are views into the mapping"""
+
+    def __init__(self, path: str, model: Type):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog file")
+        (header_size,) = struct.unpack_from("<I", self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._map[start:start + header_size]))
+        self.meta = self.header["meta"]
+        self.catalog = self._open_catalog(model)
+
+    def _section(self, name: str) -> memoryview:
+        offset, size = self.header["sections"][name]
+        return memoryview(self._map)[offset:offset + size]
+
+    def _open_catalog(self, model: Type) -> CompactCatalog:
+        count = self.header["count"]
+        dtype = np.dtype([tuple(field) for field in self.header["dtype"]])
+        records = np.frombuffer(self._section("records"), dtype=dtype, count=count)
+        heap = self._section("strings")
+        categories = self.header["categories"]
+
+        columns = {}
+        for field in model_fields(model):
+            if field in categories:
+                columns[field] = CategoricalColumn(records[field], categories[field])
+            elif f"{field}_start" in dtype.names:
+                columns[field] = StringColumn(heap, records[f"{field}_start"], records[f"{field}_len"])
+            else:
+                columns[field] = NumericColumn(records[field])
+        return CompactCatalog(model, columns, count)
+
+    def blob(self, name: str) -> Optional[memoryview]:
+        """A named blob written with the catalog, without copying it"""
+        if f"blob:{name}" not in self.header["sections"]:
+            return None
+        return self._section(f"blob:{name}")
+
+    def row_range(self, start: int, stop: int) -> CompactCatalog:
+        """Rows ``start:stop`` as views into the mapping"""
+        return self.catalog[start:stop]
+
+    def find(self, product_id: int, start: int = 0, stop: Optional[int] = None) -> Optional[int]:
+        """Row holding ``product_id`` within rows ``start:stop``, or None"""
+        if "id_index" not in self.header["sections"]:
+            return None
+        index = np.frombuffer(self._section("id_index"), dtype=ID_INDEX_DTYPE, count=self.header["count"])
+        ids = index["id"]
+        low, high = np.searchsorted(ids, product_id, "left"), np.searchsorted(ids, product_id, "right")
+        stop = self.header["count"] if stop is None else stop
+        for row in index["row"][low:high].tolist():
+            if start <= row < stop:
+                return row
+        return None
@@ -0,0 +1,49 @@
+"""The multi-store product model and store table, shared by the API and the offline tools.
+
+Kept apart from multi_store_api so scripts and benchmarks can use them
+without importing the API (which opens its job databases and builds the app).
+"""
+import os
+from typing import Optional
+
+from pydantic import BaseModel
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+class Product(BaseModel):
+    id: int
+    name: str
+    price: float
+    image: str
+    brand: str
+    category: str
+    store: str
+    availability: str
+    rating: float
+    description: Optional[str] = ""
+    link: Optional[str] = ""
+    timestamp: str
+
+# Store configuration
+STORES = {
+    "microohm": {
+        "name": "Microohm",
+        "url": "https://microohm-eg.com",
+        "csv_file": "microohm_products.csv"
+    },
+    "electrohub": {
+        "name": "ElectroHub", 
+        "url": "https://electrohub.com.eg",
+        "csv_file": "electrohub_products.csv"
+    },
+    "ekostra": {
+        "name": "Ekostra",
+        "url": "https://ekostra.com",
+        "csv_file": "ekostra_products.csv"
+    },
+    "ram": {
+        "name": "RAM Electronics",
+        "url": "https://ram-e-shop.com",
+        "csv_file": "ram_products.csv"
+    }
+}
@@ -0,0 +1,68 @@
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+from starlette.requests import Request
+from starlette.responses import Response
+
+from catalog_version import etag_matches, make_etag, not_modified
+from compact_catalog import CompactCatalog
+from facets import FacetIndex
+from fast_json import compressed_body, dumps, json_response, negotiate_encoding
+
+class CatalogSnapshot:
+    """Immutable catalog at one version, with everything readers need prebuilt.
+
+    Writers build a new snapshot and publish it by rebinding a single
+    module-level reference; a request reads that reference once and then
+    works on a consistent catalog without taking any lock. ``products`` is a
+    CompactCatalog. ``responses`` maps a key to a function of the products
+    whose result is encoded to JSON up front; compressed variants are added
+    the first time a client asks for them.
+    """
+
+    def __init__(self, products: CompactCatalog, version: int, epoch: str,
+                 responses: Dict[str, Callable[[CompactCatalog], Any]]):
+        self.products = products
+        self.version = version
+        self.epoch = epoch
+
+        self.store_rows = products.rows_by("store")
+        self.max_id = int(products.array("id").max()) if len(products) else 0
+        self.facets = FacetIndex.from_compact(products)
+
+        self._bodies = {key: {"identity": dumps(build(products))} for key, build in responses.items()}
+
+    def store_products(self, store: str) -> CompactCatalog:
+        """One store's products (a view sharing this snapshot's text buffers)"""
+        rows = self.store_rows.get(store)
+        if rows is None:
+            return self.products.take([])
+        return self.products.take(rows)
+
+    def other_products(self, store: str) -> CompactCatalog:
+        """Every product not from ``store``"""
+        rows = self.store_rows.get(store)
+        if rows is None:
+            return self.products
+        keep = np.ones(len(self.products), dtype=bool)
+        keep[rows] = False
+        return self.products.take(np.flatnonzero(keep))
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def etag(self, key: str, encoding: str = "identity") -> str:
+        return make_etag(key, self.epoch, self.version, encoding)
+
+    def body(self, key: str, encoding: str = "identity") -> Tuple[bytes, str]:
+        """Return ``(body, encoding)`` for a prebuilt response"""
+        return compressed_body(self._bodies[key], encoding)
+
+    def response(self, request: Request, key: str) -> Response:
+        """Prebuilt JSON response with a strong ETag, or a 304 on a match"""
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        etag = self.etag(key, encoding)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        body, encoding = self.body(key, encoding)
+        return json_response(body, encoding, headers={"ETag": etag})
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from typing import Callable, Hashable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from metrics import record_cache
+
+class CatalogVersion:
+    """Monotonic catalog version, bumped whenever product data changes.
+
+    Writers in this process call ``bump()``. When a ``signature`` callable is
+    given (e.g. CSV mtimes), it is re-checked at most every ``interval``
+    seconds so files rewritten by other processes still bump the version
+    without every request touching storage.
+    """
+
+    def __init__(self, signature: Optional[Callable[[], Hashable]] = None, interval: float = 2.0):
+        # Unique per process so ETags from a previous run never match
+        self.epoch = f"{os.getpid():x}{time.time_ns():x}"
+        self._value = 0
+        self._lock = threading.Lock()
+        self._signature = signature
+        self._interval = interval
+        self._last_signature = signature() if signature else None
+        self._last_check = time.monotonic()
+
+    @property
+    def value(self) -> int:
+        if self._signature is not None and time.monotonic() - self._last_check >= self._interval:
+            self._check_signature()
+        return self._value
+
+    def _check_signature(self):
+        with self._lock:
+            self._last_check = time.monotonic()
+            signature = self._signature()
+            if signature != self._last_signature:
+                self._last_signature = signature
+                self._value += 1
+
+    def bump(self) -> int:
+        """Record a change and return the new version"""
+        with self._lock:
+            self._value += 1
+            if self._signature is not None:
+                # Our own write shouldn't count twice on the next check
+                self._last_signature = self._signature()
+                self._last_check = time.monotonic()
+            return self._value
+
+    def etag(self, key: str, version: Optional[int] = None, encoding: str = "identity") -> str:
+        """Strong ETag for ``key`` at the given (or current) version, in one content coding"""
+        if version is None:
+            version = self.value
+        return make_etag(key, self.epoch, version, encoding)
+
+def make_etag(key: str, epoch: str, version: int, encoding: str = "identity") -> str:
+    """Strong ETag; each content coding is its own representation, so it gets its own tag"""
+    suffix = "" if encoding == "identity" else f"-{encoding}"
+    return f'"{key}-{epoch}-{version}{suffix}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the request's If-None-Match covers ``etag``"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        matched = True
+    else:
+        # If-None-Match uses the weak comparison function
+        candidates = [tag.strip() for tag in header.split(",")]
+        matched = any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+    record_cache("etag", matched)
+    return matched
+
+def not_modified(etag: str, vary_encoding: bool = True) -> Response:
+    """Empty 304 response carrying the current ETag (and the Vary of the 200 it stands for)"""
+    headers = {"ETag": etag}
+    if vary_encoding:
+        headers["Vary"] = "Accept-Encoding"
+    return Response(status_code=304, headers=headers)
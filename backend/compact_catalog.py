@@ -0,0 +1,320 @@
+import sys
+from typing import Any, Dict, Iterator, List, Sequence, Type
+
+import numpy as np
+
+# Low-cardinality text fields, stored as small integer codes into a table of interned strings
+CATEGORICAL_FIELDS = ("brand", "category", "store", "availability")
+# read_csv dtypes so those columns load as pandas categoricals instead of one str per cell
+CATEGORICAL_DTYPES = {field: "category" for field in CATEGORICAL_FIELDS}
+INT_FIELDS = ("id",)
+FLOAT_FIELDS = ("price", "rating")
+
+# Rows materialized per batch while iterating
+ITER_CHUNK_ROWS = 4096
+
+def model_fields(model: Type) -> List[str]:
+    """Field names of a Pydantic model (v2 or v1)"""
+    fields = getattr(model, "model_fields", None)
+    if fields is None:
+        fields = model.__fields__
+    return list(fields)
+
+def _code_dtype(categories: int):
+    if categories <= 1 << 8:
+        return np.uint8
+    if categories <= 1 << 16:
+        return np.uint16
+    return np.int32
+
+class NumericColumn:
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    @classmethod
+    def concat(cls, columns: Sequence["NumericColumn"]) -> "NumericColumn":
+        return cls(np.concatenate([column.array for column in columns]))
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes
+
+    def get(self, row: int):
+        return self.array[row].item()
+
+    def values(self, start: int = 0, stop: int = None) -> list:
+        return self.array[start:stop].tolist()
+
+    def take(self, rows: np.ndarray) -> "NumericColumn":
+        return NumericColumn(self.array[rows])
+
+class CategoricalColumn:
+    """Integer codes into a table of interned strings"""
+
+    def __init__(self, codes: np.ndarray, categories: List[str]):
+        self.codes = codes
+        self.categories = categories
+        self._lookup = np.array(categories, dtype=object)
+
+    @classmethod
+    def encode(cls, values: Sequence[str]) -> "CategoricalColumn":
+        table: Dict[str, int] = {}
+        codes = [table.setdefault(value, len(table)) for value in values]
+        return cls(np.array(codes, dtype=_code_dtype(len(table))), [sys.intern(value) for value in table])
+
+    @classmethod
+    def concat(cls, columns: Sequence["CategoricalColumn"]) -> "CategoricalColumn":
+        table: Dict[str, int] = {}
+        parts = []
+        for column in columns:
+            remap = np.array([table.setdefault(value, len(table)) for value in column.categories], dtype=np.int64)
+            parts.append(remap[column.codes] if len(column.codes) else column.codes.astype(np.int64))
+        codes = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        return cls(codes.astype(_code_dtype(len(table))), list(table))
+
+    @property
+    def nbytes(self) -> int:
+        # Interned strings are shared with the rest of the process; count them once here
+        return self.codes.nbytes + self._lookup.nbytes + sum(sys.getsizeof(value) for value in self.categories)
+
+    def get(self, row: int) -> str:
+        return self.categories[self.codes[row]]
+
+    def values(self, start: int = 0, stop: int = None) -> list:
+        return self._lookup[self.codes[start:stop]].tolist()
+
+    def take(self, rows: np.ndarray) -> "CategoricalColumn":
+        return CategoricalColumn(self.codes[rows], self.categories)
+
+    def rows_by_value(self) -> Dict[str, np.ndarray]:
+        """Row numbers holding each category, in row order"""
+        order = np.argsort(self.codes, kind="stable")
+        bounds = np.searchsorted(self.codes[order], np.arange(len(self.categories) + 1))
+        return {
+            value: order[bounds[code]:bounds[code + 1]]
+            for code, value in enumerate(self.categories)
+            if bounds[code + 1] > bounds[code]
+        }
+
+class StringColumn:
+    """UTF-8 strings packed into one buffer, addressed by (start, length) per row"""
+
+    def __init__(self, buffer: bytes, starts: np.ndarray, lengths: np.ndarray):
+        self.buffer = buffer
+        self.starts = starts
+        self.lengths = lengths
+
+    @classmethod
+    def encode(cls, values: Sequence[str]) -> "StringColumn":
+        encoded = [value.encode("utf-8") for value in values]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int32, count=len(encoded))
+        starts = np.zeros(len(encoded), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        return cls(b"".join(encoded), starts, lengths)
+
+    @classmethod
+    def concat(cls, columns: Sequence["StringColumn"]) -> "StringColumn":
+        offsets = np.cumsum([0] + [len(column.buffer) for column in columns])
+        return cls(
+            b"".join(column.buffer for column in columns),
+            np.concatenate([column.starts + offset for column, offset in zip(columns, offsets)]),
+            np.concatenate([column.lengths for column in columns])
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.starts.nbytes + self.lengths.nbytes
+
+    def get(self, row: int) -> str:
+        start = int(self.starts[row])
+        return str(self.buffer[start:start + int(self.lengths[row])], "utf-8")
+
+    def values(self, start: int = 0, stop: int = None) -> list:
+        # The buffer may be bytes or a memoryview into a mapped catalog file
+        buffer = self.buffer
+        return [
+            str(buffer[offset:offset + length], "utf-8")
+            for offset, length in zip(self.starts[start:stop].tolist(), self.lengths[start:stop].tolist())
+        ]
+
+    def take(self, rows: np.ndarray) -> "StringColumn":
+        # Shares the buffer; only the addressing is copied
+        return StringColumn(self.buffer, self.starts[rows], self.lengths[rows])
+
+    def join(self, separator: bytes = b"\n") -> bytes:
+        """UTF-8 of every value followed by ``separator``, gathered from the buffer with numpy"""
+        lengths = self.lengths.astype(np.int64)
+        step = lengths + len(separator)
+        out_starts = np.zeros(len(lengths), dtype=np.int64)
+        np.cumsum(step[:-1], out=out_starts[1:])
+        out = np.empty(int(step.sum()), dtype=np.uint8)
+        # Row and offset within the row of every value byte
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        out[out_starts[rows] + offsets] = np.frombuffer(self.buffer, dtype=np.uint8)[self.starts[rows] + offsets]
+        for i, byte in enumerate(separator):
+            out[out_starts + lengths + i] = byte
+        return out.tobytes()
+
+def _empty_column(field: str):
+    if field in INT_FIELDS:
+        return NumericColumn(np.zeros(0, dtype=np.int64))
+    if field in FLOAT_FIELDS:
+        return NumericColumn(np.zeros(0, dtype=np.float64))
+    if field in CATEGORICAL_FIELDS:
+        return CategoricalColumn(np.zeros(0, dtype=np.uint8), [])
+    return StringColumn(b"", np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32))
+
+def _categorical_from_series(series) -> CategoricalColumn:
+    """Reuse a pandas categorical's codes (read with CATEGORICAL_DTYPES) or factorize"""
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = [sys.intern(str(value)) for value in series.cat.categories]
+        codes = series.cat.codes.to_numpy()
+        if (codes < 0).any():
+            # Missing cells become "" like everywhere else
+            if "" not in categories:
+                categories.append("")
+            codes = np.where(codes < 0, categories.index(""), codes)
+    else:
+        codes, uniques = pd.factorize(series.fillna("").astype(str))
+        categories = [sys.intern(value) for value in uniques]
+    return CategoricalColumn(codes.astype(_code_dtype(len(categories))), categories)
+
+class CompactCatalog:
+    """Read-only, columnar list of products.
+
+    Ids, prices and ratings live in numpy arrays, brand/category/store/
+    availability are codes into interned string tables, and every other text
+    field is packed into a StringColumn. Indexing or iterating materializes
+    ``model`` instances on the fly (without re-validating them), so code
+    written against a list of Products keeps working while the catalog itself
+    takes a fraction of the memory. ``to_dicts`` goes straight from the
+    columns to plain dicts for encoding.
+    """
+
+    def __init__(self, model: Type, columns: Dict[str, Any], size: int):
+        self.model = model
+        self.columns = columns
+        self.size = size
+        self._construct = getattr(model, "model_construct", None) or model.construct
+
+    @classmethod
+    def empty(cls, model: Type) -> "CompactCatalog":
+        return cls(model, {field: _empty_column(field) for field in model_fields(model)}, 0)
+
+    @classmethod
+    def from_products(cls, products: Sequence, model: Type) -> "CompactCatalog":
+        """Pack model instances (or anything with the same attributes)"""
+        if isinstance(products, CompactCatalog):
+            return products
+        products = list(products)
+        if not products:
+            return cls.empty(model)
+
+        columns = {}
+        for field in model_fields(model):
+            values = [getattr(product, field, None) for product in products]
+            if field in INT_FIELDS:
+                columns[field] = NumericColumn(np.array(values, dtype=np.int64))
+            elif field in FLOAT_FIELDS:
+                columns[field] = NumericColumn(np.array(values, dtype=np.float64))
+            elif field in CATEGORICAL_FIELDS:
+                columns[field] = CategoricalColumn.encode([str(value) for value in values])
+            else:
+                columns[field] = StringColumn.encode(["" if value is None else str(value) for value in values])
+        return cls(model, columns, len(products))
+
+    @classmethod
+    def from_frame(cls, frame, model: Type) -> "CompactCatalog":
+        """Pack a DataFrame (e.g. a store CSV) column by column"""
+        import pandas as pd
+
+        size = len(frame)
+        if not size:
+            return cls.empty(model)
+
+        columns = {}
+        for field in model_fields(model):
+            if field in frame:
+                series = frame[field]
+            else:
+                series = pd.Series([""] * size, index=frame.index)
+            if field in INT_FIELDS:
+                columns[field] = NumericColumn(series.to_numpy(dtype=np.int64))
+            elif field in FLOAT_FIELDS:
+                columns[field] = NumericColumn(series.to_numpy(dtype=np.float64))
+            elif field in CATEGORICAL_FIELDS:
+                columns[field] = _categorical_from_series(series)
+            else:
+                columns[field] = StringColumn.encode(series.fillna("").astype(str).tolist())
+        return cls(model, columns, size)
+
+    @classmethod
+    def concat(cls, catalogs: Sequence["CompactCatalog"], model: Type) -> "CompactCatalog":
+        """One catalog holding every row of ``catalogs`` in order"""
+        catalogs = [catalog for catalog in catalogs if len(catalog)]
+        if not catalogs:
+            return cls.empty(model)
+        if len(catalogs) == 1:
+            return catalogs[0]
+        columns = {
+            field: type(catalogs[0].columns[field]).concat([catalog.columns[field] for catalog in catalogs])
+            for field in model_fields(model)
+        }
+        return cls(model, columns, sum(len(catalog) for catalog in catalogs))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return self.take(row)
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError("catalog index out of range")
+        return self._construct(**{field: column.get(row) for field, column in self.columns.items()})
+
+    def __iter__(self) -> Iterator:
+        fields = list(self.columns)
+        for start in range(0, self.size, ITER_CHUNK_ROWS):
+            stop = start + ITER_CHUNK_ROWS
+            values = [column.values(start, stop) for column in self.columns.values()]
+            for row in zip(*values):
+                yield self._construct(**dict(zip(fields, row)))
+
+    def column(self, field: str) -> list:
+        """All values of one field as Python objects"""
+        return self.columns[field].values()
+
+    def array(self, field: str) -> np.ndarray:
+        """The numpy array behind a numeric field"""
+        return self.columns[field].array
+
+    def take(self, rows) -> "CompactCatalog":
+        """Catalog of the given row numbers (or slice); text buffers are shared, not copied.
+
+        A slice gives views into this catalog's arrays without copying anything.
+        """
+        if isinstance(rows, slice):
+            size = len(range(*rows.indices(self.size)))
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            size = len(rows)
+        return CompactCatalog(self.model, {field: column.take(rows) for field, column in self.columns.items()}, size)
+
+    def rows_by(self, field: str) -> Dict[str, np.ndarray]:
+        """Row numbers per value of a categorical field"""
+        return self.columns[field].rows_by_value()
+
+    def to_dicts(self) -> List[Dict]:
+        """Every row as a plain dict in model field order"""
+        fields = list(self.columns)
+        values = [column.values() for column in self.columns.values()]
+        return [dict(zip(fields, row)) for row in zip(*values)]
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns"""
+        return sum(column.nbytes for column in self.columns.values())
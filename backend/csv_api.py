@@ -2,9 +2,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List
-import pandas as pd
+import csv
 import os
 from datetime import datetime
+import metrics
+import profiling
+from atomic_files import AtomicWriter, read_consistent
 
 app = FastAPI(title="Egypt Electronics API")
 
@@ -16,6 +19,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfileRequestMiddleware)
+app.include_router(profiling.router)
 
 # Pydantic models
 class Product(BaseModel):
@@ -36,6 +42,14 @@ class ScrapeStatus(BaseModel):
 
 # CSV file path
 CSV_FILE = os.path.join(os.path.dirname(__file__), 'products.csv')
+CSV_FIELDS = ['name', 'price', 'image', 'brand', 'category', 'store', 'availability', 'rating']
+
+def _to_float(value) -> float:
+    """Numeric CSV cell; blank or malformed cells count as 0.0 instead of failing the whole file"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
 
 def load_products_from_csv():
     """Load products from CSV file"""
@@ -43,20 +57,22 @@ def load_products_from_csv():
         if not os.path.exists(CSV_FILE):
             return []
         
-        df = pd.read_csv(CSV_FILE)
+        # The csv module rather than pandas: this file is small and the
+        # server should not pay for importing pandas at startup
+        rows = read_consistent(CSV_FILE, lambda f: list(csv.DictReader(f)), newline='').value
         products = []
         
-        for idx, row in df.iterrows():
+        for idx, row in enumerate(rows):
             product = Product(
                 id=idx + 1,
                 name=str(row['name']),
-                price=float(row['price']),
+                price=_to_float(row['price']),
                 image=str(row['image']),
                 brand=str(row['brand']),
                 category=str(row['category']),
                 store=str(row['store']),
                 availability=str(row['availability']),
-                rating=float(row['rating'])
+                rating=_to_float(row['rating'])
             )
             products.append(product)
         
@@ -81,8 +97,10 @@ def save_products_to_csv(products: List[Product]):
                 'rating': product.rating
             })
         
-        df = pd.DataFrame(data)
-        df.to_csv(CSV_FILE, index=False)
+        with AtomicWriter(CSV_FILE, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.DictWriter(out.file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(data)
         return True
     except Exception as e:
         print(f"Error saving CSV: {e}")
@@ -92,6 +110,11 @@ def save_products_to_csv(products: List[Product]):
 products_db = load_products_from_csv()
 print(f"Loaded {len(products_db)} products from CSV")
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics of this process"""
+    return metrics.metrics_response()
+
 @app.get("/")
 async def root():
     return {
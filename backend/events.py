@@ -0,0 +1,104 @@
+import asyncio
+import collections
+import itertools
+import threading
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fast_json import dumps
+
+# Comment line sent when nothing happened for a while, keeps proxies from timing out
+HEARTBEAT_SECONDS = 15
+
+class EventBus:
+    """Fan-out of scrape events from worker threads to SSE clients.
+
+    ``publish`` may be called from any thread; each subscriber gets its own
+    asyncio queue on its event loop. The last ``history`` events are kept so
+    a reconnecting EventSource can resume from its Last-Event-ID.
+    """
+
+    def __init__(self, history: int = 200, queue_size: int = 1000):
+        self._ids = itertools.count(1)
+        self._history = collections.deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.queue_size = queue_size
+
+    def publish(self, event: str, data: Dict):
+        with self._lock:
+            item = (next(self._ids), event, data)
+            self._history.append(item)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, item)
+            except RuntimeError:
+                # Subscriber's loop already closed; it unsubscribes itself
+                pass
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item):
+        if queue.full():
+            # Slow client: drop the oldest event rather than grow without bound
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> "Subscription":
+        """Start receiving events, replaying history after ``last_event_id``.
+
+        Must be called from the subscriber's event loop.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        subscription = Subscription(self, asyncio.get_running_loop(), queue)
+        with self._lock:
+            if last_event_id is not None:
+                for item in self._history:
+                    if item[0] > last_event_id:
+                        self._offer(queue, item)
+            self._subscribers.add(subscription.key)
+        return subscription
+
+    def unsubscribe(self, subscription: "Subscription"):
+        with self._lock:
+            self._subscribers.discard(subscription.key)
+
+class Subscription:
+    def __init__(self, bus: EventBus, loop, queue: asyncio.Queue):
+        self.bus = bus
+        self.key = (loop, queue)
+        self.queue = queue
+
+    async def next(self, timeout: float) -> Optional[Tuple[int, str, Dict]]:
+        """Next ``(id, event, data)``, or None if nothing arrived within ``timeout``"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+def format_sse(event_id: int, event: str, data: Dict) -> bytes:
+    """Encode one Server-Sent Event"""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event.encode("utf-8"), dumps(data))
+
+async def sse_stream(bus: EventBus, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Body for a text/event-stream response"""
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+
+    # Subscribe before the first byte goes out, so whatever the client starts once the stream opens is seen
+    subscription = bus.subscribe(resume_from)
+    try:
+        # Tell EventSource how long to wait before reconnecting
+        yield b"retry: 3000\n\n"
+        while True:
+            item = await subscription.next(HEARTBEAT_SECONDS)
+            if item is None:
+                yield b": keep-alive\n\n"
+            else:
+                yield format_sse(*item)
+    finally:
+        subscription.close()
@@ -0,0 +1,111 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Same buckets analyze_products.py reports on
+PRICE_BUCKETS = [
+    ("Under 100 EGP", 0, 100),
+    ("100-500 EGP", 100, 500),
+    ("500-1000 EGP", 500, 1000),
+    ("1000-5000 EGP", 1000, 5000),
+    ("Over 5000 EGP", 5000, float("inf")),
+]
+
+FACET_FIELDS = ("brand", "store", "category", "price_range")
+
+def price_bucket(price: float) -> str:
+    """Return the price bucket label for a price"""
+    for label, low, high in PRICE_BUCKETS:
+        if low <= price < high:
+            return label
+    return PRICE_BUCKETS[0][0]
+
+def _bitmap_from_rows(rows: Sequence[int], size: int) -> int:
+    """Pack sorted row ids into an int bitmap (bit i set = row i matches)"""
+    bits = np.zeros(size, dtype=bool)
+    bits[np.asarray(rows, dtype=np.int64)] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+def price_bucket_rows(prices: np.ndarray) -> Dict[str, np.ndarray]:
+    """Row numbers per price bucket label, like price_bucket over an array"""
+    buckets = np.zeros(len(prices), dtype=np.int8)
+    for i, (_, low, high) in enumerate(PRICE_BUCKETS):
+        buckets[(prices >= low) & (prices < high)] = i
+    rows = {label: np.flatnonzero(buckets == i) for i, (label, _, _) in enumerate(PRICE_BUCKETS)}
+    return {label: bucket_rows for label, bucket_rows in rows.items() if len(bucket_rows)}
+
+def _facet_value(product, field: str) -> str:
+    if field == "price_range":
+        return price_bucket(float(product.price))
+    return str(getattr(product, field))
+
+class FacetIndex:
+    """Bitmap index over brand/store/category/price bucket.
+
+    Each facet value maps to the sorted list of row ids holding it and to a
+    Python int used as a bitmap over those rows, so intersecting filters is a
+    handful of big-int ANDs and counting is ``int.bit_count``.
+    """
+
+    def __init__(self, products: Sequence):
+        row_ids: Dict[str, Dict[str, List[int]]] = {field: {} for field in FACET_FIELDS}
+        for row, product in enumerate(products):
+            for field in FACET_FIELDS:
+                row_ids[field].setdefault(_facet_value(product, field), []).append(row)
+        self._build(len(products), row_ids)
+
+    @classmethod
+    def from_compact(cls, catalog) -> "FacetIndex":
+        """Build from a CompactCatalog's columns without materializing products"""
+        row_ids = {field: catalog.rows_by(field) for field in FACET_FIELDS if field != "price_range"}
+        row_ids["price_range"] = price_bucket_rows(catalog.array("price"))
+        index = cls.__new__(cls)
+        index._build(len(catalog), row_ids)
+        return index
+
+    def _build(self, size: int, row_ids: Dict[str, Dict[str, Sequence[int]]]):
+        self.size = size
+        self.all_rows = (1 << self.size) - 1
+        self.row_ids = row_ids
+        self.bitmaps: Dict[str, Dict[str, int]] = {
+            field: {value: _bitmap_from_rows(rows, self.size) for value, rows in values.items()}
+            for field, values in self.row_ids.items()
+        }
+
+    def _field_mask(self, field: str, values: Iterable[str]) -> int:
+        """OR together the bitmaps of the selected values of one facet"""
+        mask = 0
+        for value in values:
+            mask |= self.bitmaps[field].get(value, 0)
+        return mask
+
+    def _mask(self, filters: Dict[str, List[str]], skip: Optional[str] = None) -> int:
+        """AND the per-facet masks, optionally leaving one facet out"""
+        mask = self.all_rows
+        for field, values in filters.items():
+            if field == skip or not values:
+                continue
+            mask &= self._field_mask(field, values)
+        return mask
+
+    def counts(self, filters: Dict[str, List[str]]) -> Dict:
+        """Count every facet value under the current filter combination.
+
+        A facet's own selection is left out when counting that facet, so the
+        dropdowns keep showing the alternatives the user can switch to.
+        """
+        filters = {field: values for field, values in filters.items() if field in FACET_FIELDS and values}
+        facets = {}
+        for field in FACET_FIELDS:
+            mask = self._mask(filters, skip=field)
+            counts = {value: (bitmap & mask).bit_count() for value, bitmap in self.bitmaps[field].items()}
+            if field == "price_range":
+                facets[field] = {label: counts.get(label, 0) for label, _, _ in PRICE_BUCKETS}
+            else:
+                facets[field] = dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+        return {
+            "total": self._mask(filters).bit_count(),
+            "filters": filters,
+            "facets": facets,
+        }
@@ -0,0 +1,147 @@
+import gzip
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from metrics import record_cache
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip is offered without it
+    brotli = None
+
+# Content codings this process can produce
+ENCODINGS = ("br", "gzip", "identity") if brotli is not None else ("gzip", "identity")
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+def _default(obj: Any):
+    """Serialize Pydantic models without re-validating them"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(obj: Any) -> bytes:
+    """Encode to compact UTF-8 JSON bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick br, gzip or identity from an Accept-Encoding header"""
+    if not accept_encoding:
+        return "identity"
+
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return "identity"
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with the given content coding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+def compressed_body(bodies: Dict[str, bytes], encoding: str) -> Tuple[bytes, str]:
+    """``(body, encoding)`` from encodings cached in ``bodies``, compressing on first use.
+
+    ``bodies`` holds at least the identity body; small bodies are never compressed.
+    """
+    if len(bodies["identity"]) < MIN_COMPRESS_SIZE:
+        encoding = "identity"
+    if encoding != "identity":
+        record_cache("compressed", encoding in bodies)
+    if encoding not in bodies:
+        # Two requests may both compress; the dict write is atomic and either result is fine
+        bodies[encoding] = compress(bodies["identity"], encoding)
+    return bodies[encoding], encoding
+
+class EncodedResponseCache:
+    """Pre-encoded (and pre-compressed) response bodies per catalog version.
+
+    Only the latest version of each key is kept; compressed variants are
+    produced lazily the first time a client asks for that encoding.
+    """
+
+    def __init__(self, name: str = "responses"):
+        self.name = name
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_body(self, key: str, version: Hashable, build: Callable[[], Any],
+                 encoding: str = "identity") -> Tuple[bytes, str]:
+        """Return ``(body, encoding)`` for ``key`` at ``version``, building it on a miss"""
+        entry = self._entries.get(key)
+        if entry is None or entry["version"] != version:
+            self.misses += 1
+            record_cache(self.name, False)
+            entry = {"version": version, "bodies": {"identity": dumps(build())}}
+            with self._lock:
+                self._entries[key] = entry
+        else:
+            self.hits += 1
+            record_cache(self.name, True)
+
+        return compressed_body(entry["bodies"], encoding)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def json_response(body: bytes, encoding: str, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Wrap already-encoded JSON bytes in a response"""
+    response_headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    if headers:
+        response_headers.update(headers)
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=response_headers)
+
+def cached_json_response(request: Request, cache: EncodedResponseCache, key: str, version: Hashable,
+                         build: Callable[[], Any], headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve ``build()`` as JSON from ``cache``, negotiating compression"""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    body, encoding = cache.get_body(key, version, build, encoding)
+    return json_response(body, encoding, headers=headers)
+
+def encoded_json_response(request: Request, obj: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Encode and compress ``obj`` without caching"""
+    body = dumps(obj)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if len(body) < MIN_COMPRESS_SIZE:
+        encoding = "identity"
+    return json_response(compress(body, encoding), encoding, headers=headers)
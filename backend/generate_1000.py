@@ -1,183 +1,301 @@
-import pandas as pd
+"""Synthetic store catalogs built from per-store templates.
+
+Columns are drawn in bulk with numpy from a seeded generator and written in
+chunks, so the same command scales from the 1000-per-store demo data to
+10M-row test sets:
+
+    python generate_1000.py                               # 1000 per store into data/
+    python generate_1000.py --rows-per-store 2500000 --seed 1 --output /tmp/big
+    python generate_1000.py --rows-per-store 100000 --snapshots 30 --output /tmp/history
+"""
+import argparse
 import os
-from datetime import datetime
-import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
 
-def generate_1000_products_per_store():
-    """Generate 1000 diverse products for each store"""
-    
-    # Product templates and variations
-    base_products = {
-        'microohm': {
-            'categories': ['Development Boards', 'Wireless Modules', 'Components', 'Motors', 'Tools', 'Sensors', 'Displays', 'Power Supplies', 'Kits', 'Robotics'],
-            'brands': ['Arduino', 'Espressif', 'Raspberry Pi', 'Microchip', 'STMicroelectronics', 'Texas Instruments', 'Analog Devices', 'NXP', 'Generic'],
-            'base_names': [
-                'Arduino {} Development Board', 'ESP32 {} Module', 'Raspberry Pi {}', 'STM32 {}', 'PIC {}', 'AVR {}', 'ARM {}', 'FPGA {}', 'Sensor {}', 'Motor {}',
-                'Display {}', 'Power Supply {}', 'Kit {}', 'Robot {}', 'Drone {}', 'Camera {}', 'GPS {}', 'Bluetooth {}', 'WiFi {}', 'LoRa {}'
-            ],
-            'price_ranges': {
-                'Development Boards': (50, 2000),
-                'Wireless Modules': (20, 500),
-                'Components': (5, 200),
-                'Motors': (25, 800),
-                'Tools': (30, 1500),
-                'Sensors': (15, 300),
-                'Displays': (40, 600),
-                'Power Supplies': (100, 3000),
-                'Kits': (200, 5000),
-                'Robotics': (500, 10000)
-            }
-        },
-        'electrohub': {
-            'categories': ['Single Board Computers', 'Microcontrollers', 'Displays', 'Sensors', 'Wireless', 'Accessories', 'Kits', 'Industrial', 'IoT', 'Education'],
-            'brands': ['Raspberry Pi', 'Arduino', 'ESP', 'Samsung', 'LG', 'Sony', 'Panasonic', 'Intel', 'AMD', 'Generic'],
-            'base_names': [
-                'Raspberry Pi {}', 'Arduino {}', 'ESP {}', 'Samsung {}', 'LG {}', 'Sony {}', 'Intel {}', 'AMD {}', 'Display {}', 'Sensor {}',
-                'Module {}', 'Adapter {}', 'Cable {}', 'Case {}', 'Heatsink {}', 'Fan {}', 'Power {}', 'Storage {}', 'Network {}', 'Camera {}'
-            ],
-            'price_ranges': {
-                'Single Board Computers': (100, 2500),
-                'Microcontrollers': (30, 800),
-                'Displays': (50, 1000),
-                'Sensors': (20, 400),
-                'Wireless': (25, 300),
-                'Accessories': (10, 200),
-                'Kits': (150, 3000),
-                'Industrial': (200, 8000),
-                'IoT': (50, 1500),
-                'Education': (100, 4000)
-            }
-        },
-        'ekostra': {
-            'categories': ['RFID', 'Sensors', 'GPS', 'Wireless', 'Modules', 'Test Equipment', 'Security', 'Automation', 'Communication', 'Embedded'],
-            'brands': ['Texas Instruments', 'Analog Devices', 'STMicroelectronics', 'NXP', 'Maxim Integrated', 'Silicon Labs', 'Espressif', 'Generic'],
-            'base_names': [
-                'RFID {}', 'Sensor {}', 'GPS {}', 'Bluetooth {}', 'WiFi {}', 'Module {}', 'Tester {}', 'Security {}', 'Automation {}', 'Communication {}',
-                'Transceiver {}', 'Receiver {}', 'Transmitter {}', 'Controller {}', 'Processor {}', 'Memory {}', 'Interface {}', 'Converter {}', 'Amplifier {}', 'Filter {}'
-            ],
-            'price_ranges': {
-                'RFID': (30, 500),
-                'Sensors': (25, 800),
-                'GPS': (50, 1000),
-                'Wireless': (20, 600),
-                'Modules': (40, 1200),
-                'Test Equipment': (100, 5000),
-                'Security': (80, 2000),
-                'Automation': (150, 4000),
-                'Communication': (60, 1500),
-                'Embedded': (100, 3000)
-            }
-        },
-        'ram': {
-            'categories': ['Test Equipment', 'Power Supplies', 'Components', 'Tools', 'Measurement', 'Industrial', 'Laboratory', 'Calibration', 'Analysis', 'Professional'],
-            'brands': ['Fluke', 'Keysight', 'Tektronix', 'Rigol', 'Siglent', 'BK Precision', 'HP', 'Agilent', 'Generic'],
-            'base_names': [
-                'Digital Multimeter {}', 'Oscilloscope {}', 'Power Supply {}', 'Function Generator {}', 'Spectrum Analyzer {}', 'Logic Analyzer {}', 'Component Tester {}',
-                'LCR Meter {}', 'Frequency Counter {}', 'Arbitrary Waveform Generator {}', 'DC Load {}', 'Battery Tester {}', 'EMI Tester {}', 'Network Analyzer {}',
-                'Signal Generator {}', 'Power Analyzer {}', 'Thermal Camera {}', 'Vibration Analyzer {}', 'Calibration {}', 'Professional {}'
-            ],
-            'price_ranges': {
-                'Test Equipment': (100, 15000),
-                'Power Supplies': (200, 8000),
-                'Components': (50, 1000),
-                'Tools': (80, 3000),
-                'Measurement': (150, 12000),
-                'Industrial': (300, 20000),
-                'Laboratory': (500, 25000),
-                'Calibration': (200, 10000),
-                'Analysis': (400, 30000),
-                'Professional': (1000, 50000)
-            }
+import numpy as np
+import pandas as pd
+
+from atomic_files import AtomicWriter
+from fast_json import dumps
+
+# Product templates and variations
+STORE_TEMPLATES = {
+    'microohm': {
+        'categories': ['Development Boards', 'Wireless Modules', 'Components', 'Motors', 'Tools', 'Sensors', 'Displays', 'Power Supplies', 'Kits', 'Robotics'],
+        'brands': ['Arduino', 'Espressif', 'Raspberry Pi', 'Microchip', 'STMicroelectronics', 'Texas Instruments', 'Analog Devices', 'NXP', 'Generic'],
+        'base_names': [
+            'Arduino {} Development Board', 'ESP32 {} Module', 'Raspberry Pi {}', 'STM32 {}', 'PIC {}', 'AVR {}', 'ARM {}', 'FPGA {}', 'Sensor {}', 'Motor {}',
+            'Display {}', 'Power Supply {}', 'Kit {}', 'Robot {}', 'Drone {}', 'Camera {}', 'GPS {}', 'Bluetooth {}', 'WiFi {}', 'LoRa {}'
+        ],
+        'price_ranges': {
+            'Development Boards': (50, 2000),
+            'Wireless Modules': (20, 500),
+            'Components': (5, 200),
+            'Motors': (25, 800),
+            'Tools': (30, 1500),
+            'Sensors': (15, 300),
+            'Displays': (40, 600),
+            'Power Supplies': (100, 3000),
+            'Kits': (200, 5000),
+            'Robotics': (500, 10000)
+        }
+    },
+    'electrohub': {
+        'categories': ['Single Board Computers', 'Microcontrollers', 'Displays', 'Sensors', 'Wireless', 'Accessories', 'Kits', 'Industrial', 'IoT', 'Education'],
+        'brands': ['Raspberry Pi', 'Arduino', 'ESP', 'Samsung', 'LG', 'Sony', 'Panasonic', 'Intel', 'AMD', 'Generic'],
+        'base_names': [
+            'Raspberry Pi {}', 'Arduino {}', 'ESP {}', 'Samsung {}', 'LG {}', 'Sony {}', 'Intel {}', 'AMD {}', 'Display {}', 'Sensor {}',
+            'Module {}', 'Adapter {}', 'Cable {}', 'Case {}', 'Heatsink {}', 'Fan {}', 'Power {}', 'Storage {}', 'Network {}', 'Camera {}'
+        ],
+        'price_ranges': {
+            'Single Board Computers': (100, 2500),
+            'Microcontrollers': (30, 800),
+            'Displays': (50, 1000),
+            'Sensors': (20, 400),
+            'Wireless': (25, 300),
+            'Accessories': (10, 200),
+            'Kits': (150, 3000),
+            'Industrial': (200, 8000),
+            'IoT': (50, 1500),
+            'Education': (100, 4000)
+        }
+    },
+    'ekostra': {
+        'categories': ['RFID', 'Sensors', 'GPS', 'Wireless', 'Modules', 'Test Equipment', 'Security', 'Automation', 'Communication', 'Embedded'],
+        'brands': ['Texas Instruments', 'Analog Devices', 'STMicroelectronics', 'NXP', 'Maxim Integrated', 'Silicon Labs', 'Espressif', 'Generic'],
+        'base_names': [
+            'RFID {}', 'Sensor {}', 'GPS {}', 'Bluetooth {}', 'WiFi {}', 'Module {}', 'Tester {}', 'Security {}', 'Automation {}', 'Communication {}',
+            'Transceiver {}', 'Receiver {}', 'Transmitter {}', 'Controller {}', 'Processor {}', 'Memory {}', 'Interface {}', 'Converter {}', 'Amplifier {}', 'Filter {}'
+        ],
+        'price_ranges': {
+            'RFID': (30, 500),
+            'Sensors': (25, 800),
+            'GPS': (50, 1000),
+            'Wireless': (20, 600),
+            'Modules': (40, 1200),
+            'Test Equipment': (100, 5000),
+            'Security': (80, 2000),
+            'Automation': (150, 4000),
+            'Communication': (60, 1500),
+            'Embedded': (100, 3000)
+        }
+    },
+    'ram': {
+        'categories': ['Test Equipment', 'Power Supplies', 'Components', 'Tools', 'Measurement', 'Industrial', 'Laboratory', 'Calibration', 'Analysis', 'Professional'],
+        'brands': ['Fluke', 'Keysight', 'Tektronix', 'Rigol', 'Siglent', 'BK Precision', 'HP', 'Agilent', 'Generic'],
+        'base_names': [
+            'Digital Multimeter {}', 'Oscilloscope {}', 'Power Supply {}', 'Function Generator {}', 'Spectrum Analyzer {}', 'Logic Analyzer {}', 'Component Tester {}',
+            'LCR Meter {}', 'Frequency Counter {}', 'Arbitrary Waveform Generator {}', 'DC Load {}', 'Battery Tester {}', 'EMI Tester {}', 'Network Analyzer {}',
+            'Signal Generator {}', 'Power Analyzer {}', 'Thermal Camera {}', 'Vibration Analyzer {}', 'Calibration {}', 'Professional {}'
+        ],
+        'price_ranges': {
+            'Test Equipment': (100, 15000),
+            'Power Supplies': (200, 8000),
+            'Components': (50, 1000),
+            'Tools': (80, 3000),
+            'Measurement': (150, 12000),
+            'Industrial': (300, 20000),
+            'Laboratory': (500, 25000),
+            'Calibration': (200, 10000),
+            'Analysis': (400, 30000),
+            'Professional': (1000, 50000)
         }
     }
-    
-    # Suffixes for product variations
-    suffixes = [
-        'Pro', 'Plus', 'Max', 'Ultra', 'Elite', 'Premium', 'Advanced', 'Professional', 'Industrial', 'Commercial',
-        'Mini', 'Micro', 'Nano', 'Compact', 'Portable', 'Handheld', 'Desktop', 'Rack Mount', 'Panel Mount', 'Board Level',
-        'Kit', 'Set', 'Package', 'Bundle', 'Combo', 'Starter', 'Deluxe', 'Standard', 'Basic', 'Entry Level',
-        'High Speed', 'High Precision', 'High Accuracy', 'High Resolution', 'High Power', 'Low Power', 'Ultra Low Power',
-        'Wireless', 'Bluetooth', 'WiFi', 'Ethernet', 'USB', 'RS232', 'RS485', 'CAN', 'SPI', 'I2C',
-        'Digital', 'Analog', 'Mixed Signal', 'Smart', 'Intelligent', 'Programmable', 'Configurable', 'Modular',
-        'Version 2.0', 'Version 3.0', 'Version 4.0', 'Version 5.0', '2023 Model', '2024 Model', '2025 Model',
-        'Type A', 'Type B', 'Type C', 'Series 1', 'Series 2', 'Series 3', 'Generation 1', 'Generation 2', 'Generation 3',
-        'Model X', 'Model Y', 'Model Z', 'Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon', 'Zeta', 'Eta'
-    ]
-    
-    data_dir = os.path.join(os.path.dirname(__file__), 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    
-    total_products = 0
-    
-    for store_key, store_config in base_products.items():
-        products = []
-        store_name = store_config['brands'][0] if 'microohm' in store_key else store_key.title()
-        
-        print(f"Generating 1000 products for {store_name}...")
-        
-        for i in range(1000):
-            # Select category
-            category = random.choice(store_config['categories'])
-            price_range = store_config['price_ranges'][category]
-            
-            # Select brand
-            brand = random.choice(store_config['brands'])
-            
-            # Generate product name
-            base_name = random.choice(store_config['base_names'])
-            suffix = random.choice(suffixes) if random.random() < 0.7 else ''
-            
-            # Format the name
-            if '{}' in base_name:
-                if suffix:
-                    name = base_name.format(f"{suffix} {i+1}")
-                else:
-                    name = base_name.format(f"Model {i+1}")
+}
+
+# Suffixes for product variations
+SUFFIXES = [
+    'Pro', 'Plus', 'Max', 'Ultra', 'Elite', 'Premium', 'Advanced', 'Professional', 'Industrial', 'Commercial',
+    'Mini', 'Micro', 'Nano', 'Compact', 'Portable', 'Handheld', 'Desktop', 'Rack Mount', 'Panel Mount', 'Board Level',
+    'Kit', 'Set', 'Package', 'Bundle', 'Combo', 'Starter', 'Deluxe', 'Standard', 'Basic', 'Entry Level',
+    'High Speed', 'High Precision', 'High Accuracy', 'High Resolution', 'High Power', 'Low Power', 'Ultra Low Power',
+    'Wireless', 'Bluetooth', 'WiFi', 'Ethernet', 'USB', 'RS232', 'RS485', 'CAN', 'SPI', 'I2C',
+    'Digital', 'Analog', 'Mixed Signal', 'Smart', 'Intelligent', 'Programmable', 'Configurable', 'Modular',
+    'Version 2.0', 'Version 3.0', 'Version 4.0', 'Version 5.0', '2023 Model', '2024 Model', '2025 Model',
+    'Type A', 'Type B', 'Type C', 'Series 1', 'Series 2', 'Series 3', 'Generation 1', 'Generation 2', 'Generation 3',
+    'Model X', 'Model Y', 'Model Z', 'Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon', 'Zeta', 'Eta'
+]
+
+AVAILABILITY = np.array(['In Stock', 'Limited Stock', 'Out of Stock'], dtype=object)
+# Same odds as picking from ['In Stock', 'In Stock', 'In Stock', 'Limited Stock', 'Out of Stock']
+AVAILABILITY_WEIGHTS = [0.6, 0.2, 0.2]
+IMAGE_URL = "https://images.unsplash.com/photo-1553406830-ef2513450d76?w=300&h=300&fit=crop&sig={}_"
+
+FORMATS = {'csv': '.csv', 'ndjson': '.ndjson', 'catalog': '.bin'}
+# Rows generated and written per step; bounds memory for very large stores
+CHUNK_ROWS = 500_000
+
+def store_name(store_key: str) -> str:
+    return STORE_TEMPLATES[store_key]['brands'][0] if 'microohm' in store_key else store_key.title()
+
+def _name_parts(base_names: List[str]):
+    """Split each name template around its '{}' so names can be built by array concatenation"""
+    heads, tails = [], []
+    for base_name in base_names:
+        head, _, tail = base_name.partition('{}') if '{}' in base_name else (base_name + ' ', '', '')
+        heads.append(head)
+        tails.append(tail)
+    return np.array(heads, dtype=object), np.array(tails, dtype=object)
+
+def generate_store_frame(store_key: str, count: int, rng: np.random.Generator, start: int = 0,
+                         timestamp: Optional[str] = None) -> pd.DataFrame:
+    """``count`` products for one store, with ids from ``start + 1``, built column by column"""
+    config = STORE_TEMPLATES[store_key]
+    categories = np.array(config['categories'], dtype=object)
+    brands = np.array(config['brands'], dtype=object)
+    low = np.array([config['price_ranges'][category][0] for category in config['categories']], dtype=np.float64)
+    high = np.array([config['price_ranges'][category][1] for category in config['categories']], dtype=np.float64)
+    heads, tails = _name_parts(config['base_names'])
+
+    index = np.arange(start, start + count)
+    numbers = (index + 1).astype(str).astype(object)
+    category_codes = rng.integers(len(categories), size=count)
+    brand_codes = rng.integers(len(brands), size=count)
+    name_codes = rng.integers(len(heads), size=count)
+
+    # 70% of names get a random suffix, the rest "Model <n>"
+    suffixes = np.array([suffix + ' ' for suffix in SUFFIXES], dtype=object)[rng.integers(len(SUFFIXES), size=count)]
+    labels = np.where(rng.random(count) < 0.7, suffixes, 'Model ') + numbers
+
+    # Uniform within the category's range; 80% of products then vary by up to ±20%, kept in range
+    low, high = low[category_codes], high[category_codes]
+    price = np.round(rng.uniform(low, high), 2)
+    varied = index % 10 < 8
+    price[varied] = np.round(np.clip(price[varied] * (1 + rng.uniform(-0.2, 0.2, varied.sum())),
+                                     low[varied], high[varied]), 2)
+
+    category = categories[category_codes]
+    brand = brands[brand_codes]
+    return pd.DataFrame({
+        'id': index + 1,
+        'name': heads[name_codes] + labels + tails[name_codes],
+        'price': price,
+        'image': IMAGE_URL.format(store_key) + index.astype(str).astype(object),
+        'brand': brand,
+        'category': category,
+        'store': store_name(store_key),
+        'availability': AVAILABILITY[rng.choice(len(AVAILABILITY), size=count, p=AVAILABILITY_WEIGHTS)],
+        'rating': np.round(rng.uniform(3.5, 5.0, count), 1),
+        'description': 'Professional ' + pd.Series(category).str.lower().to_numpy(dtype=object) + ' from '
+                       + brand + '. High quality and reliable performance for all applications.',
+        'link': f"https://{config['brands'][0].lower()}.com/product/" + numbers,
+        'timestamp': timestamp or datetime.now().isoformat(),
+    })
+
+def iter_store_chunks(store_key: str, rows: int, rng: np.random.Generator, chunk_rows: int = CHUNK_ROWS,
+                      timestamp: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """A store's ``rows`` products, ``chunk_rows`` at a time"""
+    for start in range(0, rows, chunk_rows):
+        yield generate_store_frame(store_key, min(chunk_rows, rows - start), rng, start, timestamp)
+
+def write_frames(frames: Iterable[pd.DataFrame], path: str, fmt: str = 'csv') -> int:
+    """Write chunks to one file as they come; returns the row count.
+
+    The catalog format (catalog_file.py) is written in one go, so its chunks
+    are packed into compact columns first and concatenated at the end.
+    """
+    rows = 0
+    if fmt == 'catalog':
+        from catalog_file import write_catalog
+        from compact_catalog import CompactCatalog
+        from catalog_models import Product
+
+        parts = []
+        for frame in frames:
+            parts.append(CompactCatalog.from_frame(frame, Product))
+            rows += len(frame)
+        write_catalog(path, CompactCatalog.concat(parts, Product))
+        return rows
+
+    # Often the live data/ CSVs: readers see the old file until the new one is complete
+    with AtomicWriter(path, 'w', encoding='utf-8', newline='') as writer:
+        for frame in frames:
+            if fmt == 'csv':
+                frame.to_csv(writer.file, header=rows == 0, index=False)
+            elif fmt == 'ndjson':
+                writer.file.write(''.join(dumps(record).decode('utf-8') + '\n' for record in frame.to_dict('records')))
             else:
-                name = f"{base_name} {suffix} {i+1}" if suffix else f"{base_name} {i+1}"
-            
-            # Generate price within category range
-            price = round(random.uniform(price_range[0], price_range[1]), 2)
-            
-            # Add some price variation for similar products
-            if i % 10 < 8:  # 80% of products have small variations
-                price += random.uniform(-price * 0.2, price * 0.2)
-                price = max(price_range[0], min(price_range[1], price))
-                price = round(price, 2)
-            
-            product = {
-                'id': i + 1,
-                'name': name,
-                'price': price,
-                'image': f"https://images.unsplash.com/photo-1553406830-ef2513450d76?w=300&h=300&fit=crop&sig={store_key}_{i}",
-                'brand': brand,
-                'category': category,
-                'store': store_name,
-                'availability': random.choice(['In Stock', 'In Stock', 'In Stock', 'Limited Stock', 'Out of Stock']),
-                'rating': round(random.uniform(3.5, 5.0), 1),
-                'description': f"Professional {category.lower()} from {brand}. High quality and reliable performance for all applications.",
-                'link': f"https://{store_config['brands'][0].lower()}.com/product/{i+1}",
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            products.append(product)
-        
-        # Save to CSV
-        csv_path = os.path.join(data_dir, f'{store_key}_products.csv')
-        df = pd.DataFrame(products)
-        df.to_csv(csv_path, index=False)
-        
-        print(f"Saved {len(products)} products to {csv_path}")
-        total_products += len(products)
-    
-    print(f"\nTOTAL PRODUCTS GENERATED: {total_products}")
-    print("=" * 50)
-    
-    # Generate summary
-    for store_key in base_products.keys():
+                raise ValueError(f"Unknown format: {fmt}")
+            rows += len(frame)
+    return rows
+
+def store_rngs(seed: Optional[int], store_keys: List[str]) -> Dict[str, np.random.Generator]:
+    """Independent generator per store, all derived from ``seed`` (fresh entropy if None)"""
+    sequence = np.random.SeedSequence(seed)
+    print(f"Seed: {sequence.entropy}")
+    return {store_key: np.random.default_rng(child) for store_key, child in zip(store_keys, sequence.spawn(len(store_keys)))}
+
+def generate_catalog(output_dir: str, rows_per_store: int, seed: Optional[int] = None, fmt: str = 'csv',
+                     chunk_rows: int = CHUNK_ROWS, stores: Optional[List[str]] = None) -> Dict[str, int]:
+    """Write ``rows_per_store`` products for each store to ``output_dir``.
+
+    Output for a given seed, size and ``chunk_rows`` is the same on every run
+    (bar the timestamps).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stores = stores or list(STORE_TEMPLATES.keys())
+    counts = {}
+    for store_key, rng in store_rngs(seed, stores).items():
+        path = os.path.join(output_dir, f'{store_key}_products{FORMATS[fmt]}')
+        started = time.perf_counter()
+        counts[store_key] = write_frames(iter_store_chunks(store_key, rows_per_store, rng, chunk_rows), path, fmt)
+        print(f"Saved {counts[store_key]} products to {path} in {time.perf_counter() - started:.1f}s")
+    return counts
+
+def drift_snapshot(store_key: str, frame: pd.DataFrame, rng: np.random.Generator, next_id: int, timestamp: str,
+                   change_rate: float = 0.05, drift: float = 0.03, churn: float = 0.01) -> pd.DataFrame:
+    """The next scrape of a store: what a real store looks like a little later.
+
+    ``change_rate`` of prices move by a log-normal step with sigma ``drift``
+    (with a small upward bias), half as many products change availability,
+    and ``churn`` of the products are delisted and replaced by new ones.
+    """
+    count = len(frame)
+    prices = frame['price'].to_numpy(copy=True)
+    moved = rng.random(count) < change_rate
+    prices[moved] = np.round(prices[moved] * np.exp(rng.normal(drift / 4, drift, moved.sum())), 2)
+
+    availability = frame['availability'].to_numpy(dtype=object, copy=True)
+    flipped = rng.random(count) < change_rate / 2
+    availability[flipped] = AVAILABILITY[rng.choice(len(AVAILABILITY), size=flipped.sum(), p=AVAILABILITY_WEIGHTS)]
+
+    kept = frame.assign(price=prices, availability=availability, timestamp=timestamp)[rng.random(count) >= churn]
+    added = generate_store_frame(store_key, count - len(kept), rng, start=next_id - 1, timestamp=timestamp)
+    return pd.concat([kept, added], ignore_index=True)
+
+def generate_snapshots(output_dir: str, rows_per_store: int, snapshots: int, seed: Optional[int] = None,
+                       fmt: str = 'csv', interval: timedelta = timedelta(days=1), **drift_options) -> int:
+    """Successive scrape snapshots in ``output_dir/snapshot_NNN`` for diff and history benchmarks.
+
+    Snapshot 0 is a fresh catalog; each later one applies ``drift_snapshot``
+    to the one before, stamped ``interval`` later. A store is held in memory
+    while its snapshots are written.
+    """
+    stores = list(STORE_TEMPLATES.keys())
+    started_at = datetime.now() - interval * (snapshots - 1)
+    for store_key, rng in store_rngs(seed, stores).items():
+        frame = generate_store_frame(store_key, rows_per_store, rng, timestamp=started_at.isoformat())
+        next_id = rows_per_store + 1
+        for snapshot in range(snapshots):
+            if snapshot:
+                timestamp = (started_at + interval * snapshot).isoformat()
+                frame = drift_snapshot(store_key, frame, rng, next_id, timestamp, **drift_options)
+                next_id = int(frame['id'].max()) + 1
+            snapshot_dir = os.path.join(output_dir, f'snapshot_{snapshot:03d}')
+            os.makedirs(snapshot_dir, exist_ok=True)
+            path = os.path.join(snapshot_dir, f'{store_key}_products{FORMATS[fmt]}')
+            chunks = (frame.iloc[start:start + CHUNK_ROWS] for start in range(0, len(frame), CHUNK_ROWS))
+            write_frames(chunks, path, fmt)
+        print(f"Wrote {snapshots} snapshots of {store_key} ({len(frame)} products each)")
+    return snapshots
+
+def print_summary(data_dir: str):
+    for store_key in STORE_TEMPLATES.keys():
         csv_path = os.path.join(data_dir, f'{store_key}_products.csv')
         if os.path.exists(csv_path):
-            df = pd.read_csv(csv_path)
+            df = pd.read_csv(csv_path, usecols=['category', 'price'])
             print(f"{store_key.title()}: {len(df)} products")
             
             # Category breakdown
@@ -191,8 +309,39 @@ def generate_1000_products_per_store():
             print(f"  Price range: {prices.min():.2f} - {prices.max():.2f} EGP")
             print(f"  Average price: {prices.mean():.2f} EGP")
             print()
+
+def generate_1000_products_per_store(rows_per_store: int = 1000, seed: Optional[int] = None):
+    """Generate 1000 diverse products for each store"""
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+    total_products = sum(generate_catalog(data_dir, rows_per_store, seed).values())
     
+    print(f"\nTOTAL PRODUCTS GENERATED: {total_products}")
+    print("=" * 50)
+    print_summary(data_dir)
     return total_products
 
 if __name__ == "__main__":
-    generate_1000_products_per_store()
+    parser = argparse.ArgumentParser(description="Generate synthetic store catalogs from the store templates")
+    parser.add_argument("--rows-per-store", type=int, default=1000)
+    parser.add_argument("--seed", type=int, help="same seed, same catalog; random if omitted")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--output", help="output directory (default: data/, replacing the store CSVs)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--snapshots", type=int, default=0,
+                        help="write this many drifting scrape snapshots instead of one catalog")
+    parser.add_argument("--change-rate", type=float, default=0.05, help="share of prices that move per snapshot")
+    parser.add_argument("--drift", type=float, default=0.03, help="sigma of a price move (log scale)")
+    parser.add_argument("--churn", type=float, default=0.01, help="share of products replaced per snapshot")
+    parser.add_argument("--interval-hours", type=float, default=24, help="time between snapshots")
+    args = parser.parse_args()
+
+    if args.snapshots:
+        generate_snapshots(args.output or os.path.join(os.path.dirname(__file__), 'data', 'snapshots'),
+                           args.rows_per_store, args.snapshots, args.seed, args.format,
+                           timedelta(hours=args.interval_hours),
+                           change_rate=args.change_rate, drift=args.drift, churn=args.churn)
+    elif args.output or args.format != 'csv':
+        generate_catalog(args.output or os.path.join(os.path.dirname(__file__), 'data'), args.rows_per_store,
+                         args.seed, args.format, args.chunk_rows)
+    else:
+        generate_1000_products_per_store(args.rows_per_store, args.seed)
@@ -0,0 +1,69 @@
+"""Thumbnail endpoints over the image cache (see image_cache.py).
+
+``GET /api/images/{digest}-{size}.webp`` serves a cached thumbnail. Its
+name is the hash of the original image, so the response never changes
+and is cached for a year. ``GET /api/images?url=...&size=...`` redirects
+from a product's image URL to its thumbnail, or answers 404 while the
+image isn't cached yet (clients then fall back to the original URL).
+``GET /api/images/duplicates`` returns the placeholder flags and
+cross-store matches written by image_hash.py.
+"""
+import os
+import re
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse
+
+from catalog_version import etag_matches, not_modified
+from image_cache import IMAGE_DIR, THUMBNAIL_SIZES, ImageIndex, open_index, thumbnail_path
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Redirects change once an image is (re)fetched, so they are cached briefly
+REDIRECT_MAX_AGE = 3600
+THUMBNAIL_NAME = re.compile(r"^([0-9a-f]{64})-(\d+)\.webp$")
+
+router = APIRouter(prefix="/api/images", tags=["images"])
+
+_index: Optional[ImageIndex] = None
+
+def get_index() -> ImageIndex:
+    global _index
+    if _index is None:
+        _index = open_index(IMAGE_DIR)
+    return _index
+
+@router.get("")
+async def image_thumbnail(url: str, size: int = Query(default=THUMBNAIL_SIZES[0])):
+    """Redirect to the cached thumbnail of a product image URL"""
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {list(THUMBNAIL_SIZES)}")
+    record = get_index().get(url)
+    if record is None or record["status"] != "ok":
+        raise HTTPException(status_code=404, detail="Image not cached" if record is None else record["error"])
+    return RedirectResponse(f"{router.prefix}/{record['digest']}-{size}.webp", status_code=307,
+                            headers={"Cache-Control": f"public, max-age={REDIRECT_MAX_AGE}"})
+
+@router.get("/duplicates")
+async def image_duplicates():
+    """Placeholder images and cross-store candidate matches, as last computed by image_hash.py"""
+    from image_hash import load_duplicates
+
+    report = load_duplicates()
+    if report is None:
+        raise HTTPException(status_code=404, detail="No duplicate report yet - run image_hash.py")
+    return report
+
+@router.get("/{name}")
+async def get_thumbnail(request: Request, name: str):
+    """A cached thumbnail; immutable, since its name is the hash of the original"""
+    match = THUMBNAIL_NAME.match(name)
+    if match is None or int(match.group(2)) not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail="Unknown image")
+    etag = f'"{match.group(1)[:32]}-{match.group(2)}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, vary_encoding=False)
+    path = thumbnail_path(match.group(1), int(match.group(2)), IMAGE_DIR)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Unknown image")
+    return FileResponse(path, media_type="image/webp", headers={"Cache-Control": IMMUTABLE, "ETag": etag})
@@ -0,0 +1,244 @@
+"""Fetch, verify and thumbnail product images into a local content-addressed cache.
+
+Product image URLs point at the stores' sites (and, for generated data,
+Unsplash). ``cache_images`` fetches them concurrently through a bounded
+pool, rejects responses that are not images or are too large, and writes
+resized WebP thumbnails named after the SHA-256 of the original bytes, so
+identical images share one file and a cached file never changes. An
+SQLite index maps each URL to its digest (or why it failed); the API
+serves thumbnails from the cache with immutable cache headers.
+
+    python image_cache.py                    # every store CSV in data/
+    python image_cache.py --store ram --concurrency 16 --refresh
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import metrics
+from atomic_files import write_atomic
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+IMAGE_DIR = os.path.join(DATA_DIR, 'images')
+
+ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+MAX_BYTES = 5 * 1024 * 1024
+MAX_PIXELS = 40_000_000
+# Longest side in pixels; the API serves one of these
+THUMBNAIL_SIZES = (160, 480)
+THUMBNAIL_QUALITY = 80
+CONCURRENCY = 8
+TIMEOUT = 15
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+class ImageRejected(Exception):
+    """The response is not an image we cache (wrong type, too large, undecodable)"""
+
+def thumbnail_path(digest: str, size: int, image_dir: str = IMAGE_DIR) -> str:
+    """Where the ``size`` thumbnail of the image with ``digest`` is cached"""
+    return os.path.join(image_dir, digest[:2], f"{digest}-{size}.webp")
+
+class ImageIndex:
+    """SQLite map from image URL to the digest of its cached image, or the reason it failed"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    url TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    digest TEXT,
+                    content_type TEXT,
+                    bytes INTEGER,
+                    width INTEGER,
+                    height INTEGER,
+                    error TEXT,
+                    fetched_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS images_digest ON images (digest)")
+            # Perceptual hashes per image, filled by image_hash.py
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_hashes (digest TEXT PRIMARY KEY, ahash TEXT NOT NULL, dhash TEXT NOT NULL)"
+            )
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM images WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Dict]:
+        urls = list(urls)
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(urls), 500):
+                batch = urls[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT * FROM images WHERE url IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((row["url"], dict(row)) for row in rows)
+        return found
+
+    def put(self, url: str, status: str, **fields):
+        record = {"url": url, "status": status, "fetched_at": datetime.now().isoformat(), **fields}
+        columns = ", ".join(record)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO images ({columns}) VALUES ({', '.join('?' * len(record))})",
+                tuple(record.values())
+            )
+
+    def hashes(self) -> Dict[str, Dict[str, int]]:
+        """Stored aHash/dHash per image digest"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM image_hashes").fetchall()
+        return {row["digest"]: {"ahash": int(row["ahash"], 16), "dhash": int(row["dhash"], 16)} for row in rows}
+
+    def put_hashes(self, hashes: Dict[str, Dict[str, int]]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_hashes (digest, ahash, dhash) VALUES (?, ?, ?)",
+                [(digest, f"{h['ahash']:016x}", f"{h['dhash']:016x}") for digest, h in hashes.items()]
+            )
+
+    def cached(self) -> List[Dict]:
+        """Every URL whose image is in the cache"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM images WHERE status = 'ok'").fetchall()
+        return [dict(row) for row in rows]
+
+def make_thumbnails(data: bytes, image_dir: str = IMAGE_DIR) -> Dict:
+    """Decode an image, check it, and write its thumbnails (skipping ones already cached)"""
+    # Imported here so the APIs, which import this module for the index, start without Pillow
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError("Thumbnails need Pillow: pip install pillow")
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            if width * height > MAX_PIXELS:
+                raise ImageRejected(f"{width}x{height} is too many pixels")
+            missing = [size for size in THUMBNAIL_SIZES if not os.path.exists(thumbnail_path(digest, size, image_dir))]
+            if missing:
+                # JPEG can decode straight at a reduced scale
+                image.draft("RGB", (max(missing), max(missing)))
+                image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            for size in sorted(missing, reverse=True):
+                image.thumbnail((size, size), Image.LANCZOS)
+                out = io.BytesIO()
+                image.save(out, "WEBP", quality=THUMBNAIL_QUALITY)
+                path = thumbnail_path(digest, size, image_dir)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Named by content, so a thumbnail never changes and needs no generation
+                write_atomic(path, out.getvalue(), generation=False)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageRejected(f"not a decodable image ({type(e).__name__})")
+    return {"digest": digest, "width": width, "height": height}
+
+async def _fetch(client, url: str) -> tuple:
+    """The body and content type of ``url``, refusing non-images and oversized bodies while streaming"""
+    host = urlparse(url).hostname or "unknown"
+    started = time.perf_counter()
+    async with client.stream("GET", url) as response:
+        metrics.SCRAPER_RESPONSES.labels(host=host, status=response.status_code).inc()
+        if response.status_code != 200:
+            raise ImageRejected(f"HTTP {response.status_code}")
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type not in ALLOWED_TYPES:
+            raise ImageRejected(f"content type {content_type or 'missing'}")
+        if int(response.headers.get("content-length") or 0) > MAX_BYTES:
+            raise ImageRejected(f"larger than {MAX_BYTES} bytes")
+        chunks, size = [], 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_BYTES:
+                raise ImageRejected(f"larger than {MAX_BYTES} bytes")
+            chunks.append(chunk)
+    metrics.SCRAPER_FETCH_SECONDS.labels(host=host).observe(time.perf_counter() - started)
+    metrics.SCRAPER_FETCH_BYTES.labels(host=host).inc(size)
+    return b"".join(chunks), content_type
+
+async def cache_images_async(urls: Iterable[str], index: ImageIndex, image_dir: str = IMAGE_DIR,
+                             concurrency: int = CONCURRENCY, refresh: bool = False) -> Dict[str, Dict]:
+    """Fetch and thumbnail every URL not cached yet; returns the index record of each URL"""
+    import httpx
+
+    urls = list(dict.fromkeys(url for url in urls if url and url.startswith(("http://", "https://"))))
+    records = {} if refresh else index.get_many(urls)
+    todo = [url for url in urls if url not in records]
+    pool = asyncio.Semaphore(concurrency)
+
+    async def process(client, url: str):
+        async with pool:
+            try:
+                data, content_type = await _fetch(client, url)
+                # Decoding and resizing is CPU work; keep it off the event loop
+                image = await asyncio.to_thread(make_thumbnails, data, image_dir)
+                index.put(url, "ok", content_type=content_type, bytes=len(data), **image)
+            except ImageRejected as e:
+                index.put(url, "rejected", error=str(e))
+            except Exception as e:
+                # Network errors: recorded, and retried on the next --refresh
+                index.put(url, "error", error=f"{type(e).__name__}: {e}")
+            records[url] = index.get(url)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=TIMEOUT, limits=limits, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT}) as client:
+        await asyncio.gather(*(process(client, url) for url in todo))
+    if todo:
+        logger.info(f"Fetched {len(todo)} images, {sum(records[url]['status'] == 'ok' for url in todo)} cached")
+    return records
+
+def cache_images(urls: Iterable[str], index: Optional[ImageIndex] = None, image_dir: str = IMAGE_DIR,
+                 concurrency: int = CONCURRENCY, refresh: bool = False) -> Dict[str, Dict]:
+    """Blocking wrapper around ``cache_images_async`` for scrapers and scripts"""
+    index = index or open_index(image_dir)
+    return asyncio.run(cache_images_async(urls, index, image_dir, concurrency, refresh))
+
+def open_index(image_dir: str = IMAGE_DIR) -> ImageIndex:
+    os.makedirs(image_dir, exist_ok=True)
+    return ImageIndex(os.path.join(image_dir, "index.db"))
+
+def store_image_urls(csv_path: str) -> List[str]:
+    """The image column of a store CSV"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [row["image"] for row in csv.DictReader(f) if row.get("image")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", action="append", help="store key (default: every *_products.csv in data/)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--refresh", action="store_true", help="re-fetch URLs that are already indexed")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    stores = args.store or sorted(name[:-len("_products.csv")] for name in os.listdir(DATA_DIR)
+                                  if name.endswith("_products.csv"))
+    urls = [url for store in stores for url in store_image_urls(os.path.join(DATA_DIR, f"{store}_products.csv"))]
+    records = cache_images(urls, concurrency=args.concurrency, refresh=args.refresh)
+    statuses: Dict[str, int] = {}
+    for record in records.values():
+        statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+    print(f"{len(records)} image URLs: " + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
+    print(f"{len({record['digest'] for record in records.values() if record['digest']})} distinct images in {IMAGE_DIR}")
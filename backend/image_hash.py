@@ -0,0 +1,217 @@
+"""Perceptual hashes of cached product images: placeholder flags and cross-store matches.
+
+Hashes the cached thumbnail of every image in the image cache (see
+image_cache.py) with aHash and dHash, and indexes the dHashes in a
+BK-tree so near-duplicates are found without comparing every pair.
+Images within ``--distance`` bits are grouped. A group is flagged as a
+placeholder when many differently named products use it (a store logo,
+a language flag, a stock photo) or when it is a flat image. Groups that
+aren't placeholders and span several stores become candidate matches.
+
+    python image_cache.py && python image_hash.py     # writes data/images/duplicates.json
+    python image_hash.py --distance 6 --placeholder-products 10
+"""
+import argparse
+import csv
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from atomic_files import AtomicWriter
+from image_cache import DATA_DIR, IMAGE_DIR, THUMBNAIL_SIZES, ImageIndex, open_index, thumbnail_path
+
+HASH_SIZE = 8
+# Bits (of 64) two dHashes may differ by and still count as the same picture
+MATCH_DISTANCE = 5
+# Distinct product names sharing one image before it counts as a placeholder
+PLACEHOLDER_PRODUCTS = 5
+# aHash bits set (of 64) at or below which, or that far from 64, an image is flat
+FLAT_BITS = 2
+DUPLICATES_FILE = os.path.join(IMAGE_DIR, 'duplicates.json')
+
+def _gray(path: str, width: int, height: int) -> np.ndarray:
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return np.asarray(image.convert("L").resize((width, height), Image.LANCZOS), dtype=np.int16)
+
+def _to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if bit else "0" for bit in bits.ravel()), 2)
+
+def average_hash(path: str) -> int:
+    """64-bit aHash: which pixels of an 8x8 grayscale copy are brighter than its mean"""
+    pixels = _gray(path, HASH_SIZE, HASH_SIZE)
+    return _to_int(pixels > pixels.mean())
+
+def difference_hash(path: str) -> int:
+    """64-bit dHash: whether each pixel of a 9x8 grayscale copy is brighter than its right neighbour"""
+    pixels = _gray(path, HASH_SIZE + 1, HASH_SIZE)
+    return _to_int(pixels[:, :-1] > pixels[:, 1:])
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance.
+
+    A search for everything within ``radius`` of a hash only descends into
+    children whose edge distance lies within ``radius`` of the node's own
+    distance (triangle inequality), so it touches a small part of the tree.
+    """
+
+    def __init__(self):
+        # node: [hash, items, {distance: child}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int, item):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, object]]:
+        """(distance, item) for every item within ``radius`` bits of ``value``"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+def ensure_hashes(index: ImageIndex, image_dir: str = IMAGE_DIR) -> Dict[str, Dict]:
+    """aHash and dHash of every cached image, computing the ones not stored yet"""
+    stored = index.hashes()
+    new = {}
+    for digest in {record["digest"] for record in index.cached()} - set(stored):
+        path = thumbnail_path(digest, THUMBNAIL_SIZES[0], image_dir)
+        if os.path.exists(path):
+            new[digest] = {"ahash": average_hash(path), "dhash": difference_hash(path)}
+    if new:
+        index.put_hashes(new)
+    stored.update(new)
+    return stored
+
+def group_images(hashes: Dict[str, Dict], distance: int = MATCH_DISTANCE) -> Dict[str, str]:
+    """Group id (a member digest) for every digest, joining dHashes within ``distance`` bits"""
+    tree = BKTree()
+    for digest, h in hashes.items():
+        tree.add(h["dhash"], digest)
+
+    parent = {digest: digest for digest in hashes}
+
+    def find(digest):
+        while parent[digest] != digest:
+            parent[digest] = parent[parent[digest]]
+            digest = parent[digest]
+        return digest
+
+    for digest, h in hashes.items():
+        for _, other in tree.search(h["dhash"], distance):
+            a, b = find(digest), find(other)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+    return {digest: find(digest) for digest in hashes}
+
+def store_products(data_dir: str = DATA_DIR) -> Iterable[Dict]:
+    """id, name, store and image of every product in the store CSVs"""
+    for name in sorted(os.listdir(data_dir)):
+        if not name.endswith("_products.csv"):
+            continue
+        store_key = name[:-len("_products.csv")]
+        with open(os.path.join(data_dir, name), newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("image"):
+                    yield {"store": store_key, "id": int(row["id"]), "name": row["name"], "image": row["image"]}
+
+def find_duplicates(products: Iterable[Dict], index: ImageIndex, image_dir: str = IMAGE_DIR,
+                    distance: int = MATCH_DISTANCE, placeholder_products: int = PLACEHOLDER_PRODUCTS) -> Dict:
+    """Placeholder images and cross-store candidate matches among ``products``"""
+    products = list(products)
+    records = index.get_many(product["image"] for product in products)
+    hashes = ensure_hashes(index, image_dir)
+    groups = group_images(hashes, distance)
+
+    members = defaultdict(list)
+    for product in products:
+        record = records.get(product["image"])
+        if record and record["status"] == "ok" and record["digest"] in groups:
+            members[groups[record["digest"]]].append(product)
+
+    placeholders, matches = [], []
+    flagged = defaultdict(list)
+    for group, group_products in members.items():
+        bits = bin(hashes[group]["ahash"]).count("1")
+        flat = bits <= FLAT_BITS or bits >= HASH_SIZE * HASH_SIZE - FLAT_BITS
+        names = {product["name"].strip().lower() for product in group_products}
+        stores = sorted({product["store"] for product in group_products})
+        if flat or len(names) >= placeholder_products:
+            placeholders.append({
+                "digest": group,
+                "reason": "flat" if flat else "shared",
+                "products": len(group_products),
+                "distinct_names": len(names),
+                "stores": stores,
+                "example_image": group_products[0]["image"],
+            })
+            for product in group_products:
+                flagged[product["store"]].append(product["id"])
+        elif len(stores) > 1:
+            matches.append({
+                "digest": group,
+                "stores": stores,
+                "products": [{key: product[key] for key in ("store", "id", "name")} for product in group_products],
+            })
+
+    placeholders.sort(key=lambda placeholder: -placeholder["products"])
+    return {
+        "images_hashed": len(hashes),
+        "image_groups": len(set(groups.values())),
+        "distance": distance,
+        "placeholders": placeholders,
+        "placeholder_products": {store: sorted(ids) for store, ids in flagged.items()},
+        "matches": matches,
+    }
+
+def load_duplicates(path: str = DUPLICATES_FILE) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--distance", type=int, default=MATCH_DISTANCE, help="max dHash bits apart for one group")
+    parser.add_argument("--placeholder-products", type=int, default=PLACEHOLDER_PRODUCTS,
+                        help="distinct product names sharing an image before it is a placeholder")
+    parser.add_argument("--output", default=DUPLICATES_FILE)
+    args = parser.parse_args()
+
+    report = find_duplicates(store_products(), open_index(), distance=args.distance,
+                             placeholder_products=args.placeholder_products)
+    with AtomicWriter(args.output, "w", generation=False, encoding="utf-8") as writer:
+        json.dump(report, writer.file, indent=2, ensure_ascii=False)
+    flagged = sum(len(ids) for ids in report["placeholder_products"].values())
+    print(f"{report['images_hashed']} images in {report['image_groups']} groups: "
+          f"{len(report['placeholders'])} placeholders ({flagged} products), "
+          f"{len(report['matches'])} cross-store matches -> {args.output}")
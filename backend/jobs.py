@@ -0,0 +1,301 @@
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATES = ("queued", "running")
+FINAL_STATES = ("completed", "error", "cancelled")
+PROGRESS_FIELDS = ("pages_fetched", "products_parsed", "changes_found")
+
+class JobStatus(BaseModel):
+    id: str
+    store: str
+    status: str
+    message: str = ""
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    pages_fetched: int = 0
+    products_parsed: int = 0
+    changes_found: int = 0
+    products_count: int = 0
+    cancel_requested: bool = False
+    result: Optional[Dict] = None
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+class QueueFull(Exception):
+    """Raised when a store already has too many queued jobs"""
+
+    def __init__(self, store: str, retry_after: int = 30):
+        super().__init__(f"Too many queued jobs for {store}")
+        self.store = store
+        self.retry_after = retry_after
+
+class JobStore:
+    """SQLite-backed job table; survives restarts"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    store TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    message TEXT NOT NULL DEFAULT '',
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    pages_fetched INTEGER NOT NULL DEFAULT 0,
+                    products_parsed INTEGER NOT NULL DEFAULT 0,
+                    changes_found INTEGER NOT NULL DEFAULT 0,
+                    products_count INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    result TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_store_status ON jobs (store, status, created_at)")
+
+    def _row(self, row) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, store: str, message: str = "") -> Dict:
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, store, status, message, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, store, message, datetime.now().isoformat())
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def list(self, store: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        query, params = "SELECT * FROM jobs", []
+        if store:
+            query += " WHERE store = ?"
+            params.append(store)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row(row) for row in rows]
+
+    def count_queued(self, store: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE store = ? AND status = 'queued'", (store,)
+            ).fetchone()[0]
+
+    def count_active(self, store: str) -> int:
+        """Queued or running jobs of ``store``"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE store = ? AND status IN ('queued', 'running')", (store,)
+            ).fetchone()[0]
+
+    def claim_next(self, store: str) -> Optional[Dict]:
+        """Atomically move the oldest queued job of ``store`` to running"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE store = ? AND status = 'queued' ORDER BY created_at LIMIT 1", (store,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), row["id"])
+            )
+        return self.get(row["id"])
+
+    def update(self, job_id: str, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def advance(self, job_id: str, **counters):
+        """Add to the progress counters of a job"""
+        counters = {name: value for name, value in counters.items() if name in PROGRESS_FIELDS and value}
+        if not counters:
+            return
+        assignments = ", ".join(f"{name} = {name} + ?" for name in counters)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*counters.values(), job_id))
+
+    def request_cancel(self, job_id: str) -> Optional[Dict]:
+        """Flag a job for cancellation; queued jobs are cancelled outright"""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, message = 'Cancelled before start' "
+                "WHERE id = ? AND status = 'queued'", (now, job_id)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+        return self.get(job_id)
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs that were running when the process died back in the queue"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, message = 'Requeued after restart' "
+                "WHERE status = 'running'"
+            )
+        return cursor.rowcount
+
+class JobContext:
+    """Handed to a running job for progress reporting and cancellation checks"""
+
+    def __init__(self, store: JobStore, job_id: str, emit: Optional[Callable[[str, str], None]] = None):
+        self._store = store
+        self.job_id = job_id
+        self._emit = emit
+
+    def advance(self, **counters):
+        """Add to pages_fetched / products_parsed / changes_found"""
+        self._store.advance(self.job_id, **counters)
+        if self._emit:
+            self._emit("progress", self.job_id)
+
+    def message(self, text: str):
+        self._store.update(self.job_id, message=text)
+
+    def check_cancelled(self):
+        """Raise JobCancelled if someone asked for this job to stop"""
+        job = self._store.get(self.job_id)
+        if job and job["cancel_requested"]:
+            raise JobCancelled(self.job_id)
+
+class JobQueue:
+    """Per-store worker threads pulling jobs from a JobStore.
+
+    ``run_job(job, context)`` does the work and returns a result dict (it may
+    include ``message`` and ``products_count``). Each store gets
+    ``workers_per_store`` threads, so stores scrape in parallel while two
+    scrapes of the same site never overlap by default. ``on_event(event, job)``
+    is called with "job" on every status change and "progress" on every
+    counter update. With ``process_jobs=False`` jobs are only queued here
+    and another process sharing the database runs them.
+    """
+
+    def __init__(self, job_store: JobStore, run_job: Callable[[Dict, JobContext], Dict],
+                 stores: Iterable[str], workers_per_store: int = 1, max_queued_per_store: int = 5,
+                 on_event: Optional[Callable[[str, Dict], None]] = None, process_jobs: bool = True):
+        self.on_event = on_event
+        self.process_jobs = process_jobs
+        self.job_store = job_store
+        self.run_job = run_job
+        self.stores = list(stores)
+        self.workers_per_store = workers_per_store
+        self.max_queued_per_store = max_queued_per_store
+        self._wakeups = {store: threading.Condition() for store in self.stores}
+        self._threads: List[threading.Thread] = []
+        self._stopping: Optional[threading.Event] = None
+
+    def start(self):
+        """Start the worker threads (idempotent) and resume interrupted jobs"""
+        if self._threads or not self.process_jobs:
+            return
+        requeued = self.job_store.requeue_interrupted()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+        # Each start gets its own stop flag so stale workers never resume
+        self._stopping = threading.Event()
+        for store in self.stores:
+            for n in range(self.workers_per_store):
+                thread = threading.Thread(target=self._worker, args=(store, self._stopping),
+                                          name=f"jobs-{store}-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        """Stop workers once their current job (if any) finishes"""
+        if self._stopping is not None:
+            self._stopping.set()
+        self._threads = []
+        for condition in self._wakeups.values():
+            with condition:
+                condition.notify_all()
+
+    def submit(self, store: str, message: str = "") -> Dict:
+        """Queue a job for ``store``"""
+        if self.job_store.count_queued(store) >= self.max_queued_per_store:
+            raise QueueFull(store)
+        job = self.job_store.create(store, message)
+        self._emit("job", job["id"])
+        self.start()
+        with self._wakeups[store]:
+            self._wakeups[store].notify()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        job = self.job_store.request_cancel(job_id)
+        if job is not None:
+            self._emit("job", job_id)
+        return job
+
+    def _emit(self, event: str, job_id: str):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event, self.job_store.get(job_id))
+        except Exception as e:
+            logger.error(f"Job event handler failed: {e}")
+
+    def _worker(self, store: str, stopping: threading.Event):
+        condition = self._wakeups[store]
+        while not stopping.is_set():
+            # Claiming under the condition means a submit() can't slip in
+            # between an empty claim and the wait
+            with condition:
+                job = self.job_store.claim_next(store)
+                if job is None:
+                    condition.wait(timeout=5)
+                    continue
+            self._run(job)
+
+    def _run(self, job: Dict):
+        context = JobContext(self.job_store, job["id"], self._emit)
+        self._emit("job", job["id"])
+        try:
+            result = self.run_job(job, context) or {}
+            self.job_store.update(
+                job["id"],
+                status=result.get("status", "completed"),
+                message=result.get("message", "Completed"),
+                products_count=result.get("products_count", 0),
+                result=result,
+                finished_at=datetime.now().isoformat()
+            )
+        except JobCancelled:
+            self.job_store.update(job["id"], status="cancelled", message="Cancelled",
+                                  finished_at=datetime.now().isoformat())
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['store']}) failed: {e}")
+            self.job_store.update(job["id"], status="error", message=str(e),
+                                  finished_at=datetime.now().isoformat())
+        self._emit("job", job["id"])
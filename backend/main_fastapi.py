@@ -1,17 +1,43 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 import sys
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import time
+import asyncio
+import importlib
 import threading
+from contextlib import asynccontextmanager
+from fast_json import encoded_json_response
+from catalog_version import CatalogVersion
+from catalog_snapshot import CatalogSnapshot
+from compact_catalog import CompactCatalog
+from jobs import ACTIVE_STATES, JobQueue, JobStatus, JobStore, QueueFull
+from events import EventBus, sse_stream
+from catalog_changes import Changelog, delta_payload
+import metrics
+import profiling
+import image_api
+from spans import trace_response
+from scrape_scheduler import ChangeStats, ScrapeScheduler
 
 # Add the scraper directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scrapers'))
 
-app = FastAPI(title="Egypt Electronics API")
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+os.makedirs(DATA_DIR, exist_ok=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume jobs that were queued or running when the server last stopped
+    job_queue.start()
+    scheduler.start()
+    yield
+    scheduler.stop()
+    job_queue.stop()
+
+app = FastAPI(title="Egypt Electronics API", lifespan=lifespan)
 
 # CORS middleware - Updated for Flutter
 app.add_middleware(
@@ -21,6 +47,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfileRequestMiddleware)
+app.include_router(profiling.router)
+app.include_router(image_api.router)
 
 # Pydantic models - Updated for Flutter compatibility
 class Product(BaseModel):
@@ -39,196 +69,383 @@ class ScrapeStatus(BaseModel):
     message: str
     products_count: int = 0
 
-# In-memory storage
-products_db: List[Product] = []
-scraping_status = {"status": "idle", "message": "", "products_count": 0}
+# Job ids of the most recent POST /api/scrape
+current_batch: List[str] = []
+# Set while POST /api/scrape queues a batch, so no batch status goes out for part of one
+registering_batch = threading.Event()
 
-# Import and initialize scrapers
-def get_scrapers():
-    scrapers = []
-    try:
-        from microohm_fixed import MicroohmScraper
-        scrapers.append(("Microohm", MicroohmScraper()))
-    except ImportError:
-        print("Microohm scraper not available")
+# Bumped every time a new catalog snapshot is published
+catalog_version = CatalogVersion()
+
+def flutter_products(products: CompactCatalog) -> List[Dict]:
+    """Products as the Flutter app expects them (images are "" rather than null)"""
+    return products.to_dicts()
+
+def build_stats(products: CompactCatalog) -> Dict:
+    """Compute catalog statistics"""
+    if not len(products):
+        return {
+            "total_products": 0,
+            "total_stores": 0,
+            "avg_price": 0,
+            "lowest_price": 0
+        }
     
+    prices = products.array("price")
+    return {
+        "total_products": len(products),
+        "total_stores": len(products.rows_by("store")),
+        "avg_price": round(float(prices.mean()), 2),
+        "lowest_price": float(prices.min())
+    }
+
+def build_snapshot(products, version: int) -> CatalogSnapshot:
+    """Immutable, compact catalog with its indexes and encoded responses"""
+    with metrics.CATALOG_LOAD_SECONDS.labels(source="snapshot").time():
+        return CatalogSnapshot(CompactCatalog.from_products(products, Product), version, catalog_version.epoch,
+                               responses={"products": flutter_products, "stats": build_stats})
+
+# The published catalog. Handlers read this reference once per request and
+# never see a half-updated catalog; writers swap in a new snapshot.
+catalog = build_snapshot([], catalog_version.value)
+
+# Per-product changes behind /api/products/changes; the catalog starts empty
+changelog = Changelog()
+changelog.reset({}, catalog.version)
+
+# Serializes writers: building a snapshot, publishing it and logging its changes
+_merge_lock = threading.RLock()
+
+def set_products(products, stores: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Publish a new catalog snapshot and log what changed.
+
+    ``products`` is a list of Products or a CompactCatalog. ``stores``
+    limits the changelog diff to the stores that were touched; returns the
+    added/changed/removed products per store.
+    """
+    global catalog
+    with _merge_lock:
+        previous = catalog
+        snapshot = build_snapshot(products, catalog_version.bump())
+        if stores is None:
+            stores = set(previous.store_rows) | set(snapshot.store_rows)
+        catalog = snapshot
+        return changelog.sync({store: snapshot.store_products(store) for store in stores}, snapshot.version)
+
+# Scraper module and class per store, imported when a job first needs them
+SCRAPERS = {
+    "Microohm": ("microohm_fixed", "MicroohmScraper"),
+    "ElectroHub": ("electrohub_fixed", "ElectrohubScraper"),
+    "Ekostra": ("ekostra_fixed", "EkostraScraper"),
+    "RAM": ("ram_fixed", "RamScraper"),
+}
+
+def get_scraper(store: str):
+    """Instantiate the scraper for a store"""
+    module_name, class_name = SCRAPERS[store]
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)()
+
+def to_product(product, store: str, product_id: int) -> Product:
+    """Handle different scraper output formats - Flutter compatible"""
+    if isinstance(product, dict):
+        get = product.get
+    else:
+        # Handle object format
+        get = lambda field, default: getattr(product, field, default)
+    return Product(
+        id=product_id,
+        name=get("name", "Unknown Product"),
+        price=float(get("price", 0)),
+        image=get("image", "") or "",  # Ensure non-null
+        brand=get("brand", "Unknown"),
+        category=get("category", "Electronics"),
+        store=store,
+        availability=get("availability", "In Stock"),
+        rating=float(get("rating", 4.5))
+    )
+
+def merge_store_products(store: str, scraped_products: list) -> Dict:
+    """Replace one store's products in the catalog with freshly scraped ones.
+
+    Products keep their id across scrapes (matched by name) so clients can
+    apply deltas; new names get fresh ids.
+    """
+    with _merge_lock:
+        current = catalog
+        old_products = current.store_products(store)
+        known_ids = dict(zip(old_products.column("name"), old_products.column("id")))
+        old_prices = dict(zip(old_products.column("name"), old_products.column("price")))
+        next_id = current.max_id + 1
+        used_ids = set()
+        new_products = []
+        for product in scraped_products:
+            new_product = to_product(product, store, 0)
+            product_id = known_ids.get(new_product.name)
+            if product_id is None or product_id in used_ids:
+                product_id = next_id
+                next_id += 1
+            used_ids.add(product_id)
+            new_product.id = product_id
+            new_products.append(new_product)
+        
+        merged = CompactCatalog.concat(
+            [current.other_products(store), CompactCatalog.from_products(new_products, Product)], Product
+        )
+        diff = set_products(merged, stores=[store])[store]
+        version = changelog.version
+    price_changes = {product.name for product in new_products
+                     if product.name in old_prices and old_prices[product.name] != product.price}
+    return {"products_count": len(new_products), "diff": diff, "version": version, "price_changes": price_changes}
+
+# Job progress, batch status and per-store deltas, streamed at /api/scrape/events
+scrape_events = EventBus()
+
+def run_store_scrape(job: Dict, context) -> Dict:
+    """Job queue worker body: scrape one store and merge it into the catalog"""
+    store = job["store"]
     try:
-        from electrohub_fixed import ElectrohubScraper
-        scrapers.append(("ElectroHub", ElectrohubScraper()))
+        scraper = get_scraper(store)
     except ImportError:
-        print("ElectroHub scraper not available")
+        print(f"{store} scraper not available")
+        return {"status": "error", "message": f"{store} scraper not available - check scraper imports"}
     
-    try:
-        from ekostra_fixed import EkostraScraper
-        scrapers.append(("Ekostra", EkostraScraper()))
-    except ImportError:
-        print("Ekostra scraper not available")
+    scraped_products = scraper.scrape_all(progress=context)
+    print(f"Scraped {len(scraped_products)} products from {store}")
+    if not scraped_products:
+        return {"status": "completed", "message": f"No products found for {store}", "products_count": 0,
+                "timings": scraper.spans.to_dict()}
     
-    try:
-        from ram_fixed import RamScraper
-        scrapers.append(("RAM", RamScraper()))
-    except ImportError:
-        print("RAM scraper not available")
+    with scraper.spans.span("track_changes"):
+        merged = merge_store_products(store, scraped_products)
+    diff = merged["diff"]
+    context.advance(changes_found=len(diff["added"]) + len(diff["changed"]) + len(diff["removed"]))
+    scrape_events.publish("delta", delta_payload(store, diff, merged["version"]))
+    # Price changes per category page; pages that came back empty most likely failed to load
+    pages = {url: sum(name in merged["price_changes"] for name in names)
+             for url, names in scraper.pages.items() if names}
+    change_stats.observe(store, pages, job_queue.job_store.get(job["id"])["pages_fetched"])
+    return {
+        "status": "completed",
+        "message": f"Scraped {merged['products_count']} products from {store}",
+        "products_count": merged["products_count"],
+        "pages": pages,
+        "timings": scraper.spans.to_dict()
+    }
+
+def publish_job_event(event: str, job: Dict):
+    """Forward job events, plus the Flutter-style batch status on status changes"""
+    scrape_events.publish(event, job)
+    if event == "job" and not registering_batch.is_set():
+        scrape_events.publish("status", batch_status())
+
+# Durable scrape queue: one worker per store, so stores scrape in parallel
+job_queue = JobQueue(
+    JobStore(os.path.join(DATA_DIR, "main_jobs.db")),
+    run_store_scrape,
+    stores=SCRAPERS.keys(),
+    workers_per_store=1,
+    on_event=publish_job_event
+)
+
+# Price-change history per category page, and the budgeted scheduler queueing scrapes from it
+change_stats = ChangeStats(os.path.join(DATA_DIR, "main_schedule.db"))
+scheduler = ScrapeScheduler(job_queue, change_stats)
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+def batch_status() -> Dict:
+    """Summarize the jobs of the latest scrape as the old scraping_status dict"""
+    jobs = [job_queue.job_store.get(job_id) for job_id in current_batch]
+    jobs = [job for job in jobs if job is not None]
+    if not jobs:
+        return {"status": "idle", "message": "", "products_count": len(catalog)}
+    
+    active = [job for job in jobs if job["status"] in ACTIVE_STATES]
+    if active:
+        parsed = sum(job["products_parsed"] for job in jobs)
+        return {
+            "status": "running",
+            "message": f"Scraping for Flutter app... {len(jobs) - len(active)}/{len(jobs)} stores done, "
+                       f"{parsed} products parsed",
+            "products_count": len(catalog)
+        }
     
-    return scrapers
+    failed = [job for job in jobs if job["status"] == "error"]
+    if len(failed) == len(jobs):
+        return {
+            "status": "error",
+            "message": f"Scraping failed: {failed[0]['message']}",
+            "products_count": len(catalog)
+        }
+    
+    scraped = sum(job["products_count"] for job in jobs)
+    if not scraped:
+        message = "No products found from scrapers - try adding sample data"
+    else:
+        message = f"Successfully scraped {scraped} products for Flutter app"
+    return {"status": "completed", "message": message, "products_count": len(catalog)}
+
+def collect_catalog_metrics():
+    """Catalog size per store and version of the published snapshot"""
+    snapshot = catalog
+    metrics.CATALOG_PRODUCTS.clear()
+    for store, rows in snapshot.store_rows.items():
+        metrics.CATALOG_PRODUCTS.labels(store=store).set(len(rows))
+    metrics.CATALOG_VERSION.set(snapshot.version)
+
+metrics.REGISTRY.on_collect(collect_catalog_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics of this process"""
+    return metrics.metrics_response()
 
 @app.get("/")
 async def root():
     return {"message": "Egypt Electronics API"}
 
 @app.get("/api/products", response_model=List[Product])
-async def get_products():
+async def get_products(request: Request):
     """Get all products - Flutter compatible"""
-    # Ensure all products have required fields for Flutter
-    flutter_products = []
-    for product in products_db:
-        flutter_product = {
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "image": product.image if product.image else "",
-            "brand": product.brand,
-            "category": product.category,
-            "store": product.store,
-            "availability": product.availability,
-            "rating": product.rating
-        }
-        flutter_products.append(flutter_product)
-    return flutter_products
+    # Encoded when the snapshot was built, so skip response_model re-validation
+    return catalog.response(request, "products")
+
+@app.get("/api/products/changes")
+async def get_product_changes(request: Request, since: Optional[int] = None, epoch: Optional[str] = None):
+    """Products added, updated or removed since a catalog version - for Flutter sync.
+
+    Send back the ``version`` and ``epoch`` of the previous response. With
+    ``full_resync`` set, ``products`` is the whole catalog: first sync, a
+    server restart, or a client older than the compacted changelog.
+    """
+    if epoch is not None and epoch != catalog_version.epoch:
+        since = None
+
+    def build():
+        changes = changelog.changes_since(since)
+        changes["epoch"] = catalog_version.epoch
+        return encoded_json_response(request, changes)
+
+    # A full resync encodes the whole catalog; keep that off the event loop
+    return await asyncio.to_thread(build)
+
+@app.get("/api/facets")
+async def get_facets(
+    brand: List[str] = Query(default=[]),
+    store: List[str] = Query(default=[]),
+    category: List[str] = Query(default=[]),
+    price_range: List[str] = Query(default=[]),
+):
+    """Facet counts for the brand/store dropdowns - Flutter compatible"""
+    return catalog.facets.counts({
+        "brand": brand,
+        "store": store,
+        "category": category,
+        "price_range": price_range
+    })
 
 @app.get("/api/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """Get statistics"""
-    if not products_db:
-        return {
-            "total_products": 0,
-            "total_stores": 0,
-            "avg_price": 0,
-            "lowest_price": 0
-        }
-    
-    stores = list(set(p.store for p in products_db))
-    avg_price = sum(p.price for p in products_db) / len(products_db)
-    lowest_price = min(p.price for p in products_db)
-    
-    return {
-        "total_products": len(products_db),
-        "total_stores": len(stores),
-        "avg_price": round(avg_price, 2),
-        "lowest_price": lowest_price
-    }
+    return catalog.response(request, "stats")
 
 @app.post("/api/scrape", response_model=ScrapeStatus)
 async def start_scraping():
     """Start scraping all stores - Flutter compatible"""
-    global scraping_status, products_db
+    global current_batch
     
-    if scraping_status["status"] == "running":
+    if batch_status()["status"] == "running":
         return ScrapeStatus(
             status="running",
             message="Scraping already in progress",
-            products_count=len(products_db)
+            products_count=len(catalog)
         )
     
-    scraping_status = {
-        "status": "running",
-        "message": "Starting scraping for Flutter app...",
-        "products_count": len(products_db)
-    }
-    
-    # Run scraping in background
-    def scrape_all():
-        global products_db, scraping_status
-        try:
-            all_products = []
-            scrapers = get_scrapers()
-            
-            if not scrapers:
-                print("No scrapers available")
-                scraping_status = {
-                    "status": "error",
-                    "message": "No scrapers available - check scraper imports",
-                    "products_count": 0
-                }
-                return
-            
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                future_to_store = {
-                    executor.submit(scraper.scrape_all): store 
-                    for store, scraper in scrapers
-                }
-                
-                for future in as_completed(future_to_store):
-                    store = future_to_store[future]
-                    try:
-                        scraped_products = future.result()
-                        print(f"Scraped {len(scraped_products)} products from {store}")
-                        if scraped_products:
-                            for product in scraped_products:
-                                # Handle different scraper output formats - Flutter compatible
-                                if isinstance(product, dict):
-                                    product_dict = {
-                                        "id": len(all_products) + 1,
-                                        "name": product.get("name", "Unknown Product"),
-                                        "price": float(product.get("price", 0)),
-                                        "image": product.get("image", "") or "",  # Ensure non-null
-                                        "brand": product.get("brand", "Unknown"),
-                                        "category": product.get("category", "Electronics"),
-                                        "store": store,
-                                        "availability": product.get("availability", "In Stock"),
-                                        "rating": float(product.get("rating", 4.5))
-                                    }
-                                else:
-                                    # Handle object format
-                                    product_dict = {
-                                        "id": len(all_products) + 1,
-                                        "name": getattr(product, "name", "Unknown Product"),
-                                        "price": float(getattr(product, "price", 0)),
-                                        "image": getattr(product, "image", "") or "",  # Ensure non-null
-                                        "brand": getattr(product, "brand", "Unknown"),
-                                        "category": getattr(product, "category", "Electronics"),
-                                        "store": store,
-                                        "availability": getattr(product, "availability", "In Stock"),
-                                        "rating": float(getattr(product, "rating", 4.5))
-                                    }
-                                all_products.append(Product(**product_dict))
-                    except Exception as e:
-                        print(f"Error scraping {store}: {e}")
-            
-            if all_products:
-                products_db = all_products
-                scraping_status = {
-                    "status": "completed",
-                    "message": f"Successfully scraped {len(all_products)} products for Flutter app",
-                    "products_count": len(all_products)
-                }
-            else:
-                scraping_status = {
-                    "status": "completed",
-                    "message": "No products found from scrapers - try adding sample data",
-                    "products_count": 0
-                }
-        except Exception as e:
-            scraping_status = {
-                "status": "error",
-                "message": f"Scraping failed: {str(e)}",
-                "products_count": len(products_db)
-            }
-    
-    # Start background scraping
-    threading.Thread(target=scrape_all).start()
+    # One background job per store; progress is tracked per job
+    # Jobs can finish before the loop ends; the batch is registered whole, then announced
+    job_ids = []
+    registering_batch.set()
+    try:
+        for store in SCRAPERS:
+            job_ids.append(job_queue.submit(store, message=f"Queued scrape of {store}")["id"])
+    except QueueFull:
+        # No half batches: drop what was queued and let the handler answer 503
+        for job_id in job_ids:
+            job_queue.cancel(job_id)
+        raise
+    finally:
+        registering_batch.clear()
+    current_batch = job_ids
+    scrape_events.publish("status", batch_status())
     
     return ScrapeStatus(
         status="running",
         message="Scraping started for Flutter app...",
-        products_count=len(products_db)
+        products_count=len(catalog)
     )
 
+@app.get("/api/scrape/events")
+async def scrape_event_stream(request: Request):
+    """Server-Sent Events replacing /api/scrape/status polling.
+
+    Events: "job" and "progress" (per-store job state), "status" (same shape
+    as /api/scrape/status) and "delta" (added/changed/removed products of a
+    finished store, to apply instead of refetching /api/products).
+    """
+    return StreamingResponse(
+        sse_stream(scrape_events, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Plain def: the job endpoints query SQLite, so FastAPI runs them in its threadpool
+@app.get("/api/jobs", response_model=List[JobStatus])
+def list_jobs(store: Optional[str] = None, limit: int = Query(default=50, le=500)):
+    """Most recent scrape jobs, newest first"""
+    return job_queue.job_store.list(store=store, limit=limit)
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str):
+    """Status and progress of a scrape job"""
+    job = job_queue.job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@app.get("/api/jobs/{job_id}/trace")
+def get_job_trace(job_id: str):
+    """Per-stage timing of a finished scrape job as a Chrome trace (chrome://tracing, Perfetto)"""
+    job = job_queue.job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    timings = (job.get("result") or {}).get("timings")
+    if not timings:
+        raise HTTPException(status_code=404, detail=f"No timings recorded for job {job_id}")
+    return trace_response(timings, f"scrape-{job['store']}-{job_id}")
+
+@app.post("/api/jobs/{job_id}/cancel", response_model=JobStatus)
+def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running one to stop at its next checkpoint"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@app.get("/api/schedule")
+def get_schedule():
+    """Scheduler budget and, per store, estimated price changes per request (best first)"""
+    return scheduler.status()
+
 @app.post("/api/products/add-sample")
 async def add_sample_data():
     """Add sample products for Flutter app testing"""
-    global products_db
-    
     sample_products = [
         Product(
             id=1,
@@ -342,13 +559,14 @@ async def add_sample_data():
         )
     ]
     
-    products_db = sample_products
+    # Rebuilding the snapshot and diffing the changelog is CPU work; keep it off the event loop
+    await asyncio.to_thread(set_products, sample_products)
     return {"message": f"Added {len(sample_products)} sample products for Flutter app"}
 
 @app.get("/api/scrape/status", response_model=ScrapeStatus)
 async def get_scrape_status():
     """Get current scraping status"""
-    return ScrapeStatus(**scraping_status)
+    return ScrapeStatus(**batch_status())
 
 if __name__ == "__main__":
     import uvicorn
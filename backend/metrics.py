@@ -0,0 +1,271 @@
+"""In-process metrics in the Prometheus text format, served at /metrics.
+
+Counters, gauges and histograms with labels, kept per process with no
+client library or external service. The metrics the APIs and scrapers
+record are defined at the bottom of this module; ``MetricsMiddleware``
+times every request by route template and ``instrument_session`` records
+fetch latency, bytes and status per host for a requests.Session.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, **labels):
+        """The child for one combination of label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # Unlabelled metrics act as their own single child
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in list(self._children.items())]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def clear(self):
+        """Drop every labelled value, e.g. before re-reading stores that may be gone"""
+        with self._lock:
+            self._children.clear()
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in list(self._children.items())]
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds spent inside it"""
+        return _Timer(self)
+
+class _Timer:
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self) -> _Timer:
+        return self._default().time()
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    """The metrics of one process, plus callbacks that refresh gauges on each scrape"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def on_collect(self, callback: Callable[[], None]):
+        """Run ``callback`` before every render, e.g. to read the current catalog size"""
+        self._collectors.append(callback)
+
+    def render(self) -> str:
+        for callback in self._collectors:
+            callback()
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+REGISTRY = Registry()
+
+def metrics_response(registry: Optional[Registry] = None):
+    """The /metrics response"""
+    # Imported here so scrapers can record metrics without loading starlette
+    from starlette.responses import Response
+
+    return Response((registry or REGISTRY).render(), media_type=CONTENT_TYPE)
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request by method, route template and status.
+
+    Timing runs until the response is fully sent, so streamed exports count
+    their whole duration. Requests that match no route are grouped as
+    "unmatched" to keep label values bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router adds the matched route to the scope it was handed
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=route, status=status).observe(
+                time.perf_counter() - started)
+
+def instrument_session(session, store: str = ""):
+    """Record latency, bytes and status of every response a requests.Session receives"""
+    def record(response, *args, **kwargs):
+        host = urlparse(response.url).hostname or "unknown"
+        # Time to the response headers, as measured by requests
+        SCRAPER_FETCH_SECONDS.labels(host=host).observe(response.elapsed.total_seconds())
+        SCRAPER_RESPONSES.labels(host=host, status=response.status_code).inc()
+        if kwargs.get("stream"):
+            size = int(response.headers.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+        SCRAPER_FETCH_BYTES.labels(host=host).inc(size)
+        return response
+
+    session.hooks["response"].append(record)
+    return session
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+# API
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"])
+CACHE_REQUESTS = Counter(
+    "cache_requests", "Lookups in the response, compression, facet and ETag caches", ["cache", "result"])
+CATALOG_PRODUCTS = Gauge("catalog_products", "Products in the served catalog", ["store"])
+CATALOG_VERSION = Gauge("catalog_version", "Current catalog version")
+CATALOG_LOAD_SECONDS = Histogram(
+    "catalog_load_duration_seconds", "Time to load or rebuild the catalog", ["source"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+
+# Scrapers
+SCRAPER_FETCH_SECONDS = Histogram("scraper_fetch_duration_seconds", "Scraper HTTP fetch latency", ["host"])
+SCRAPER_FETCH_BYTES = Counter("scraper_fetch_bytes", "Response bytes fetched by scrapers", ["host"])
+SCRAPER_RESPONSES = Counter("scraper_responses", "Scraper HTTP responses by status code", ["host", "status"])
+SCRAPER_PARSE_SECONDS = Histogram(
+    "scraper_parse_duration_seconds", "Time to parse a page and extract its products", ["store"])
+SCRAPER_SELECTOR_MATCHES = Counter(
+    "scraper_selector_matches", "Product elements found per selector", ["store", "selector"])
+SCRAPER_PRODUCTS = Counter("scraper_products_extracted", "Products extracted from pages", ["store"])
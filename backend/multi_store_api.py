@@ -1,18 +1,51 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict
-import pandas as pd
+from typing import List, Optional, Dict, Literal
 import os
 from datetime import datetime, timedelta
 import json
 import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from catalog_models import DATA_DIR, STORES, Product
+from facets import FacetIndex
+from compact_catalog import CATEGORICAL_DTYPES, CompactCatalog
+from fast_json import (
+    ENCODINGS, EncodedResponseCache, cached_json_response, compress, dumps, encoded_json_response, negotiate_encoding,
+)
+from catalog_export import iter_csv, iter_ndjson
+from catalog_version import CatalogVersion, etag_matches, not_modified
+from worker_pool import BlockingPool, PoolBusy
+from catalog_file import CatalogFile, write_catalog
+from shared_catalog import SharedCatalog
+from jobs import JobCancelled, JobQueue, JobStatus, JobStore, QueueFull
+from events import EventBus, sse_stream
+from catalog_changes import Changelog, delta_payload, diff_products
+import metrics
+import profiling
+import image_api
+from spans import trace_response
+from scrape_scheduler import ChangeStats, ScrapeScheduler
+from atomic_files import AtomicWriter, file_signature, read_consistent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Egypt Electronics API - Multi-Store")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume jobs that were queued or running when the server last stopped
+    job_queue.start()
+    if RUN_JOBS:
+        scheduler.start()
+    yield
+    scheduler.stop()
+    job_queue.stop()
+
+app = FastAPI(title="Egypt Electronics API - Multi-Store", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -22,22 +55,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfileRequestMiddleware)
+app.include_router(profiling.router)
+app.include_router(image_api.router)
 
-# Pydantic models
-class Product(BaseModel):
-    id: int
-    name: str
-    price: float
-    image: str
-    brand: str
-    category: str
-    store: str
-    availability: str
-    rating: float
-    description: Optional[str] = ""
-    link: Optional[str] = ""
-    timestamp: str
+# Blocking CSV/pandas work runs here instead of on the event loop
+storage_pool = BlockingPool("storage", max_workers=4, max_pending=32)
 
+@app.exception_handler(PoolBusy)
+@app.exception_handler(QueueFull)
+async def busy_handler(request: Request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# Pydantic models
 class StoreStats(BaseModel):
     store: str
     total_products: int
@@ -52,77 +87,180 @@ class ScrapeStatus(BaseModel):
     message: str
     products_count: int = 0
     store_stats: List[StoreStats] = []
+    job_ids: List[str] = []
+    timings: Optional[Dict] = None
+    pages: Optional[Dict[str, int]] = None
 
-# Store configuration
-STORES = {
-    "microohm": {
-        "name": "Microohm",
-        "url": "https://microohm-eg.com",
-        "csv_file": "microohm_products.csv"
-    },
-    "electrohub": {
-        "name": "ElectroHub", 
-        "url": "https://electrohub.com.eg",
-        "csv_file": "electrohub_products.csv"
-    },
-    "ekostra": {
-        "name": "Ekostra",
-        "url": "https://ekostra.com",
-        "csv_file": "ekostra_products.csv"
-    },
-    "ram": {
-        "name": "RAM Electronics",
-        "url": "https://ram-e-shop.com",
-        "csv_file": "ram_products.csv"
-    }
-}
-
-# Data directory
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Set by serve_shared.py for its uvicorn workers: they map the catalog file
+# its loader publishes instead of each parsing and holding the CSVs, and
+# leave running scrape jobs to that process
+SHARED_CATALOG_FILE = os.environ.get("MULTI_STORE_CATALOG_FILE")
+RUN_JOBS = os.environ.get("MULTI_STORE_RUN_JOBS", "1") != "0"
+shared_catalog = SharedCatalog(SHARED_CATALOG_FILE, Product) if SHARED_CATALOG_FILE else None
+
 def get_store_csv_path(store_key: str) -> str:
     """Get CSV file path for a store"""
     return os.path.join(DATA_DIR, STORES[store_key]["csv_file"])
 
-def load_store_products(store_key: str) -> List[Product]:
-    """Load products from a store's CSV file"""
+def get_store_cache_path(store_key: str) -> str:
+    """Binary copy of a store's CSV, mapped instead of re-parsing the CSV"""
+    return os.path.splitext(get_store_csv_path(store_key))[0] + ".bin"
+
+# store_key -> mapped cache file; replaced when its CSV changes
+_store_files: Dict[str, CatalogFile] = {}
+
+def open_store_file(store_key: str) -> Optional[CatalogFile]:
+    """The store's catalog file, rebuilt from the CSV when the CSV changed.
+
+    The CSV stays the source of truth; the cache records the mtime, size
+    and write generation of the CSV it was built from and is only trusted
+    while they match. Returns None if the store has no CSV yet.
+    """
     csv_path = get_store_csv_path(store_key)
-    
-    if not os.path.exists(csv_path):
-        logger.info(f"Creating new CSV for {STORES[store_key]['name']}")
-        return []
+    try:
+        source = file_signature(csv_path)
+    except OSError:
+        return None
+
+    store_file = _store_files.get(store_key)
+    if store_file is not None and store_file.meta.get("source") == source:
+        return store_file
+
+    cache_path = get_store_cache_path(store_key)
+    started = time.perf_counter()
+    try:
+        store_file = CatalogFile(cache_path, Product)
+        if store_file.meta.get("source") != source:
+            store_file = None
+    except (OSError, ValueError, KeyError):
+        store_file = None
+
+    if store_file is None:
+        import pandas as pd
+
+        # The cache is stamped with the signature of the file actually parsed,
+        # so a save landing mid-read can't leave old rows under a new signature
+        read = read_consistent(csv_path, lambda f: pd.read_csv(f, dtype=CATEGORICAL_DTYPES), newline="")
+        write_catalog(cache_path, CompactCatalog.from_frame(read.value, Product), meta={"source": read.signature})
+        store_file = CatalogFile(cache_path, Product)
+        metrics.CATALOG_LOAD_SECONDS.labels(source="csv").observe(time.perf_counter() - started)
+        logger.info(f"Rebuilt {os.path.basename(cache_path)} ({len(store_file.catalog)} products)")
+    else:
+        metrics.CATALOG_LOAD_SECONDS.labels(source="cache").observe(time.perf_counter() - started)
+
+    _store_files[store_key] = store_file
+    return store_file
+
+def load_store_products(store_key: str) -> CompactCatalog:
+    """Load products from a store's CSV file.
+
+    Returns a CompactCatalog: it iterates and indexes like a list of
+    Products, but keeps the rows in columns until they are needed. The
+    columns are views into the store's mapped cache file, so repeated loads
+    cost nothing until the CSV changes.
+    """
+    if shared_catalog is not None:
+        return shared_catalog.store_products(store_key)
     
     try:
-        df = pd.read_csv(csv_path)
-        products = []
-        
-        for idx, row in df.iterrows():
-            product = Product(
-                id=int(row['id']),
-                name=str(row['name']),
-                price=float(row['price']),
-                image=str(row['image']),
-                brand=str(row['brand']),
-                category=str(row['category']),
-                store=str(row['store']),
-                availability=str(row['availability']),
-                rating=float(row['rating']),
-                description=str(row.get('description', '')),
-                link=str(row.get('link', '')),
-                timestamp=str(row['timestamp'])
-            )
-            products.append(product)
-        
-        logger.info(f"Loaded {len(products)} products from {STORES[store_key]['name']}")
-        return products
+        store_file = open_store_file(store_key)
+        if store_file is None:
+            logger.info(f"Creating new CSV for {STORES[store_key]['name']}")
+            return CompactCatalog.empty(Product)
+        return store_file.catalog
         
     except Exception as e:
+        # Serve the last good copy rather than blanking the store until the next read
+        last_good = _store_files.get(store_key)
         logger.error(f"Error loading {store_key} CSV: {e}")
-        return []
+        return last_good.catalog if last_good is not None else CompactCatalog.empty(Product)
+
+def find_store_product(store_key: str, product_id: int) -> Optional[Product]:
+    """One product by id through the cache file's id index"""
+    if shared_catalog is not None:
+        return shared_catalog.find(store_key, product_id)
+    store_file = open_store_file(store_key)
+    if store_file is None:
+        return None
+    row = store_file.find(product_id)
+    return None if row is None else store_file.catalog[row]
+
+def load_all_products() -> CompactCatalog:
+    """Load products from every store's CSV file"""
+    if shared_catalog is not None:
+        return shared_catalog.products()
+    return CompactCatalog.concat([load_store_products(store_key) for store_key in STORES.keys()], Product)
+
+def catalog_signature() -> tuple:
+    """Cheap fingerprint of the store CSVs (mtime, size and write generation of each file)"""
+    signature = []
+    for store_key in STORES.keys():
+        try:
+            signature.append((store_key, *file_signature(get_store_csv_path(store_key))))
+        except OSError:
+            signature.append((store_key, None, None, None))
+    return tuple(signature)
+
+# Bumped by every write below; also picks up CSVs rewritten by other processes.
+# Shared-catalog workers use the published generation instead.
+if shared_catalog is not None:
+    catalog_version = shared_catalog
+else:
+    catalog_version = CatalogVersion(signature=catalog_signature)
+
+def encode_shared_responses(products: CompactCatalog) -> Dict[str, bytes]:
+    """/api/products bodies published with the shared catalog, one per encoding"""
+    body = dumps(products.to_dicts())
+    return {f"products.{encoding}": compress(body, encoding) for encoding in ENCODINGS}
+
+# Encoded response bodies, reused until the catalog version changes
+_response_cache = EncodedResponseCache()
+
+# Facet index, rebuilt only when the catalog version changes
+_facet_cache = {"version": None, "index": None}
+
+def get_facet_index() -> FacetIndex:
+    """Return the facet index for the current catalog"""
+    version = catalog_version.value
+    metrics.record_cache("facets", _facet_cache["version"] == version)
+    if _facet_cache["version"] != version:
+        _facet_cache["index"] = FacetIndex.from_compact(load_all_products())
+        _facet_cache["version"] = version
+    return _facet_cache["index"]
+
+# Per-product changes behind /api/products/changes, folded in from the CSVs
+changelog = Changelog()
+_changelog_lock = threading.Lock()
+
+def refresh_changelog():
+    """Diff the store CSVs into the changelog if the catalog moved (blocking)"""
+    with _changelog_lock:
+        version = catalog_version.value
+        if changelog.version == version:
+            return
+        products = {store_key: load_store_products(store_key) for store_key in STORES.keys()}
+        if changelog.has_baseline:
+            changelog.sync(products, version)
+        else:
+            changelog.reset(products, version)
+
+async def versioned_json_response(request: Request, key: str, build):
+    """JSON response with a strong ETag; 304 without loading anything on a match"""
+    version = catalog_version.value
+    etag = catalog_version.etag(key, version, negotiate_encoding(request.headers.get("accept-encoding")))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    # A cache miss reads CSVs and encodes, so it runs on the storage pool
+    return await storage_pool.run(
+        cached_json_response, request, _response_cache, key, version, build, headers={"ETag": etag}
+    )
 
 def save_store_products(store_key: str, products: List[Product]):
     """Save products to a store's CSV file"""
+    import pandas as pd
+    
     csv_path = get_store_csv_path(store_key)
     
     try:
@@ -144,7 +282,10 @@ def save_store_products(store_key: str, products: List[Product]):
             })
         
         df = pd.DataFrame(data)
-        df.to_csv(csv_path, index=False)
+        # Readers see the old file or the new one, never a half-written CSV
+        with AtomicWriter(csv_path, "w", newline="", encoding="utf-8") as writer:
+            df.to_csv(writer.file, index=False)
+        catalog_version.bump()
         logger.info(f"Saved {len(products)} products to {STORES[store_key]['name']}")
         return True
         
@@ -155,25 +296,22 @@ def save_store_products(store_key: str, products: List[Product]):
 def track_price_changes(store_key: str, old_products: List[Product], new_products: List[Product]) -> Dict:
     """Track price changes and new products"""
     old_dict = {p.name: p for p in old_products}
-    new_dict = {p.name: p for p in new_products}
+    diff = diff_products(old_products, new_products)
     
     price_changes = []
-    new_products_found = []
+    new_products_found = diff["added"]
     
     # Check for price changes
-    for name, new_product in new_dict.items():
-        if name in old_dict:
-            old_product = old_dict[name]
-            if old_product.price != new_product.price:
-                price_changes.append({
-                    'name': name,
-                    'old_price': old_product.price,
-                    'new_price': new_product.price,
-                    'change_percent': ((new_product.price - old_product.price) / old_product.price) * 100,
-                    'timestamp': datetime.now().isoformat()
-                })
-        else:
-            new_products_found.append(new_product)
+    for new_product in diff["changed"]:
+        old_product = old_dict[new_product.name]
+        if old_product.price != new_product.price:
+            price_changes.append({
+                'name': new_product.name,
+                'old_price': old_product.price,
+                'new_price': new_product.price,
+                'change_percent': ((new_product.price - old_product.price) / old_product.price) * 100,
+                'timestamp': datetime.now().isoformat()
+            })
     
     # Log changes
     if price_changes:
@@ -192,7 +330,9 @@ def track_price_changes(store_key: str, old_products: List[Product], new_product
     
     return {
         'price_changes': price_changes,
-        'new_products': new_products_found
+        'new_products': new_products_found,
+        'changed_products': diff["changed"],
+        'removed_products': diff["removed"]
     }
 
 def generate_sample_data(store_key: str) -> List[Product]:
@@ -268,8 +408,8 @@ def generate_sample_data(store_key: str) -> List[Product]:
             ("Raspberry Pi 4 Case", 35.0, "Generic", "Accessories"),
             ("ESP32-S2 Mini", 45.0, "Espressif", "Wireless Modules"),
             ("Arduino Uno WiFi Rev2", 650.0, "Arduino", "Development Boards"),
-            ("Raspberry Pi 7" Touchscreen", 285.0, "Raspberry Pi", "Displays"),
-            ("TFT Display 2.8" SPI", 125.0, "Generic", "Displays"),
+            ("Raspberry Pi 7\" Touchscreen", 285.0, "Raspberry Pi", "Displays"),
+            ("TFT Display 2.8\" SPI", 125.0, "Generic", "Displays"),
             ("Infrared Sensor Module", 18.0, "Generic", "Sensors"),
             ("Sound Sensor Module", 22.0, "Generic", "Sensors"),
             ("Relay 8 Channel 5V", 85.0, "Generic", "Components"),
@@ -289,12 +429,12 @@ def generate_sample_data(store_key: str) -> List[Product]:
             ("ESP32 LoRa SX1278", 185.0, "Espressif", "Wireless Modules"),
             ("Arduino Robot Kit", 1250.0, "Arduino", "Robotics"),
             ("Raspberry Pi Heatsink", 12.0, "Generic", "Accessories"),
-            ("TFT LCD 3.5" Touch", 165.0, "Generic", "Displays"),
+            ("TFT LCD 3.5\" Touch", 165.0, "Generic", "Displays"),
             ("Accelerometer ADXL345", 25.0, "Generic", "Sensors"),
             ("Light Sensor LDR", 8.0, "Generic", "Sensors"),
             ("Relay 2 Channel 5V", 35.0, "Generic", "Components"),
             ("Servo Motor MG996R", 95.0, "Generic", "Motors"),
-            ("OLED Display 0.96" I2C", 45.0, "Generic", "Displays"),
+            ("OLED Display 0.96\" I2C", 45.0, "Generic", "Displays"),
             ("Raspberry Pi GPIO Breakout", 18.0, "Generic", "Accessories"),
             ("ESP32 Bluetooth Audio", 155.0, "Espressif", "Wireless Modules"),
             ("Arduino Education Kit", 850.0, "Arduino", "Education"),
@@ -436,6 +576,20 @@ def generate_sample_data(store_key: str) -> List[Product]:
     
     return products
 
+def collect_catalog_metrics():
+    """Catalog size per store and version, read when /metrics is scraped"""
+    metrics.CATALOG_PRODUCTS.clear()
+    for store_key in STORES.keys():
+        metrics.CATALOG_PRODUCTS.labels(store=store_key).set(len(load_store_products(store_key)))
+    metrics.CATALOG_VERSION.set(catalog_version.value)
+
+metrics.REGISTRY.on_collect(collect_catalog_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics of this process"""
+    return await storage_pool.run(metrics.metrics_response)
+
 @app.get("/")
 async def root():
     return {
@@ -445,28 +599,117 @@ async def root():
     }
 
 @app.get("/api/products", response_model=List[Product])
-async def get_all_products():
+async def get_all_products(request: Request):
     """Get all products from all stores"""
-    all_products = []
+    if shared_catalog is not None:
+        # Encoded once by the loader and served straight from the mapping
+        response = shared_catalog.json_response(request, "products")
+        if response is not None:
+            return response
     
-    for store_key in STORES.keys():
-        products = load_store_products(store_key)
-        all_products.extend(products)
+    def build():
+        all_products = load_all_products()
+        logger.info(f"Encoding {len(all_products)} total products from all stores")
+        return all_products.to_dicts()
     
-    logger.info(f"Returning {len(all_products)} total products from all stores")
-    return all_products
+    return await versioned_json_response(request, "products", build)
+
+@app.get("/api/facets")
+async def get_facets(
+    brand: List[str] = Query(default=[]),
+    store: List[str] = Query(default=[]),
+    category: List[str] = Query(default=[]),
+    price_range: List[str] = Query(default=[]),
+):
+    """Count brand/store/category/price-range values under the given filters"""
+    index = await storage_pool.run(get_facet_index)
+    return index.counts({
+        "brand": brand,
+        "store": store,
+        "category": category,
+        "price_range": price_range
+    })
+
+# Registered before /api/products/{store_key} so "changes" isn't taken as a store key
+@app.get("/api/products/changes")
+async def get_product_changes(request: Request, since: Optional[int] = None, epoch: Optional[str] = None):
+    """Products added, updated or removed since a catalog version.
+
+    Send back the ``version`` and ``epoch`` of the previous response. With
+    ``full_resync`` set, ``products`` is the whole catalog: first sync, a
+    server restart, or a client older than the compacted changelog.
+    Removed products are ``{id, store, name}`` since ids are per store.
+    """
+    if epoch is not None and epoch != catalog_version.epoch:
+        since = None
+    
+    def build():
+        refresh_changelog()
+        changes = changelog.changes_since(since)
+        changes["epoch"] = catalog_version.epoch
+        return encoded_json_response(request, changes)
+    
+    return await storage_pool.run(build)
 
 @app.get("/api/products/{store_key}", response_model=List[Product])
-async def get_store_products(store_key: str):
-    """Get products from a specific store"""
+async def get_store_products(
+    store_key: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=5000)
+):
+    """Get products from a specific store, optionally one page of rows"""
     if store_key not in STORES:
         return []
     
-    return load_store_products(store_key)
+    if offset == 0 and limit is None:
+        return await versioned_json_response(
+            request, f"products:{store_key}", lambda: load_store_products(store_key).to_dicts()
+        )
+    
+    # Pages are a row range of the mapped file; not cached, there are too many
+    etag = catalog_version.etag(f"products:{store_key}:{offset}:{limit}",
+                                encoding=negotiate_encoding(request.headers.get("accept-encoding")))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    stop = None if limit is None else offset + limit
+    
+    def build():
+        page = load_store_products(store_key)[offset:stop]
+        return encoded_json_response(request, page.to_dicts(), headers={"ETag": etag})
+    
+    return await storage_pool.run(build)
 
-@app.get("/api/stats")
-async def get_stats():
-    """Get statistics for all stores"""
+@app.get("/api/products/{store_key}/{product_id}", response_model=Product)
+async def get_store_product(store_key: str, product_id: int):
+    """Get one product of a store by id"""
+    if store_key not in STORES:
+        raise HTTPException(status_code=404, detail="Store not found")
+    
+    product = await storage_pool.run(find_store_product, store_key, product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@app.get("/api/export")
+async def export_catalog(format: Literal["ndjson", "csv"] = "ndjson"):
+    """Stream the whole catalog store by store without materializing it"""
+    csv_paths = [get_store_csv_path(store_key) for store_key in STORES.keys()
+                 if os.path.exists(get_store_csv_path(store_key))]
+    
+    if format == "csv":
+        body, media_type = iter_csv(csv_paths), "text/csv"
+    else:
+        body, media_type = iter_ndjson(csv_paths), "application/x-ndjson"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="catalog.{format}"'}
+    )
+
+def build_stats() -> List[StoreStats]:
+    """Compute per-store statistics"""
     stats = []
     
     for store_key in STORES.keys():
@@ -484,36 +727,37 @@ async def get_stats():
             ))
             continue
         
-        prices = [p.price for p in products if p.price > 0]
-        avg_price = sum(prices) / len(prices) if prices else 0
+        prices = products.array("price")
+        prices = prices[prices > 0]
+        avg_price = float(prices.mean()) if len(prices) else 0
         
         stats.append(StoreStats(
             store=STORES[store_key]["name"],
             total_products=len(products),
             avg_price=round(avg_price, 2),
-            price_range={"min": min(prices) if prices else 0, "max": max(prices) if prices else 0},
-            last_updated=max(p.timestamp for p in products) if products else "Never",
+            price_range={"min": float(prices.min()) if len(prices) else 0,
+                         "max": float(prices.max()) if len(prices) else 0},
+            last_updated=max(products.column("timestamp")) if products else "Never",
             new_products_count=0,
             price_changes_count=0
         ))
     
     return stats
 
-@app.post("/api/scrape/{store_key}")
-async def scrape_store(store_key: str):
-    """Scrape a specific store and track changes"""
-    if store_key not in STORES:
-        return ScrapeStatus(
-            status="error",
-            message=f"Unknown store: {store_key}",
-            products_count=0
-        )
-    
+@app.get("/api/stats", response_model=List[StoreStats])
+async def get_stats(request: Request):
+    """Get statistics for all stores"""
+    return await versioned_json_response(request, "stats", build_stats)
+
+def run_scrape(store_key: str, progress=None) -> ScrapeStatus:
+    """Scrape a specific store and track changes (blocking)"""
     try:
         # Import and use real scraper
         from real_scraper import MultiStoreScraper
         scraper = MultiStoreScraper()
-        result = scraper.scrape_store(store_key)
+        result = scraper.scrape_store(store_key, progress=progress)
+        if result.get('saved'):
+            catalog_version.bump()
         
         if 'error' in result:
             return ScrapeStatus(
@@ -526,9 +770,13 @@ async def scrape_store(store_key: str):
             status="completed",
             message=f"Scraped {result['products_count']} products from {STORES[store_key]['name']}. "
                    f"Found {result['new_products']} new products, {result['price_changes']} price changes.",
-            products_count=result['products_count']
+            products_count=result['products_count'],
+            timings=result.get('timings'),
+            pages=result.get('pages')
         )
         
+    except JobCancelled:
+        raise
     except Exception as e:
         logger.error(f"Error scraping {store_key}: {e}")
         # Fallback to sample data
@@ -550,23 +798,121 @@ async def scrape_store(store_key: str):
                 products_count=0
             )
 
+# Job progress and per-store deltas, streamed at /api/scrape/events
+scrape_events = EventBus()
+
+def run_scrape_job(job: Dict, context) -> Dict:
+    """Job queue worker body for one store scrape"""
+    store_key = job["store"]
+    old_products = load_store_products(store_key)
+    result = run_scrape(store_key, progress=context)
+    
+    if result.status == "completed":
+        diff = diff_products(old_products, load_store_products(store_key))
+        scrape_events.publish("delta", delta_payload(store_key, diff, catalog_version.value))
+    if result.pages:
+        # Sample-data fallbacks carry no pages, so they don't count as visits
+        change_stats.observe(store_key, result.pages, job_queue.job_store.get(job["id"])["pages_fetched"])
+    
+    return {"status": result.status, "message": result.message, "products_count": result.products_count,
+            "pages": result.pages, "timings": result.timings}
+
+# Durable scrape queue: one worker per store, so stores scrape in parallel
+job_queue = JobQueue(
+    JobStore(os.path.join(DATA_DIR, "multi_store_jobs.db")),
+    run_scrape_job,
+    stores=STORES.keys(),
+    workers_per_store=1,
+    on_event=scrape_events.publish,
+    process_jobs=RUN_JOBS
+)
+
+# Price-change history per store page, and the budgeted scheduler queueing scrapes from it
+change_stats = ChangeStats(os.path.join(DATA_DIR, "multi_store_schedule.db"))
+scheduler = ScrapeScheduler(job_queue, change_stats, describe=lambda store_key: STORES[store_key]["name"])
+
+def start_scrape_job(store_key: str) -> str:
+    """Queue a scrape and return its job id"""
+    job = job_queue.submit(store_key, message=f"Queued scrape of {STORES[store_key]['name']}")
+    return job["id"]
+
+# Registered before /api/scrape/{store_key} so "all" isn't taken as a store key
 @app.post("/api/scrape/all")
 async def scrape_all_stores():
-    """Scrape all stores"""
-    results = []
-    total_products = 0
+    """Scrape all stores in the background"""
+    job_ids = [start_scrape_job(store_key) for store_key in STORES.keys()]
     
-    for store_key in STORES.keys():
-        result = await scrape_store(store_key)
-        results.append(result)
-        total_products += result.products_count
+    return ScrapeStatus(
+        status="queued",
+        message=f"Queued scrapes of all {len(STORES)} stores",
+        products_count=0,
+        job_ids=job_ids
+    )
+
+@app.post("/api/scrape/{store_key}")
+async def scrape_store(store_key: str):
+    """Scrape a specific store in the background and track changes"""
+    if store_key not in STORES:
+        return ScrapeStatus(
+            status="error",
+            message=f"Unknown store: {store_key}",
+            products_count=0
+        )
     
+    job_id = start_scrape_job(store_key)
     return ScrapeStatus(
-        status="completed",
-        message=f"Scraped all {len(STORES)} stores",
-        products_count=total_products
+        status="queued",
+        message=f"Queued scrape of {STORES[store_key]['name']}",
+        products_count=0,
+        job_ids=[job_id]
     )
 
+@app.get("/api/scrape/events")
+async def scrape_event_stream(request: Request):
+    """Server-Sent Events: job/progress updates and per-store deltas as they happen"""
+    return StreamingResponse(
+        sse_stream(scrape_events, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/jobs", response_model=List[JobStatus])
+async def list_jobs(store: Optional[str] = None, limit: int = Query(default=50, le=500)):
+    """Most recent scrape jobs, newest first"""
+    return await storage_pool.run(job_queue.job_store.list, store=store, limit=limit)
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Status and progress of a scrape job"""
+    job = await storage_pool.run(job_queue.job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@app.get("/api/jobs/{job_id}/trace")
+async def get_job_trace(job_id: str):
+    """Per-stage timing of a finished scrape job as a Chrome trace (chrome://tracing, Perfetto)"""
+    job = await storage_pool.run(job_queue.job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    timings = (job.get("result") or {}).get("timings")
+    if not timings:
+        raise HTTPException(status_code=404, detail=f"No timings recorded for job {job_id}")
+    return trace_response(timings, f"scrape-{job['store']}-{job_id}")
+
+@app.post("/api/jobs/{job_id}/cancel", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running one to stop at its next checkpoint"""
+    job = await storage_pool.run(job_queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@app.get("/api/schedule")
+async def get_schedule():
+    """Scheduler budget and, per store, estimated price changes per request (best first)"""
+    return await storage_pool.run(scheduler.status)
+
 @app.post("/api/init-sample-data")
 async def init_sample_data():
     """Initialize sample data for all stores"""
@@ -574,7 +920,7 @@ async def init_sample_data():
     
     for store_key in STORES.keys():
         products = generate_sample_data(store_key)
-        if save_store_products(store_key, products):
+        if await storage_pool.run(save_store_products, store_key, products):
             total_products += len(products)
             logger.info(f"Initialized {len(products)} products for {STORES[store_key]['name']}")
     
@@ -0,0 +1,349 @@
+"""Admin-only CPU and memory profiling of a running API.
+
+Enabled by setting ``API_ADMIN_TOKEN``; every call must send it in the
+``X-Admin-Token`` header (without the variable the endpoints answer 404).
+
+- ``POST /admin/profile/cpu?seconds=N`` samples the stacks of every thread
+  for N seconds of live traffic.
+- A request sent with ``X-Profile: 1`` runs under cProfile, including the
+  work it hands to a ``BlockingPool``; its response carries ``X-Profile-Id``.
+- ``POST /admin/profile/memory?seconds=N`` compares tracemalloc snapshots
+  taken N seconds apart (tracing is started for the window if it was off).
+- ``GET /admin/profile/{id}?format=pstats|speedscope|tracemalloc`` downloads
+  a result: pstats files open with ``python -m pstats`` or snakeviz,
+  speedscope files at https://www.speedscope.app, tracemalloc snapshots
+  with ``tracemalloc.Snapshot.load``.
+
+Only one profile runs at a time and the last few results are kept in
+memory, per worker process.
+"""
+import asyncio
+import cProfile
+import hmac
+import marshal
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+
+from fast_json import dumps
+
+ADMIN_TOKEN = os.environ.get("API_ADMIN_TOKEN")
+KEEP_RESULTS = 16
+MAX_SECONDS = 120
+TOP_ENTRIES = 25
+
+# Innermost frames of a thread that is blocked waiting rather than working
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+Frame = Tuple[str, int, str]
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+class ProfileResults:
+    """The most recent profiles of this process, with their downloadable files"""
+
+    def __init__(self, keep: int = KEEP_RESULTS):
+        self.keep = keep
+        self._results: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One profile at a time: cProfile and tracemalloc are process-wide
+        self.running = threading.Lock()
+
+    def add(self, kind: str, seconds: float, summary: Dict, files: Dict[str, bytes],
+            profile_id: Optional[str] = None) -> Dict:
+        result = {
+            "id": profile_id or new_profile_id(),
+            "kind": kind,
+            "created_at": datetime.now().isoformat(),
+            "seconds": round(seconds, 3),
+            "formats": sorted(files),
+            "summary": summary,
+        }
+        with self._lock:
+            self._results[result["id"]] = (result, files)
+            while len(self._results) > self.keep:
+                self._results.popitem(last=False)
+        return result
+
+    def get(self, profile_id: str) -> Optional[Tuple[Dict, Dict[str, bytes]]]:
+        with self._lock:
+            return self._results.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [result for result, _ in reversed(self._results.values())]
+
+results = ProfileResults()
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+def stats_summary(stats: Dict) -> List[Dict]:
+    """Functions with the most self time, from a pstats-style stats dict"""
+    top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_ENTRIES]
+    return [
+        {"function": f"{name} ({os.path.basename(filename)}:{line})", "calls": nc,
+         "self_seconds": round(tt, 6), "total_seconds": round(ct, 6)}
+        for (filename, line, name), (cc, nc, tt, ct, callers) in top
+    ]
+
+# cProfile of a single request
+
+_request_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("request_profiles", default=None)
+
+def profiled(func: Callable) -> Callable:
+    """``func``, run under its own cProfile when called for a request being profiled"""
+    profiles = _request_profiles.get()
+    if profiles is None:
+        return func
+
+    def run():
+        # A Profile only hooks the thread it is enabled on, so each pool call gets one
+        profile = cProfile.Profile()
+        profiles.append(profile)
+        return profile.runcall(func)
+    return run
+
+class ProfileRequestMiddleware:
+    """ASGI middleware running requests sent with ``X-Profile: 1`` under cProfile.
+
+    The profile covers the event loop thread while the request is in flight
+    (so concurrent requests show up in it) plus whatever the request runs
+    on a BlockingPool. Requests flagged while another profile is running
+    are served unprofiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        token = headers.get(b"x-admin-token", b"").decode("latin-1")
+        if headers.get(b"x-profile") != b"1" or not is_admin(token) or not results.running.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = new_profile_id()
+        profiles = [cProfile.Profile()]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) +
+                               [(b"x-profile-id", profile_id.encode())])
+            await send(message)
+
+        reset = _request_profiles.set(profiles)
+        started = time.perf_counter()
+        profiles[0].enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiles[0].disable()
+            _request_profiles.reset(reset)
+            results.running.release()
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            results.add("request", time.perf_counter() - started,
+                        {"path": scope["path"], "functions": stats_summary(stats.stats)},
+                        {"pstats": marshal.dumps(stats.stats)}, profile_id=profile_id)
+
+# Sampling profile of live traffic
+
+class StackSampler(threading.Thread):
+    """Samples the Python stack of every other thread every ``interval`` seconds"""
+
+    def __init__(self, interval: float, include_idle: bool = False):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.include_idle = include_idle
+        # (thread name, stack from the outermost frame) -> seconds
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stopping = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopping.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if not self.include_idle and (os.path.basename(stack[0][0]), stack[0][2]) in IDLE_FRAMES:
+                    continue
+                stack.reverse()
+                self.samples[(names.get(ident, str(ident)), tuple(stack))] += elapsed
+                self.sample_count += 1
+
+    def stop(self):
+        self._stopping.set()
+        self.join()
+
+    def pstats(self) -> Dict:
+        """The samples as a pstats stats dict: self time at the leaf, total time up the stack"""
+        stats: Dict[Frame, list] = {}
+        for (_, stack), seconds in self.samples.items():
+            seen = set()
+            for depth, frame in enumerate(stack):
+                entry = stats.setdefault(frame, [0, 0, 0.0, 0.0, {}])
+                leaf = depth == len(stack) - 1
+                if frame not in seen:
+                    entry[0] += 1
+                    entry[1] += 1
+                    entry[3] += seconds
+                    seen.add(frame)
+                if leaf:
+                    entry[2] += seconds
+                if depth:
+                    caller = entry[4].get(stack[depth - 1], (0, 0, 0.0, 0.0))
+                    entry[4][stack[depth - 1]] = (caller[0] + 1, caller[1] + 1,
+                                                  caller[2] + (seconds if leaf else 0.0), caller[3] + seconds)
+        return {frame: (cc, nc, tt, ct, callers) for frame, (cc, nc, tt, ct, callers) in stats.items()}
+
+    def speedscope(self, duration: float) -> Dict:
+        """The samples in speedscope's file format, one sampled profile per thread"""
+        frames: Dict[Frame, int] = {}
+        profiles: Dict[str, Dict] = {}
+        for (thread, stack), seconds in self.samples.items():
+            profile = profiles.setdefault(thread, {
+                "type": "sampled", "name": thread, "unit": "seconds",
+                "startValue": 0, "endValue": round(duration, 6), "samples": [], "weights": [],
+            })
+            profile["samples"].append([frames.setdefault(frame, len(frames)) for frame in stack])
+            profile["weights"].append(round(seconds, 6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": name, "file": filename, "line": line}
+                                  for (filename, line, name) in frames]},
+            "profiles": list(profiles.values()),
+            "name": "API CPU profile",
+            "exporter": "egypt-electronics profiling",
+        }
+
+# Endpoints
+
+router = APIRouter(prefix="/admin/profile", dependencies=[Depends(require_admin)], include_in_schema=False)
+
+def _start_profile():
+    if not results.running.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another profile is running")
+
+@router.get("")
+async def list_profiles():
+    """Profiles kept in this process, newest first"""
+    return results.list()
+
+@router.post("/cpu")
+async def profile_cpu(seconds: float = Query(default=10, gt=0, le=MAX_SECONDS),
+                      interval_ms: float = Query(default=5, ge=1, le=1000),
+                      include_idle: bool = False):
+    """Sample every thread's stack for ``seconds`` of live traffic"""
+    _start_profile()
+    try:
+        sampler = StackSampler(interval_ms / 1000, include_idle)
+        started = time.perf_counter()
+        sampler.start()
+        await asyncio.sleep(seconds)
+        await asyncio.to_thread(sampler.stop)
+        duration = time.perf_counter() - started
+    finally:
+        results.running.release()
+
+    def build():
+        stats = sampler.pstats()
+        return results.add("cpu", duration, {"samples": sampler.sample_count, "functions": stats_summary(stats)}, {
+            "pstats": marshal.dumps(stats),
+            "speedscope": dumps(sampler.speedscope(duration)),
+        })
+    return await asyncio.to_thread(build)
+
+@router.post("/memory")
+async def profile_memory(seconds: float = Query(default=10, ge=0, le=MAX_SECONDS),
+                         frames: int = Query(default=10, ge=1, le=50)):
+    """Allocations that grew over ``seconds``, by source line"""
+    _start_profile()
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start(frames)
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        traced, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        results.running.release()
+
+    def build():
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        after_filtered = after.filter_traces(ignore)
+        growth = after_filtered.compare_to(before.filter_traces(ignore), "lineno")[:TOP_ENTRIES]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshot")
+            after_filtered.dump(path)
+            with open(path, "rb") as f:
+                snapshot = f.read()
+        summary = {
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "started_tracing": started_tracing,
+            "growth": [{"line": str(stat.traceback[0]), "size_diff": stat.size_diff, "size": stat.size,
+                        "count_diff": stat.count_diff} for stat in growth],
+        }
+        return results.add("memory", seconds, summary, {"tracemalloc": snapshot})
+    return await asyncio.to_thread(build)
+
+DOWNLOADS = {
+    "pstats": ("application/octet-stream", "prof"),
+    "speedscope": ("application/json", "speedscope.json"),
+    "tracemalloc": ("application/octet-stream", "tracemalloc"),
+}
+
+@router.get("/{profile_id}")
+async def download_profile(profile_id: str, format: str = Query(default="pstats", pattern="^(pstats|speedscope|tracemalloc)$")):
+    """A profile as a file"""
+    found = results.get(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {profile_id}")
+    result, files = found
+    if format not in files:
+        raise HTTPException(status_code=400, detail=f"{result['kind']} profiles are available as {', '.join(result['formats'])}")
+    media_type, extension = DOWNLOADS[format]
+    return Response(files[format], media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{result["kind"]}-{profile_id}.{extension}"'})
@@ -7,6 +7,8 @@ import logging
 from urllib.parse import urljoin, urlparse
 import re
 from datetime import datetime
+from image_cache import cache_images
+from atomic_files import AtomicWriter, read_consistent
 
 class RealImageScraper:
     def __init__(self):
@@ -89,11 +91,14 @@ class RealImageScraper:
             return False
         
         try:
-            # Load existing products
-            df = pd.read_csv(csv_path)
+            # Load existing products, retried if a scrape saves the CSV mid-read
+            df = read_consistent(csv_path, pd.read_csv, newline="").value
             
-            # Get real images from website
+            # Get real images from website, keeping only the ones that load;
+            # their thumbnails are cached for the API on the way
             real_images = self.get_real_product_images(store_key)
+            records = cache_images([img['url'] for img in real_images])
+            real_images = [img for img in real_images if records.get(img['url'], {}).get('status') == 'ok']
             
             # Update products with real images
             updated_products = []
@@ -115,7 +120,8 @@ class RealImageScraper:
             
             # Save updated CSV
             updated_df = pd.DataFrame(updated_products)
-            updated_df.to_csv(csv_path, index=False)
+            with AtomicWriter(csv_path, "w", newline="", encoding="utf-8") as writer:
+                updated_df.to_csv(writer.file, index=False)
             
             logging.info(f"Updated {len(updated_products)} products with real images for {store_key}")
             return True
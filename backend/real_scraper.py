@@ -8,6 +8,10 @@ import re
 from datetime import datetime
 import os
 from typing import List, Dict, Optional
+from compact_catalog import CATEGORICAL_DTYPES
+import metrics
+from spans import SpanRecorder
+from atomic_files import AtomicWriter, read_consistent
 
 class MultiStoreScraper:
     def __init__(self):
@@ -15,6 +19,8 @@ class MultiStoreScraper:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        metrics.instrument_session(self.session)
+        self.spans = SpanRecorder()
         self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
         os.makedirs(self.data_dir, exist_ok=True)
         
@@ -62,16 +68,27 @@ class MultiStoreScraper:
         except:
             return 0.0
     
+    def _record_parse(self, store_key: str, started: float, extract_started: float, products: List[Dict]):
+        """Parse/extract time and products found on a fetched page"""
+        self.spans.record("extract", extract_started, products=len(products))
+        metrics.SCRAPER_PARSE_SECONDS.labels(store=store_key).observe(time.perf_counter() - started)
+        metrics.SCRAPER_PRODUCTS.labels(store=store_key).inc(len(products))
+    
     def scrape_microohm(self) -> List[Dict]:
         """Scrape Microohm products"""
         products = []
         try:
             url = self.stores['microohm']['base_url']
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with self.spans.span("network", url=url):
+                response = self.session.get(url, timeout=10)
+            parse_started = time.perf_counter()
+            with self.spans.span("parse", url=url):
+                soup = BeautifulSoup(response.content, 'html.parser')
+            extract_started = time.perf_counter()
             
             # Look for product cards
             product_elements = soup.find_all(['div', 'article'], class_=re.compile(r'product|item|card'))
+            metrics.SCRAPER_SELECTOR_MATCHES.labels(store='microohm', selector=r'product|item|card').inc(len(product_elements))
             
             for i, element in enumerate(product_elements[:1000]):  # Limit to first 1000 products
                 try:
@@ -142,6 +159,7 @@ class MultiStoreScraper:
                     logging.warning(f"Error parsing Microohm product {i}: {e}")
                     continue
             
+            self._record_parse('microohm', parse_started, extract_started, products)
             logging.info(f"Scraped {len(products)} products from Microohm")
             
         except Exception as e:
@@ -156,11 +174,16 @@ class MultiStoreScraper:
         products = []
         try:
             url = self.stores['electrohub']['base_url']
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with self.spans.span("network", url=url):
+                response = self.session.get(url, timeout=10)
+            parse_started = time.perf_counter()
+            with self.spans.span("parse", url=url):
+                soup = BeautifulSoup(response.content, 'html.parser')
+            extract_started = time.perf_counter()
             
             # Look for product listings
             product_elements = soup.find_all(['div', 'li'], class_=re.compile(r'product|item|listing'))
+            metrics.SCRAPER_SELECTOR_MATCHES.labels(store='electrohub', selector=r'product|item|listing').inc(len(product_elements))
             
             for i, element in enumerate(product_elements[:20]):
                 try:
@@ -208,6 +231,7 @@ class MultiStoreScraper:
                     logging.warning(f"Error parsing ElectroHub product {i}: {e}")
                     continue
             
+            self._record_parse('electrohub', parse_started, extract_started, products)
             logging.info(f"Scraped {len(products)} products from ElectroHub")
             
         except Exception as e:
@@ -221,10 +245,15 @@ class MultiStoreScraper:
         products = []
         try:
             url = self.stores['ekostra']['base_url']
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with self.spans.span("network", url=url):
+                response = self.session.get(url, timeout=10)
+            parse_started = time.perf_counter()
+            with self.spans.span("parse", url=url):
+                soup = BeautifulSoup(response.content, 'html.parser')
+            extract_started = time.perf_counter()
             
             product_elements = soup.find_all(['div', 'article'], class_=re.compile(r'product|item'))
+            metrics.SCRAPER_SELECTOR_MATCHES.labels(store='ekostra', selector=r'product|item').inc(len(product_elements))
             
             for i, element in enumerate(product_elements[:20]):
                 try:
@@ -272,6 +301,7 @@ class MultiStoreScraper:
                     logging.warning(f"Error parsing Ekostra product {i}: {e}")
                     continue
             
+            self._record_parse('ekostra', parse_started, extract_started, products)
             logging.info(f"Scraped {len(products)} products from Ekostra")
             
         except Exception as e:
@@ -285,10 +315,15 @@ class MultiStoreScraper:
         products = []
         try:
             url = self.stores['ram']['base_url']
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with self.spans.span("network", url=url):
+                response = self.session.get(url, timeout=10)
+            parse_started = time.perf_counter()
+            with self.spans.span("parse", url=url):
+                soup = BeautifulSoup(response.content, 'html.parser')
+            extract_started = time.perf_counter()
             
             product_elements = soup.find_all(['div', 'li'], class_=re.compile(r'product|item'))
+            metrics.SCRAPER_SELECTOR_MATCHES.labels(store='ram', selector=r'product|item').inc(len(product_elements))
             
             for i, element in enumerate(product_elements[:20]):
                 try:
@@ -336,6 +371,7 @@ class MultiStoreScraper:
                     logging.warning(f"Error parsing RAM product {i}: {e}")
                     continue
             
+            self._record_parse('ram', parse_started, extract_started, products)
             logging.info(f"Scraped {len(products)} products from RAM")
             
         except Exception as e:
@@ -427,11 +463,10 @@ class MultiStoreScraper:
             return {}
         
         try:
-            df = pd.read_csv(csv_path)
-            products = {}
-            for _, row in df.iterrows():
-                products[row['name']] = row.to_dict()
-            return products
+            # Retried if a save lands mid-read, so a concurrent write can't make every product look new
+            df = read_consistent(csv_path, lambda f: pd.read_csv(f, dtype=CATEGORICAL_DTYPES), newline="").value
+            # Category cells share one str per distinct value
+            return {row['name']: row for row in df.to_dict('records')}
         except Exception as e:
             logging.error(f"Error loading existing products for {store_key}: {e}")
             return {}
@@ -441,8 +476,10 @@ class MultiStoreScraper:
         csv_path = os.path.join(self.data_dir, self.stores[store_key]['csv_file'])
         
         try:
-            df = pd.DataFrame(products)
-            df.to_csv(csv_path, index=False)
+            with self.spans.span("to_csv", products=len(products)):
+                df = pd.DataFrame(products)
+                with AtomicWriter(csv_path, "w", newline="", encoding="utf-8") as writer:
+                    df.to_csv(writer.file, index=False)
             logging.info(f"Saved {len(products)} products to {csv_path}")
             return True
         except Exception as e:
@@ -499,15 +536,21 @@ class MultiStoreScraper:
             'new_products': new_products_found
         }
     
-    def scrape_store(self, store_key: str) -> Dict:
-        """Scrape a single store and track changes"""
+    def scrape_store(self, store_key: str, progress=None) -> Dict:
+        """Scrape a single store and track changes
+
+        ``progress`` is an optional job context (see jobs.JobContext) that
+        receives page/product/change counts and can cancel before saving.
+        """
         if store_key not in self.stores:
             return {'error': f'Unknown store: {store_key}'}
         
         logging.info(f"Starting scrape for {self.stores[store_key]['name']}")
+        self.spans = SpanRecorder()
         
         # Load existing products
-        old_products = self.load_existing_products(store_key)
+        with self.spans.span("read_csv"):
+            old_products = self.load_existing_products(store_key)
         
         # Scrape new products
         scraper_methods = {
@@ -518,9 +561,15 @@ class MultiStoreScraper:
         }
         
         new_products = scraper_methods[store_key]()
+        if progress:
+            progress.advance(pages_fetched=1, products_parsed=len(new_products))
+            progress.check_cancelled()
         
         # Track changes
-        changes = self.track_changes(store_key, old_products, new_products)
+        with self.spans.span("track_changes"):
+            changes = self.track_changes(store_key, old_products, new_products)
+        if progress:
+            progress.advance(changes_found=len(changes['price_changes']) + len(changes['new_products']))
         
         # Save new products
         success = self.save_products(store_key, new_products)
@@ -531,7 +580,10 @@ class MultiStoreScraper:
             'price_changes': len(changes['price_changes']),
             'new_products': len(changes['new_products']),
             'saved': success,
-            'changes': changes
+            'changes': changes,
+            # One listing page per store; price changes on it, for the scrape scheduler
+            'pages': {self.stores[store_key]['base_url']: len(changes['price_changes'])},
+            'timings': self.spans.to_dict()
         }
     
     def scrape_all_stores(self) -> Dict:
@@ -0,0 +1,264 @@
+"""Adaptive scrape scheduler: revisit stores as often as their prices change, within a request budget.
+
+Every finished scrape reports how many prices changed on each page it
+fetched (a category or listing URL) since that page's previous visit.
+``ChangeStats`` keeps decayed per-page counts of visits, visits that found
+a price change, and time between visits. It estimates each page's change
+rate with the Cho & Garcia-Molina estimator, which stays finite for pages
+that changed on every visit or on none:
+
+    rate = ln((visits + 0.5) / (visits - changed + 0.5)) / mean_interval
+
+Treating changes as a Poisson process, a page last fetched t seconds ago
+has changed with probability 1 - exp(-rate * t). A scrape fetches all of a
+store's pages, so the store's expected yield is the sum of that over its
+pages, and its cost is the number of requests its last scrape made. Every
+tick, ``ScrapeScheduler`` refills a token bucket at ``budget`` requests per
+hour. It then queues stores in order of expected changes per request while
+the bucket can pay for them. It doesn't skip ahead to cheaper, less
+volatile stores, so budget saved for a volatile store isn't spent on stable
+ones. A store is never revisited within ``min_interval``, and always
+revisited once ``max_interval`` has passed, so stable stores are still
+checked now and then.
+
+Manual scrapes feed the statistics too. The scheduler is off unless
+``SCRAPE_BUDGET_PER_HOUR`` is set:
+
+    SCRAPE_BUDGET_PER_HOUR=120 python main_fastapi.py
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from jobs import JobQueue, QueueFull
+
+logger = logging.getLogger(__name__)
+
+BUDGET_PER_HOUR = float(os.environ.get("SCRAPE_BUDGET_PER_HOUR", "0"))
+TICK_SECONDS = 60
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 24 * 3600
+# Weight of the previous history at each visit, so rates follow a site whose habits change
+DECAY = 0.9
+# Change rate assumed for a page before it has been seen twice (about once a day)
+PRIOR_RATE = 1 / 86400
+
+def change_rate(visits: float, changed: float, observed_seconds: float) -> float:
+    """Estimated price changes per second of a page from its (decayed) visit history"""
+    if visits <= 0 or observed_seconds <= 0:
+        return PRIOR_RATE
+    mean_interval = observed_seconds / visits
+    return math.log((visits + 0.5) / (visits - changed + 0.5)) / mean_interval
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+class ChangeStats:
+    """SQLite history of how often each store page's prices changed; survives restarts"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    store TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    visits REAL NOT NULL DEFAULT 0,
+                    changed REAL NOT NULL DEFAULT 0,
+                    observed_seconds REAL NOT NULL DEFAULT 0,
+                    last_visit REAL NOT NULL,
+                    last_change REAL,
+                    PRIMARY KEY (store, url)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS stores (
+                    store TEXT PRIMARY KEY,
+                    requests INTEGER NOT NULL,
+                    last_visit REAL NOT NULL
+                )
+            """)
+
+    def observe(self, store: str, pages: Dict[str, int], requests: int, at: Optional[float] = None):
+        """Record a finished scrape: price changes per fetched page and the requests it took.
+
+        A page's first visit only sets its baseline; every later one adds
+        the time since the previous visit and whether prices changed.
+        """
+        at = at or time.time()
+        with self._lock, self._conn:
+            for url, changes in pages.items():
+                row = self._conn.execute(
+                    "SELECT * FROM pages WHERE store = ? AND url = ?", (store, url)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO pages (store, url, last_visit) VALUES (?, ?, ?)", (store, url, at)
+                    )
+                    continue
+                self._conn.execute(
+                    "UPDATE pages SET visits = ?, changed = ?, observed_seconds = ?, last_visit = ?, "
+                    "last_change = ? WHERE store = ? AND url = ?",
+                    (row["visits"] * DECAY + 1, row["changed"] * DECAY + (1 if changes else 0),
+                     row["observed_seconds"] * DECAY + max(at - row["last_visit"], 0), at,
+                     at if changes else row["last_change"], store, url)
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stores (store, requests, last_visit) VALUES (?, ?, ?)",
+                (store, max(int(requests), 1), at)
+            )
+
+    def store(self, store: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM stores WHERE store = ?", (store,)).fetchone()
+        return dict(row) if row else None
+
+    def pages(self, store: str) -> List[Dict]:
+        """Pages fetched by the store's latest scrape; pages it no longer links to drop out"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pages.* FROM pages JOIN stores USING (store) "
+                "WHERE store = ? AND pages.last_visit >= stores.last_visit ORDER BY url", (store,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+class ScrapeScheduler:
+    """Background thread queueing scrapes on ``job_queue`` by expected price changes per request.
+
+    ``describe(store)`` names a store in job messages.
+    """
+
+    def __init__(self, job_queue: JobQueue, stats: ChangeStats, budget_per_hour: float = BUDGET_PER_HOUR,
+                 min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                 tick: float = TICK_SECONDS, describe: Callable[[str], str] = str):
+        self.job_queue = job_queue
+        self.stats = stats
+        self.budget_per_hour = budget_per_hour
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.tick_seconds = tick
+        self.describe = describe
+        # An hour of budget at most; starts full so the first tick can visit the overdue stores
+        self.tokens = budget_per_hour
+        self._refilled = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def configured(self) -> bool:
+        return self.budget_per_hour > 0
+
+    @property
+    def running(self) -> bool:
+        """Whether this process schedules; serve_shared workers share the stats but not the thread"""
+        return self._thread is not None
+
+    def plan(self, now: Optional[float] = None) -> List[Dict]:
+        """Every store with its estimated yield, best first (overdue stores lead)"""
+        now = now or time.time()
+        entries = []
+        for store in self.job_queue.stores:
+            info = self.stats.store(store)
+            pages = self.stats.pages(store) if info else []
+            elapsed = now - info["last_visit"] if info else None
+            page_entries, expected = [], 0.0
+            for page in pages:
+                rate = change_rate(page["visits"], page["changed"], page["observed_seconds"])
+                probability = 1 - math.exp(-rate * elapsed)
+                expected += probability
+                page_entries.append({
+                    "url": page["url"],
+                    "changes_per_day": round(rate * 86400, 3),
+                    "visits": round(page["visits"], 2),
+                    "changed_visits": round(page["changed"], 2),
+                    "change_probability": round(probability, 3),
+                    "last_change": _isoformat(page["last_change"]),
+                })
+            requests = info["requests"] if info else 1
+            if info is None:
+                # A store never scraped is worth one change until it has a baseline
+                expected = 1.0
+            entries.append({
+                "store": store,
+                "last_visit": _isoformat(info["last_visit"]) if info else None,
+                "seconds_since_visit": round(elapsed) if elapsed is not None else None,
+                "requests": requests,
+                "expected_changes": round(expected, 3),
+                "changes_per_request": round(expected / requests, 4),
+                "overdue": elapsed is None or elapsed >= self.max_interval,
+                "resting": elapsed is not None and elapsed < self.min_interval,
+                "pages": page_entries,
+            })
+        entries.sort(key=lambda entry: (entry["overdue"], entry["changes_per_request"]), reverse=True)
+        return entries
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.budget_per_hour,
+                          self.tokens + self.budget_per_hour * (now - self._refilled) / 3600)
+        self._refilled = now
+
+    def tick(self, now: Optional[float] = None) -> List[str]:
+        """Queue the stores the budget affords now; returns their job ids"""
+        self._refill()
+        job_ids = []
+        for entry in self.plan(now):
+            store = entry["store"]
+            if entry["resting"] or self.job_queue.job_store.count_active(store):
+                continue
+            # A store costing more than a full bucket goes once the bucket is full
+            if self.tokens < min(entry["requests"], self.budget_per_hour):
+                break
+            try:
+                job = self.job_queue.submit(
+                    store, message=f"Scheduled scrape of {self.describe(store)} "
+                                   f"({entry['expected_changes']} expected changes)"
+                )
+            except QueueFull:
+                continue
+            self.tokens -= entry["requests"]
+            job_ids.append(job["id"])
+        if job_ids:
+            logger.info(f"Scheduled {len(job_ids)} scrapes, {self.tokens:.0f} requests of budget left")
+        return job_ids
+
+    def status(self) -> Dict:
+        """Budget and plan; the bucket is only reported by the process whose thread spends it"""
+        return {
+            "enabled": self.running,
+            "budget_per_hour": self.budget_per_hour,
+            "tokens": round(self.tokens, 1) if self.running else None,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "stores": self.plan(),
+        }
+
+    def start(self):
+        """Start scheduling in a background thread (idempotent; a no-op without a budget)"""
+        if self._thread is not None or not self.configured:
+            return
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stopping,), name="scrape-scheduler",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread = None
+
+    def _run(self, stopping: threading.Event):
+        while not stopping.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Scrape scheduling failed: {e}")
+            stopping.wait(self.tick_seconds)
@@ -4,6 +4,13 @@ import pandas as pd
 import time
 from urllib.parse import urljoin
 import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import metrics
+from atomic_files import AtomicWriter
+from spans import SpanRecorder
 
 class RamScraper:
     def __init__(self):
@@ -12,14 +19,20 @@ class RamScraper:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        metrics.instrument_session(self.session)
         self.products = []
+        self.spans = SpanRecorder()
+        # Product names found on each category page, for per-page change tracking
+        self.pages = {}
         
     def get_category_urls(self):
         """Get main category URLs from the homepage"""
         try:
-            response = self.session.get(self.base_url)
+            with self.spans.span("network", url=self.base_url):
+                response = self.session.get(self.base_url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with self.spans.span("parse", url=self.base_url):
+                soup = BeautifulSoup(response.content, 'html.parser')
             
             categories = []
             # Look for navigation menu items and category links
@@ -49,9 +62,12 @@ class RamScraper:
     def scrape_category(self, category_url):
         """Scrape products from a category page"""
         try:
-            response = self.session.get(category_url)
+            with self.spans.span("network", url=category_url):
+                response = self.session.get(category_url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            parse_started = time.perf_counter()
+            with self.spans.span("parse", url=category_url):
+                soup = BeautifulSoup(response.content, 'html.parser')
             
             products = []
             
@@ -70,9 +86,11 @@ class RamScraper:
                 '.item-wrapper'
             ]
             
+            select_started = time.perf_counter()
             product_elements = []
             for selector in product_selectors:
                 elements = soup.select(selector)
+                metrics.SCRAPER_SELECTOR_MATCHES.labels(store='ram', selector=selector).inc(len(elements))
                 if elements:
                     product_elements.extend(elements)
                     logging.info(f"Found {len(elements)} products with selector: {selector}")
@@ -93,11 +111,16 @@ class RamScraper:
             
             logging.info(f"Total product elements found: {len(product_elements)}")
             
+            extract_started = time.perf_counter()
             for element in product_elements:
                 product = self.extract_product_info(element)
                 if product:
                     products.append(product)
             
+            self.spans.record("select", select_started, extract_started, url=category_url)
+            self.spans.record("extract", extract_started, url=category_url, products=len(products))
+            metrics.SCRAPER_PARSE_SECONDS.labels(store='ram').observe(time.perf_counter() - parse_started)
+            metrics.SCRAPER_PRODUCTS.labels(store='ram').inc(len(products))
             return products
         except Exception as e:
             logging.error(f"Error scraping category {category_url}: {e}")
@@ -186,16 +209,29 @@ class RamScraper:
         except:
             return 0.0
     
-    def scrape_all(self):
-        """Main scraping method"""
+    def scrape_all(self, progress=None):
+        """Main scraping method
+
+        ``progress`` is an optional job context (see jobs.JobContext) that
+        receives page/product counts and can cancel between categories.
+        """
         logging.info("Starting RAM scraper")
+        self.spans = SpanRecorder()
+        self.pages = {}
         
         categories = self.get_category_urls()
+        if progress:
+            progress.advance(pages_fetched=1)
         
         for category_url in categories:
+            if progress:
+                progress.check_cancelled()
             logging.info(f"Scraping category: {category_url}")
             products = self.scrape_category(category_url)
             self.products.extend(products)
+            self.pages[category_url] = [product['name'] for product in products]
+            if progress:
+                progress.advance(pages_fetched=1, products_parsed=len(products))
             time.sleep(2)  # Be respectful to the server
         
         logging.info(f"Scraped {len(self.products)} products from RAM")
@@ -208,7 +244,8 @@ if __name__ == "__main__":
     
     if products:
         df = pd.DataFrame(products)
-        df.to_csv('../data/ram_products.csv', index=False)
+        with AtomicWriter('../data/ram_products.csv', "w", newline="", encoding="utf-8") as writer:
+            df.to_csv(writer.file, index=False)
         print(f"Saved {len(products)} products to ram_products.csv")
     else:
         print("No products found")
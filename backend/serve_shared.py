@@ -0,0 +1,65 @@
+"""Serve multi_store_api from several worker processes sharing one catalog.
+
+This process loads the store CSVs once, publishes them as a memory-mapped
+catalog file (data/catalog.bin) and republishes whenever a CSV changes, e.g.
+after a scrape. It also runs the scrape job queue and scheduler. Each uvicorn
+worker maps the file read-only, so the catalog and the encoded /api/products
+body sit in the page cache once however many workers there are, and workers
+pick up a new generation within a second of it being published.
+
+    python serve_shared.py --workers 4 [--host 127.0.0.1] [--port 8000]
+
+/api/scrape/events streams only the events of the worker serving it, so in
+this mode follow jobs with /api/jobs/{job_id}.
+"""
+import argparse
+import logging
+import os
+
+import uvicorn
+
+import multi_store_api
+from shared_catalog import CatalogPublisher
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = os.path.join(multi_store_api.DATA_DIR, "catalog.bin")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between CSV change checks")
+    args = parser.parse_args()
+
+    publisher = CatalogPublisher(
+        CATALOG_FILE,
+        multi_store_api.Product,
+        load=lambda: {store_key: multi_store_api.load_store_products(store_key)
+                      for store_key in multi_store_api.STORES.keys()},
+        signature=multi_store_api.catalog_signature,
+        encode=multi_store_api.encode_shared_responses,
+        interval=args.interval,
+    )
+    # Workers need a file to attach to before they start
+    publisher.publish()
+    publisher.start()
+    multi_store_api.job_queue.start()
+    multi_store_api.scheduler.start()
+
+    # Read by multi_store_api when the workers import it
+    os.environ["MULTI_STORE_CATALOG_FILE"] = CATALOG_FILE
+    os.environ["MULTI_STORE_RUN_JOBS"] = "0"
+
+    logger.info(f"Starting {args.workers} workers on a shared catalog...")
+    try:
+        uvicorn.run("multi_store_api:app", host=args.host, port=args.port, workers=args.workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)))
+    finally:
+        publisher.stop()
+        multi_store_api.scheduler.stop()
+        multi_store_api.job_queue.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Type
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from catalog_file import CatalogFile, write_catalog
+from catalog_version import etag_matches, make_etag, not_modified
+from compact_catalog import CompactCatalog
+from fast_json import json_response, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+class SharedCatalog:
+    """Worker-side handle on a catalog file published by another process.
+
+    Stands in for CatalogVersion: ``value`` and ``epoch`` come from the
+    publisher, so every worker hands out the same ETags. The file is
+    re-checked at most every ``interval`` seconds and a newly published one
+    is mapped in; requests still holding the previous mapping keep reading
+    it until they finish.
+    """
+
+    def __init__(self, path: str, model: Type, interval: float = 1.0):
+        self.path = path
+        self.model = model
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._file = CatalogFile(path, model)
+        self._last_check = time.monotonic()
+
+    @property
+    def current(self) -> CatalogFile:
+        if time.monotonic() - self._last_check >= self.interval:
+            self._check()
+        return self._file
+
+    def _check(self):
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return
+            if (stat.st_ino, stat.st_mtime_ns) != (self._file.stat.st_ino, self._file.stat.st_mtime_ns):
+                self._file = CatalogFile(self.path, self.model)
+                logger.info(f"Attached catalog generation {self._file.meta['generation']}")
+
+    @property
+    def value(self) -> int:
+        return self.current.meta["generation"]
+
+    @property
+    def epoch(self) -> str:
+        return self.current.meta["epoch"]
+
+    def bump(self) -> int:
+        """Our process wrote a source file; look for a republished catalog on next access"""
+        self._last_check = 0
+        return self.value
+
+    def etag(self, key: str, version: Optional[int] = None, encoding: str = "identity") -> str:
+        current = self.current
+        return make_etag(key, current.meta["epoch"], current.meta["generation"] if version is None else version,
+                         encoding)
+
+    def products(self) -> CompactCatalog:
+        return self.current.catalog
+
+    def store_products(self, store_key: str) -> CompactCatalog:
+        """One store's rows, as views into the mapping"""
+        current = self.current
+        start, stop = current.meta["store_ranges"].get(store_key, (0, 0))
+        return current.row_range(start, stop)
+
+    def find(self, store_key: str, product_id: int):
+        """One store's product by id, or None"""
+        current = self.current
+        start, stop = current.meta["store_ranges"].get(store_key, (0, 0))
+        row = current.find(product_id, start, stop)
+        return None if row is None else current.catalog[row]
+
+    def json_response(self, request: Request, name: str) -> Optional[Response]:
+        """Serve a pre-encoded blob published with the catalog; None if it wasn't"""
+        current = self.current
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        body = current.blob(f"{name}.{encoding}")
+        if body is None:
+            encoding = "identity"
+            body = current.blob(f"{name}.identity")
+        if body is None:
+            return None
+        # Blobs are mapped, so finding the coding first costs nothing
+        etag = make_etag(name, current.meta["epoch"], current.meta["generation"], encoding)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return json_response(body, encoding, headers={"ETag": etag})
+
+class CatalogPublisher:
+    """Loader side: writes the catalog file and rewrites it when the sources change.
+
+    ``load`` returns a CompactCatalog per store, ``signature`` a cheap
+    fingerprint of the sources (e.g. CSV mtimes) and ``encode`` optional
+    pre-encoded blobs to publish next to the rows. Each publish gets the
+    next generation number; files are swapped in with an atomic rename.
+    """
+
+    def __init__(self, path: str, model: Type, load: Callable[[], Dict[str, CompactCatalog]],
+                 signature: Callable[[], Hashable],
+                 encode: Optional[Callable[[CompactCatalog], Dict[str, bytes]]] = None,
+                 interval: float = 2.0):
+        self.path = path
+        self.model = model
+        self.load = load
+        self.signature = signature
+        self.encode = encode
+        self.interval = interval
+        self.epoch = f"{os.getpid():x}{time.time_ns():x}"
+        self.generation = self._previous_generation()
+        self._published_signature = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _previous_generation(self) -> int:
+        # Keep counting across restarts so versions never go backwards
+        try:
+            return CatalogFile(self.path, self.model).meta.get("generation", 0)
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def publish(self) -> int:
+        """Load the sources and publish them as the next generation"""
+        # Taken before loading: a write racing the load triggers another publish
+        signature = self.signature()
+        per_store = self.load()
+
+        ranges, start = {}, 0
+        for store_key, products in per_store.items():
+            ranges[store_key] = [start, start + len(products)]
+            start += len(products)
+        catalog = CompactCatalog.concat(list(per_store.values()), self.model)
+
+        self.generation += 1
+        write_catalog(
+            self.path,
+            catalog,
+            meta={
+                "generation": self.generation,
+                "epoch": self.epoch,
+                "store_ranges": ranges,
+                "published_at": time.time(),
+            },
+            blobs=self.encode(catalog) if self.encode else None,
+        )
+        self._published_signature = signature
+        logger.info(f"Published catalog generation {self.generation} ({len(catalog)} products)")
+        return self.generation
+
+    def publish_if_changed(self) -> bool:
+        if self.signature() == self._published_signature:
+            return False
+        self.publish()
+        return True
+
+    def start(self):
+        """Republish in a background thread whenever the sources change"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="catalog-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.publish_if_changed()
+            except Exception as e:
+                logger.error(f"Publishing catalog failed: {e}")
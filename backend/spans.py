@@ -0,0 +1,89 @@
+"""Per-stage timing of a scrape run, exportable as a Chrome trace.
+
+A ``SpanRecorder`` collects spans (network, parse, select, extract,
+track_changes, to_csv, ...) from every thread of one run. ``to_dict``
+gives the per-stage breakdown stored with the scrape result, and
+``chrome_trace`` turns that back into the Trace Event format that
+chrome://tracing, Perfetto and speedscope open.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+class SpanRecorder:
+    """Thread-safe list of timed spans, relative to when the recorder was created"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self._spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, started: float, ended: Optional[float] = None, **args):
+        """Add a span between two perf_counter() readings (``ended`` defaults to now)"""
+        ended = time.perf_counter() if ended is None else ended
+        span = {
+            "name": name,
+            "start": round(started - self.started, 6),
+            "duration": round(ended - started, 6),
+            "thread": threading.current_thread().name,
+        }
+        if args:
+            span["args"] = args
+        with self._lock:
+            self._spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Time the enclosed block, including when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started, **args)
+
+    def to_dict(self) -> Dict:
+        """Wall time, seconds and span count per stage, and the spans themselves"""
+        with self._lock:
+            spans = sorted(self._spans, key=lambda span: span["start"])
+        stages: Dict[str, Dict] = {}
+        for span in spans:
+            stage = stages.setdefault(span["name"], {"seconds": 0.0, "count": 0})
+            stage["seconds"] = round(stage["seconds"] + span["duration"], 6)
+            stage["count"] += 1
+        return {
+            "started_at": self.started_at,
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "stages": stages,
+            "spans": spans,
+        }
+
+def chrome_trace(timings: Dict, process_name: str = "scrape") -> Dict:
+    """Trace Event JSON for a ``SpanRecorder.to_dict()`` breakdown, one track per thread"""
+    threads: Dict[str, int] = {}
+    events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": process_name}}]
+    for span in timings.get("spans", []):
+        tid = threads.get(span["thread"])
+        if tid is None:
+            tid = threads[span["thread"]] = len(threads) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": span["thread"]}})
+        events.append({
+            "name": span["name"],
+            "cat": "scrape",
+            "ph": "X",
+            "ts": round(span["start"] * 1e6),
+            "dur": round(span["duration"] * 1e6),
+            "pid": 1,
+            "tid": tid,
+            "args": span.get("args", {}),
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def trace_response(timings: Dict, filename: str):
+    """A Chrome trace of ``timings`` as a JSON download"""
+    # Imported here so scrapers can record spans without loading starlette
+    from starlette.responses import JSONResponse
+
+    return JSONResponse(chrome_trace(timings, process_name=filename),
+                        headers={"Content-Disposition": f'attachment; filename="{filename}.trace.json"'})
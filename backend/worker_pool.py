@@ -0,0 +1,68 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from profiling import profiled
+
+class PoolBusy(Exception):
+    """Raised when a pool's queue is full; endpoints answer 503 + Retry-After"""
+
+    def __init__(self, pool_name: str, retry_after: int = 1):
+        super().__init__(f"{pool_name} pool is busy")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+class BlockingPool:
+    """Bounded thread pool for blocking work called from async endpoints.
+
+    At most ``max_workers`` calls run at once and at most ``max_pending`` more
+    wait for a thread; beyond that ``run`` raises ``PoolBusy`` straight away
+    instead of letting an unbounded backlog build up behind a slow scrape or
+    a large CSV.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _reserve(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                raise PoolBusy(self.name)
+            self._in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run ``func`` on the pool and await its result"""
+        future = self.submit(profiled(functools.partial(func, *args, **kwargs)))
+        # A cancelled request (client gone) stops waiting, but the slot stays taken
+        # until the thread is done; a call that hasn't started is cancelled with it
+        return await asyncio.wrap_future(future)
+
+    def submit(self, func: Callable, *args, **kwargs):
+        """Start ``func`` in the background and return its Future"""
+        self._reserve()
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            # e.g. RuntimeError after shutdown; the slot was never used
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -5,6 +5,7 @@ const API_URL = 'http://127.0.0.1:8000';
 
 function App() {
   const [products, setProducts] = useState([]);
+  const [facets, setFacets] = useState(null);
   const [searchQuery, setSearchQuery] = useState('');
   const [selectedBrand, setSelectedBrand] = useState('All');
   const [selectedStore, setSelectedStore] = useState('All');
@@ -26,6 +27,16 @@ function App() {
       .catch(err => console.error('Error loading products:', err));
   }, []);
 
+  useEffect(() => {
+    const params = new URLSearchParams();
+    if (selectedBrand !== 'All') params.append('brand', selectedBrand);
+    if (selectedStore !== 'All') params.append('store', selectedStore);
+    fetch(`${API_URL}/api/facets?${params}`)
+      .then(res => res.json())
+      .then(data => setFacets(data.facets))
+      .catch(err => console.error('Error loading facets:', err));
+  }, [products, selectedBrand, selectedStore]);
+
   useEffect(() => {
     const handleClickOutside = (event) => {
       if (dropdownRef.current && !dropdownRef.current.contains(event.target)) {
@@ -36,30 +47,56 @@ function App() {
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, []);
 
-  const handleScrape = async () => {
+  // Apply a per-store delta pushed by the scrape event stream
+  const applyDelta = (delta) => {
+    setProducts(prev => {
+      const replaced = new Set([...delta.changed_ids, ...delta.removed_ids]);
+      return [...prev.filter(p => !replaced.has(p.id)), ...delta.changed, ...delta.added];
+    });
+  };
+
+  const handleScrape = () => {
     setIsLoading(true);
-    try {
-      const response = await fetch(`${API_URL}/api/scrape`, { method: 'POST' });
-      await response.json();
-
-      setTimeout(async () => {
-        try {
-          const productsRes = await fetch(`${API_URL}/api/products`);
-          const productsData = await productsRes.json();
-          setProducts(productsData);
-          setIsLoading(false);
-          alert(`✅ Loaded ${productsData.length} products!`);
-        } catch (error) {
-          console.error('Error reloading products:', error);
-          setIsLoading(false);
-          alert('❌ Error loading products');
-        }
-      }, 3000);
-    } catch (error) {
-      console.error('Scraping error:', error);
+    const events = new EventSource(`${API_URL}/api/scrape/events`);
+    let started = false;
+    events.addEventListener('delta', (e) => applyDelta(JSON.parse(e.data)));
+    events.addEventListener('status', (e) => {
+      const status = JSON.parse(e.data);
+      if (status.status !== 'completed' && status.status !== 'error') return;
+      events.close();
       setIsLoading(false);
-      alert('❌ Error scraping products');
-    }
+      alert(status.status === 'completed' ? `✅ ${status.message}` : `❌ ${status.message}`);
+    });
+
+    // Start only once the stream is open, so a fast batch can't finish before we're subscribed
+    events.onopen = async () => {
+      if (started) return;
+      started = true;
+      try {
+        const response = await fetch(`${API_URL}/api/scrape`, { method: 'POST' });
+        await response.json();
+      } catch (error) {
+        console.error('Scraping error:', error);
+        events.close();
+        setIsLoading(false);
+        alert('❌ Error scraping products');
+      }
+    };
+
+    // Without a stream, report the last known status instead of spinning forever
+    events.onerror = async () => {
+      events.close();
+      setIsLoading(false);
+      try {
+        const response = await fetch(`${API_URL}/api/scrape/status`);
+        const status = await response.json();
+        if (status.status === 'completed' || status.status === 'error') {
+          alert(status.status === 'completed' ? `✅ ${status.message}` : `❌ ${status.message}`);
+        }
+      } catch (error) {
+        console.error('Error loading scrape status:', error);
+      }
+    };
   };
 
   // Real-time search dropdown suggestions
@@ -176,8 +213,8 @@ function App() {
     setSortBy('name');
   };
 
-  const brands = ['All', ...new Set(products.map(p => p.brand))];
-  const stores = ['All', ...new Set(products.map(p => p.store))];
+  const brands = ['All', ...(facets ? Object.keys(facets.brand) : new Set(products.map(p => p.brand)))];
+  const stores = ['All', ...(facets ? Object.keys(facets.store) : new Set(products.map(p => p.store)))];
 
   const stats = {
     totalProducts: products.length,